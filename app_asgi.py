@@ -0,0 +1,9 @@
+import os
+
+from webtranslate import asgi
+
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# Serve with an ASGI server, for example "uvicorn app_asgi:application".
+# For local testing, "python -m webtranslate.asgi" serves the application without one.
+application = asgi.make_application()
@@ -0,0 +1,11 @@
+%rebase('main_template', title='Web Translator - {} - {}'.format(job.prjname, job.title))
+<h1>{{job.title}}</h1>
+<hr />
+% if job.is_finished():
+<p class="alert alert-error">{{job.message}}</p>
+<p><a class="btn btn-primary" href="{{url}}">Continue</a></p>
+% else:
+<meta http-equiv="refresh" content="2">
+<p>{{job.progress}}...</p>
+<p>This page shows the result when the job is finished.</p>
+% end
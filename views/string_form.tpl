@@ -12,6 +12,7 @@
     </h2>
 </div>
 <form class="form-horizontal" action="/string/{{pmd.name}}/{{lng.name}}/{{sname}}" method="post" enctype="multipart/form-data">
+    <input type="hidden" name="version" value="{{version}}"/>
     % for tc in tcs:
         <fieldset class="well">
 
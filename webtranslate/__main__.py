@@ -22,6 +22,31 @@ log = logging.getLogger(__name__)
 )
 @click.option("--server-host", help="Host to bind the server to.", default="127.0.0.1")
 @click.option("--server-port", help="Port to bind the server to.", default=8000)
+@click.option("--server-threads", help="Number of requests handled simultaneously.", default=1)
+@click.option("--server-processes", help="Number of server processes, forked after finding the projects.", default=1)
+@click.option(
+    "--project-affinity",
+    help="Handle all requests of a project in one server process, chosen by hashing the project name.",
+    type=click.Choice(["none", "hash"], case_sensitive=False),
+    default="none",
+)
+@click.option(
+    "--admission-limits",
+    help="Limits of the request classes (edit, view, sync, upload) as 'class:concurrency:queue' entries, "
+    "separated by spaces. Classes without limits handle any number of requests.",
+    default="",
+)
+@click.option(
+    "--job-threads", help="Number of threads running uploads in the background (0 = run in the request).", default=0
+)
+@click.option(
+    "--session-file",
+    help="Data base file keeping the login sessions when the server restarts (empty = sessions in memory).",
+    default="",
+)
+@click.option(
+    "--keep-alive-timeout", help="Seconds to keep an idle connection open (0 = close after each request).", default=0
+)
 @click.option(
     "--authentication",
     help="Authentication protocol to use.",
@@ -42,8 +67,9 @@ log = logging.getLogger(__name__)
 @click.option(
     "--storage-format",
     help="Storage format for project. "
-    "Either one huge file per project, or one folder per project with files per language.",
-    type=click.Choice(["one-file", "split-languages"], case_sensitive=False),
+    "Either one huge file per project, one folder per project with files per language, "
+    "or one SQLite data base per project.",
+    type=click.Choice(["one-file", "split-languages", "sqlite"], case_sensitive=False),
     default="one-file",
 )
 @click.option(
@@ -52,11 +78,34 @@ log = logging.getLogger(__name__)
     type=click.Choice(["xml", "json"], case_sensitive=False),
     default="xml",
 )
+@click.option(
+    "--compression",
+    help="Compression of the files of new projects.",
+    type=click.Choice(["none", "gzip", "lzma"], case_sensitive=False),
+    default="none",
+)
+@click.option(
+    "--change-storage",
+    help="Storage of the string changes of loaded projects in memory.",
+    type=click.Choice(["objects", "columnar"], case_sensitive=False),
+    default="objects",
+)
 @click.option("--language-file-size", help="Uploads larger than this are rejected.", default=100000)
 @click.option("--num-backup-files", help="How many backup files for project data to keep.", default=5)
+@click.option(
+    "--backup-format",
+    help="Store backup files as hard link to the previous file, or as compressed delta.",
+    type=click.Choice(["link", "delta"], case_sensitive=False),
+    default="link",
+)
+@click.option("--save-processes", help="Number of processes for saving the languages of a project.", default=1)
 @click.option("--max-num-changes", help="Length of string history to keep.", default=5)
 @click.option("--min-num-changes", help="See docs/manual/setup.rst.", default=2)
 @click.option("--change-stable-age", help="See docs/manual/setup.rst.", default=600)
+@click.option("--change-sweep-interval", help="Seconds between discarding old changes of a project.", default=3600)
+@click.option(
+    "--reload-interval", help="Seconds between checks for project files changed by others (0 = off).", default=0
+)
 @click.option("--github-organization", help="Organization that contains the GitHub teams.")
 @click.option("--github-org-api-token", help="Valid PAT with scope read:org of the organization.")
 @click.option("--github-oauth2-client-id", help="Client ID for the GitHub OAuth2 Application.")
@@ -80,6 +129,13 @@ def run(
     server_mode,
     server_host,
     server_port,
+    server_threads,
+    server_processes,
+    project_affinity,
+    admission_limits,
+    job_threads,
+    session_file,
+    keep_alive_timeout,
     authentication,
     stable_languages,
     unstable_languages,
@@ -88,11 +144,17 @@ def run(
     project_types,
     storage_format,
     data_format,
+    compression,
+    change_storage,
     language_file_size,
     num_backup_files,
+    backup_format,
+    save_processes,
     max_num_changes,
     min_num_changes,
     change_stable_age,
+    change_sweep_interval,
+    reload_interval,
     github_organization,
     github_org_api_token,
     github_oauth2_client_id,
@@ -112,6 +174,13 @@ def run(
         fp.write(f"  <server-mode>{server_mode}</server-mode>\n")
         fp.write(f"  <server-host>{server_host}</server-host>\n")
         fp.write(f"  <server-port>{server_port}</server-port>\n")
+        fp.write(f"  <server-threads>{server_threads}</server-threads>\n")
+        fp.write(f"  <server-processes>{server_processes}</server-processes>\n")
+        fp.write(f"  <project-affinity>{project_affinity}</project-affinity>\n")
+        fp.write(f"  <admission-limits>{admission_limits}</admission-limits>\n")
+        fp.write(f"  <job-threads>{job_threads}</job-threads>\n")
+        fp.write(f"  <session-file>{session_file}</session-file>\n")
+        fp.write(f"  <keep-alive-timeout>{keep_alive_timeout}</keep-alive-timeout>\n")
         fp.write(f"  <authentication>{authentication}</authentication>\n")
         fp.write(f"  <stable-languages>{stable_languages}</stable-languages>\n")
         fp.write(f"  <unstable-languages>{unstable_languages}</unstable-languages>\n")
@@ -120,11 +189,17 @@ def run(
         fp.write(f"  <project-types>{' '.join(set(project_types))}</project-types>\n")
         fp.write(f"  <storage-format>{storage_format}</storage-format>\n")
         fp.write(f"  <data-format>{data_format}</data-format>\n")
+        fp.write(f"  <compression>{compression}</compression>\n")
+        fp.write(f"  <change-storage>{change_storage}</change-storage>\n")
         fp.write(f"  <language-file-size>{language_file_size}</language-file-size>\n")
         fp.write(f"  <num-backup-files>{num_backup_files}</num-backup-files>\n")
+        fp.write(f"  <backup-format>{backup_format}</backup-format>\n")
+        fp.write(f"  <save-processes>{save_processes}</save-processes>\n")
         fp.write(f"  <max-num-changes>{max_num_changes}</max-num-changes>\n")
         fp.write(f"  <min-num-changes>{min_num_changes}</min-num-changes>\n")
         fp.write(f"  <change-stable-age>{change_stable_age}</change-stable-age>\n")
+        fp.write(f"  <change-sweep-interval>{change_sweep_interval}</change-sweep-interval>\n")
+        fp.write(f"  <reload-interval>{reload_interval}</reload-interval>\n")
 
         if authentication == "github":
             fp.write("  <github>\n")
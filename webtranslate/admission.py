@@ -0,0 +1,288 @@
+"""
+Admission control of the requests to the pages. Requests are divided in classes, each class has a limit on the
+number of requests it handles at the same time, and on the number of requests waiting for their turn. A burst of
+requests of the C{lang_sync} script thus cannot occupy all threads of the server, and the translators editing
+strings keep getting their pages.
+"""
+
+import collections
+import contextlib
+import logging
+import math
+import threading
+import time
+
+from .bottle import HTTPError
+
+log = logging.getLogger(__name__)
+
+# Classes of requests, in order of priority.
+EDIT = "edit"  # Interactive changes, such as editing a string.
+VIEW = "view"  # Other pages shown to a translator.
+SYNC = "sync"  # Bulk reading of the translations, mostly by the lang_sync script.
+UPLOAD = "upload"  # Uploads of language files.
+REQUEST_CLASSES = [EDIT, VIEW, SYNC, UPLOAD]
+
+# Pages that read a project or language in bulk.
+SYNC_PAGES = {"download-list", "annotate", "download"}
+
+# Pages that are never held back.
+FREE_PAGES = {"metrics"}
+
+
+def get_request_class(page, method):
+    """
+    Decide the class of a request.
+
+    @param page: Name of the page of the request, the first part of the name given to L{protect.protected}.
+    @type  page: C{str}
+
+    @param method: HTTP method of the request.
+    @type  method: C{str}
+
+    @return: Class of the request, or C{None} if the request is not subject to admission control.
+    @rtype:  C{str} or C{None}
+    """
+    if page in FREE_PAGES:
+        return None
+    if page in SYNC_PAGES:
+        return SYNC
+    if method in ("GET", "HEAD"):
+        return VIEW
+    if page == "upload":
+        return UPLOAD
+    return EDIT
+
+
+def parse_limits(text):
+    """
+    Parse the limits of the request classes, a list of C{class:concurrency:queue} entries separated by white space.
+    Wrong entries are reported and skipped.
+
+    @param text: Text to parse.
+    @type  text: C{str} or C{None}
+
+    @return: Number of requests handled at the same time and number of waiting requests, by class.
+    @rtype:  C{dict} of C{str} to (C{int}, C{int})
+    """
+    limits = {}
+    if text is None:
+        return limits
+    for entry in text.split():
+        parts = entry.split(":")
+        if len(parts) != 3 or parts[0] not in REQUEST_CLASSES:
+            log.error('Incorrect entry "%s" in the admission-limits of the configuration, skipping it', entry)
+            continue
+        try:
+            concurrency, queue_size = int(parts[1]), int(parts[2])
+        except ValueError:
+            concurrency, queue_size = 0, -1
+        if concurrency < 1 or queue_size < 0:
+            log.error('Incorrect entry "%s" in the admission-limits of the configuration, skipping it', entry)
+            continue
+        limits[parts[0]] = (concurrency, queue_size)
+    return limits
+
+
+class RequestClass:
+    """
+    Limits and statistics of a class of requests.
+
+    @ivar name: Name of the class.
+    @type name: C{str}
+
+    @ivar concurrency: Maximum number of requests of the class handled at the same time, C{None} means unlimited.
+    @type concurrency: C{int} or C{None}
+
+    @ivar queue_size: Maximum number of requests of the class waiting for their turn.
+    @type queue_size: C{int}
+
+    @ivar condition: Condition for changing the requests of the class, and waiting for a turn.
+    @type condition: L{threading.Condition}
+
+    @ivar running: Number of requests being handled.
+    @type running: C{int}
+
+    @ivar waiting: Tickets of the waiting requests, in order of arrival.
+    @type waiting: C{collections.deque} of C{object}
+
+    @ivar admitted: Number of handled requests.
+    @type admitted: C{int}
+
+    @ivar delayed: Number of handled requests that had to wait for their turn.
+    @type delayed: C{int}
+
+    @ivar rejected: Number of requests refused because the queue was full.
+    @type rejected: C{int}
+
+    @ivar wait_total: Total time that the handled requests waited, in seconds.
+    @type wait_total: C{float}
+
+    @ivar wait_max: Longest time that a handled request waited, in seconds.
+    @type wait_max: C{float}
+
+    @ivar service_total: Total time of handling the finished requests, in seconds.
+    @type service_total: C{float}
+
+    @ivar finished: Number of finished requests.
+    @type finished: C{int}
+    """
+
+    def __init__(self, name, concurrency=None, queue_size=0):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.condition = threading.Condition()
+        self.running = 0
+        self.waiting = collections.deque()
+        self.admitted = 0
+        self.delayed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.service_total = 0.0
+        self.finished = 0
+
+    def get_retry_after(self):
+        """
+        Estimate the number of seconds until the class has room for another request, the condition must be held.
+
+        @return: Number of seconds to wait before trying again.
+        @rtype:  C{int}
+        """
+        average = self.service_total / self.finished if self.finished > 0 else 1.0
+        return max(1, math.ceil(average * (len(self.waiting) + self.running) / self.concurrency))
+
+    def enter(self):
+        """
+        Wait for the turn of a request.
+
+        @return: Number of seconds that the request waited, or C{None} if the queue is full.
+        @rtype:  C{float} or C{None}
+        """
+        with self.condition:
+            if self.concurrency is None or (self.running < self.concurrency and len(self.waiting) == 0):
+                self.running = self.running + 1
+                self.admitted = self.admitted + 1
+                return 0.0
+
+            if len(self.waiting) >= self.queue_size:
+                self.rejected = self.rejected + 1
+                return None
+
+            ticket = object()
+            self.waiting.append(ticket)
+            start = time.monotonic()
+            try:
+                while self.waiting[0] is not ticket or self.running >= self.concurrency:
+                    self.condition.wait()
+            except BaseException:
+                self.waiting.remove(ticket)
+                self.condition.notify_all()
+                raise
+
+            self.waiting.popleft()
+            self.running = self.running + 1
+            self.condition.notify_all()  # The next request may fit as well.
+
+            wait = time.monotonic() - start
+            self.admitted = self.admitted + 1
+            self.delayed = self.delayed + 1
+            self.wait_total = self.wait_total + wait
+            self.wait_max = max(self.wait_max, wait)
+            return wait
+
+    def leave(self, duration):
+        """
+        A request of the class is finished.
+
+        @param duration: Number of seconds it took to handle the request.
+        @type  duration: C{float}
+        """
+        with self.condition:
+            self.running = self.running - 1
+            self.finished = self.finished + 1
+            self.service_total = self.service_total + duration
+            self.condition.notify_all()
+
+    def get_metrics(self):
+        """
+        Get metrics of the class.
+
+        @return: Names and values of the metrics.
+        @rtype:  C{list} of (C{str}, C{int})
+        """
+        prefix = "admission_" + self.name
+        with self.condition:
+            return [
+                (prefix + "_running", self.running),
+                (prefix + "_queued", len(self.waiting)),
+                (prefix + "_admitted", self.admitted),
+                (prefix + "_delayed", self.delayed),
+                (prefix + "_rejected", self.rejected),
+                (prefix + "_wait_ms_total", round(self.wait_total * 1000)),
+                (prefix + "_wait_ms_max", round(self.wait_max * 1000)),
+            ]
+
+
+class Scheduler:
+    """
+    Admission control of the requests to the pages.
+
+    @ivar classes: Classes of requests, by name.
+    @type classes: C{dict} of C{str} to L{RequestClass}
+    """
+
+    def __init__(self):
+        self.classes = dict((name, RequestClass(name)) for name in REQUEST_CLASSES)
+
+    def configure(self, limits):
+        """
+        Set the limits of the request classes, classes without limits handle any number of requests.
+
+        @param limits: Number of requests handled at the same time and number of waiting requests, by class.
+        @type  limits: C{dict} of C{str} to (C{int}, C{int})
+        """
+        self.classes = dict((name, RequestClass(name, *limits.get(name, (None, 0)))) for name in REQUEST_CLASSES)
+
+    @contextlib.contextmanager
+    def admitted(self, class_name):
+        """
+        Context manager that handles a request in its turn. Aborts the request with HTTP status 503 if too many
+        requests of its class are waiting already.
+
+        @param class_name: Class of the request, C{None} means no admission control.
+        @type  class_name: C{str} or C{None}
+        """
+        if class_name is None:
+            yield
+            return
+
+        request_class = self.classes[class_name]
+        if request_class.enter() is None:
+            with request_class.condition:
+                retry_after = request_class.get_retry_after()
+            raise HTTPError(
+                503, "The server is busy, please try again later", headers={"Retry-After": str(retry_after)}
+            )
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            request_class.leave(time.monotonic() - start)
+
+    def get_metrics(self):
+        """
+        Get metrics of the request classes.
+
+        @return: Names and values of the metrics.
+        @rtype:  C{list} of (C{str}, C{int})
+        """
+        metrics = []
+        for name in REQUEST_CLASSES:
+            metrics.extend(self.classes[name].get_metrics())
+        return metrics
+
+
+scheduler = Scheduler()
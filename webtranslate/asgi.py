@@ -0,0 +1,353 @@
+"""
+ASGI entry point of the translator service, and a small asyncio web server for running it locally.
+
+The pages are WSGI code, each request runs in a thread of a pool. The response is sent from the event loop
+afterwards, so a slow client does not hold a thread while it receives a big response.
+"""
+
+import asyncio
+import concurrent.futures
+import http
+import io
+import logging
+import sys
+import urllib.parse
+
+from . import (
+    bottle,
+    config,
+    main,
+)
+
+log = logging.getLogger(__name__)
+
+# Size of the blocks of a response body sent to the client.
+BLOCK_SIZE = 64 * 1024
+
+
+def make_environ(scope, body):
+    """
+    Construct the WSGI environment of a request.
+
+    @param scope: ASGI scope of the request.
+    @type  scope: C{dict}
+
+    @param body: Body of the request.
+    @type  body: C{bytes}
+
+    @return: The WSGI environment.
+    @rtype:  C{dict}
+    """
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+        "REMOTE_ADDR": client[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ[name] = value
+        elif name != "CONTENT_LENGTH":
+            key = "HTTP_" + name
+            if key in environ:
+                value = environ[key] + ("; " if name == "COOKIE" else ", ") + value
+            environ[key] = value
+    return environ
+
+
+class ASGIApplication:
+    """
+    ASGI application running a WSGI application.
+
+    @ivar app: WSGI application.
+    @type app: C{callable}
+
+    @ivar executor: Threads running the WSGI application.
+    @type executor: L{concurrent.futures.ThreadPoolExecutor}
+    """
+
+    def __init__(self, app, threads):
+        self.app = app
+        self.executor = concurrent.futures.ThreadPoolExecutor(threads, thread_name_prefix="asgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError("Unsupported ASGI scope type {}".format(scope["type"]))
+
+        body = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+
+        loop = asyncio.get_running_loop()
+        environ = make_environ(scope, b"".join(body))
+        status, headers, blocks, result = await loop.run_in_executor(self.executor, self.start, environ)
+        try:
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            while True:
+                for block in blocks:
+                    for pos in range(0, len(block), BLOCK_SIZE):
+                        data = block[pos : pos + BLOCK_SIZE]
+                        await send({"type": "http.response.body", "body": data, "more_body": True})
+                if result is None:
+                    break
+                blocks = await loop.run_in_executor(self.executor, self.next_blocks, result)
+                if blocks is None:
+                    break
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            if result is not None and hasattr(result, "close"):
+                await loop.run_in_executor(self.executor, result.close)
+
+    def start(self, environ):
+        """
+        Run the WSGI application for a request, in a thread of the pool.
+
+        @param environ: Environment of the request.
+        @type  environ: C{dict}
+
+        @return: Status code, headers, first blocks of the body, and the remainder of the response if the
+                 body is not complete yet.
+        @rtype:  C{tuple} (C{int}, C{list} of (C{bytes}, C{bytes}), C{list} of C{bytes}, C{iterable} or C{None})
+        """
+        response = {}
+        blocks = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info is not None and "status" in response:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+            return blocks.append
+
+        result = self.app(environ, start_response)
+        if isinstance(result, (list, tuple)):
+            # The complete body, the application is done.
+            blocks.extend(result)
+            if hasattr(result, "close"):
+                result.close()
+            result = None
+        else:
+            # Applications may start the response at the first block.
+            result = iter(result)
+            block = next(result, None)
+            if block is None:
+                if hasattr(result, "close"):
+                    result.close()
+                result = None
+            else:
+                blocks.append(block)
+
+        return response["status"], response["headers"], blocks, result
+
+    def next_blocks(self, result):
+        """
+        Get the next block of a body that is produced while sending it, in a thread of the pool.
+
+        @param result: Remainder of the response.
+        @type  result: C{iterator}
+
+        @return: The next blocks, or C{None} at the end of the body.
+        @rtype:  C{list} of C{bytes}, or C{None}
+        """
+        block = next(result, None)
+        if block is None:
+            return None
+        return [block]
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def make_application():
+    """
+    Load the translator service, and construct its ASGI application.
+
+    @return: The ASGI application.
+    @rtype:  L{ASGIApplication}
+    """
+    main.init()
+    config.project_watcher.start(config.cfg.reload_interval)
+    config.project_sweeper.start(config.SWEEP_CHECK_INTERVAL)
+    bottle.debug(config.cfg.server_mode == "development")
+    return ASGIApplication(bottle.default_app(), config.cfg.server_threads)
+
+
+class LocalServer:
+    """
+    Minimal HTTP/1.1 server for an ASGI application, for running and load testing the service locally.
+    Not intended for production use, it does not protect against misbehaving clients.
+
+    @ivar app: ASGI application.
+    @type app: C{callable}
+
+    @ivar timeout: Number of seconds to keep an idle connection open.
+    @type timeout: C{int}
+    """
+
+    def __init__(self, app, timeout):
+        self.app = app
+        self.timeout = timeout
+
+    async def serve(self, host, port):
+        """
+        Serve requests until the process is stopped.
+
+        @param host: Address to listen at.
+        @type  host: C{str}
+
+        @param port: Port to listen at.
+        @type  port: C{int}
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        log.info("Listening on http://%s:%d/", host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while await self.handle_request(reader, writer):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        except Exception:
+            log.exception("Could not handle a request")
+        finally:
+            writer.close()
+
+    async def handle_request(self, reader, writer):
+        """
+        Handle a request of a connection.
+
+        @return: Whether the connection stays open for another request.
+        @rtype:  C{bool}
+        """
+        line = await asyncio.wait_for(reader.readline(), max(self.timeout, 1))
+        if len(line) == 0:
+            return False
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            return False
+        method, target, version = parts
+
+        headers = []
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _sep, value = line.partition(b":")
+            headers.append((name.strip().lower(), value.strip()))
+        fields = dict(headers)
+
+        keep_alive = version == "HTTP/1.1" and fields.get(b"connection", b"").lower() != b"close"
+        if b"transfer-encoding" in fields:
+            writer.write(b"HTTP/1.1 411 Length Required\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            return False
+        body = await reader.readexactly(int(fields.get(b"content-length", b"0")))
+
+        path, _sep, query = target.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": version[5:],
+            "method": method,
+            "scheme": "http",
+            "path": urllib.parse.unquote(path),
+            "raw_path": path.encode("latin-1"),
+            "query_string": query.encode("latin-1"),
+            "root_path": "",
+            "headers": headers,
+            "client": writer.get_extra_info("peername")[:2],
+            "server": writer.get_extra_info("sockname")[:2],
+        }
+
+        received = False
+
+        async def receive():
+            nonlocal received
+            if received:
+                return {"type": "http.disconnect"}
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        state = {"chunked": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                try:
+                    reason = http.HTTPStatus(status).phrase
+                except ValueError:
+                    reason = "Unknown"
+                lines = ["HTTP/1.1 {} {}".format(status, reason)]
+                names = set()
+                for name, value in message.get("headers", []):
+                    names.add(name.lower())
+                    lines.append("{}: {}".format(name.decode("latin-1"), value.decode("latin-1")))
+                if b"content-length" not in names and method != "HEAD" and status not in (204, 304):
+                    if keep_alive:
+                        lines.append("Transfer-Encoding: chunked")
+                        state["chunked"] = True
+                    else:
+                        state["close"] = True
+                if not keep_alive or state.get("close"):
+                    lines.append("Connection: close")
+                writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            elif message["type"] == "http.response.body":
+                data = message.get("body", b"")
+                if state["chunked"]:
+                    if len(data) > 0:
+                        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    if not message.get("more_body", False):
+                        writer.write(b"0\r\n\r\n")
+                else:
+                    writer.write(data)
+                await writer.drain()  # Wait until the client received the data.
+
+        await self.app(scope, receive, send)
+        return keep_alive and not state.get("close")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)-8s %(message)s", datefmt="%Y-%m-%d %H:%M:%S", level=logging.INFO
+    )
+    log.info("Using existing config.xml")
+
+    application = make_application()
+    local_server = LocalServer(application, config.cfg.keep_alive_timeout)
+    try:
+        asyncio.run(local_server.serve(config.cfg.server_host, config.cfg.server_port))
+    except KeyboardInterrupt:
+        pass
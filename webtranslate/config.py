@@ -2,12 +2,23 @@
 Configuration and global routines of the translator service.
 """
 
+import concurrent.futures
+import contextlib
+import fcntl
+import json
 import logging
+import multiprocessing
 import os
+import queue
+import shutil
 import sys
+import threading
+import time
 
 from . import (
+    admission,
     data,
+    delta,
     loader,
     project_type,
 )
@@ -21,6 +32,10 @@ log = logging.getLogger(__name__)
 # Recognized types of project disk storage.
 STORAGE_ONE_FILE = "One large file for the entire project"
 STORAGE_SEPARATE_LANGUAGES = "Directory with project_data.[xml|json] and a set of language files"
+STORAGE_SQLITE = "SQLite data base file for the entire project"
+
+# Journal of the data files being replaced while saving a L{STORAGE_SEPARATE_LANGUAGES} project.
+SAVE_JOURNAL = "save_journal"
 
 
 class ProjectStorage:
@@ -28,27 +43,70 @@ class ProjectStorage:
     @ivar path: Path to the base of the stored project.
                 For C{STORAGE_ONE_FILE}, the path is the name of the .[xml|json] file.
                 For C{STORAGE_SEPARATE_LANGUAGES}, the path is the directory path.
+                For C{STORAGE_SQLITE}, the path is the name of the .sqlite file.
     @type path: C{str}
 
     @ivar name: Name of the project (basename at the disk).
     @type name: C{str}
 
-    @ivar languages: Detected language files of the project. Always empty for L{STORAGE_ONE_FILE}.
+    @ivar languages: Detected language files of the project. Only used for L{STORAGE_SEPARATE_LANGUAGES}.
     @type languages: C{list} of C{str}
 
     @ivar storage_type: Type of storage of the project at the disk.
-    @type storage_type: One of L{STORAGE_ONE_FILE} or L{STORAGE_SEPARATE_LANGUAGES}
+    @type storage_type: One of L{STORAGE_ONE_FILE}, L{STORAGE_SEPARATE_LANGUAGES}, or L{STORAGE_SQLITE}
 
     @ivar data_format: Used data format.
-    @type data_format: C{str} (C{xml} or C{json}
+    @type data_format: C{str} (C{xml} or C{json}, or C{sqlite} for L{STORAGE_SQLITE})
+
+    @ivar compression: Used compression of the files.
+    @type compression: C{str}, one of the keys of L{data.COMPRESSION_EXTENSIONS}
     """
 
-    def __init__(self, path, name, languages, storage_type, data_format):
+    def __init__(self, path, name, languages, storage_type, data_format, compression):
         self.path = path
         self.name = name
         self.languages = languages
         self.storage_type = storage_type
         self.data_format = data_format
+        self.compression = compression
+
+
+def get_file_extension(data_format, compression):
+    """
+    Get the extension of the names of data files.
+
+    @param data_format: Data format of the files.
+    @type  data_format: C{str}, C{xml} or C{json}
+
+    @param compression: Compression of the files.
+    @type  compression: C{str}, one of the keys of L{data.COMPRESSION_EXTENSIONS}
+
+    @return: Extension of the file names.
+    @rtype:  C{str}
+    """
+    return "." + data_format + data.COMPRESSION_EXTENSIONS[compression]
+
+
+def split_file_name(name):
+    """
+    Split the name of a data file in its parts.
+
+    @param name: Name of the file (without directory).
+    @type  name: C{str}
+
+    @return: Name without extension, data format, and compression, if it is a data file.
+    @rtype:  C{tuple} (C{str}, C{str}, C{str}), or C{None}
+
+    @note: Data bases (with data format C{sqlite}) are never compressed.
+    """
+    compression = data.get_file_compression(name)
+    name = name[: len(name) - len(data.COMPRESSION_EXTENSIONS[compression])]
+    for data_format in ("xml", "json", "sqlite"):
+        if name.endswith("." + data_format):
+            if data_format == "sqlite" and compression != "none":
+                return None
+            return name[: -len(data_format) - 1], data_format, compression
+    return None
 
 
 def get_subnode_text(node, tag):
@@ -84,6 +142,36 @@ class Config:
     @ivar server_port: Port number of the server host.
     @type server_port: C{int}
 
+    @ivar server_threads: Maximum number of requests handled simultaneously by the bottle server, C{1}
+                          handles one request at a time.
+    @type server_threads: C{int}
+
+    @ivar server_processes: Number of processes of the bottle server. With more than one process, the
+                            processes are forked after finding the projects, and share the saved
+                            projects through the disk.
+    @type server_processes: C{int}
+
+    @ivar project_affinity: Assignment of the projects to the processes of the server, C{none} lets any
+                            process handle any project, C{hash} forwards the requests of a project to a
+                            single process by hashing the project name.
+    @type project_affinity: C{str}
+
+    @ivar admission_limits: Number of requests handled at the same time and number of waiting requests, by class
+                            of requests, see L{admission}. Classes without limits handle any number of requests.
+    @type admission_limits: C{dict} of C{str} to (C{int}, C{int})
+
+    @ivar job_threads: Number of threads running the background jobs of the bottle server, C{0} runs a job in
+                       the request that starts it.
+    @type job_threads: C{int}
+
+    @ivar session_file: Data base file storing the login sessions, to share them between the processes of the
+                        server and keep them when the server restarts. C{None} keeps them in memory.
+    @type session_file: C{str} or C{None}
+
+    @ivar keep_alive_timeout: Amount of seconds that the bottle server keeps an idle connection open for
+                              further requests, C{0} closes the connection after each request.
+    @type keep_alive_timeout: C{int}
+
     @ivar authentication: Method of authentication, either C{'development'}. C{'redmine'}, C{'github'} or C{'ldap'}.
     @type authentication: C{str}
 
@@ -103,14 +191,26 @@ class Config:
     @type project_types: C{set} of C{str}
 
     @ivar storage_format: Preferred storage format at the disk.
-    @type storage_format: One of C{STORAGE_ONE_FILE} or C{STORAGE_SEPARATE_LANGUAGES}
+    @type storage_format: One of C{STORAGE_ONE_FILE}, C{STORAGE_SEPARATE_LANGUAGES}, or C{STORAGE_SQLITE}
 
     @ivar data_format: Data format of the files.
     @type data_format: C{str}, C{xml} or C{json}
 
+    @ivar compression: Compression of the files of new projects.
+    @type compression: C{str}, one of the keys of L{data.COMPRESSION_EXTENSIONS}
+
     @ivar num_backup_files: Number of backup files kept for a project.
     @type num_backup_files: C{int}
 
+    @ivar backup_format: Storage of backup files, either a hard link to the previous file, or
+                         a compressed delta against the next newer version.
+    @type backup_format: C{str}, C{link} or C{delta}
+
+    @ivar save_processes: Maximal number of processes for saving the languages of a project with
+                          L{STORAGE_SEPARATE_LANGUAGES} storage. With 1, languages are saved by the
+                          server process itself.
+    @type save_processes: C{int}
+
     @ivar max_number_changes: Maximum number of changes that should be kept for
                               a string in a translation.
     @type max_number_changes: C{int}
@@ -122,19 +222,43 @@ class Config:
     @ivar change_stabilizing_time: Amount of seconds needed before a change
                                    can be considered old enough to discard.
     @type change_stabilizing_time: C{int}
+
+    @ivar change_sweep_interval: Amount of seconds between two sweeps over all changes of a project,
+                                 to discard old changes.
+    @type change_sweep_interval: C{int}
+
+    @ivar reload_interval: Amount of seconds between two checks for projects that were changed at the disk
+                           by others, C{0} disables the checks.
+    @type reload_interval: C{int}
+
+    @ivar change_storage: Storage of the changes of loaded projects in memory.
+    @type change_storage: C{str}, C{objects} or C{columnar}
     """
 
     def __init__(self, config_path):
         self.config_path = config_path
+        self.server_threads = 1
+        self.server_processes = 1
+        self.project_affinity = "none"
+        self.admission_limits = {}
+        self.job_threads = 0
+        self.session_file = None
+        self.keep_alive_timeout = 0
         self.language_file_size = 10000
         self.stable_languages_path = None
         self.unstable_languages_path = None
         self.project_root = None
         self.num_backup_files = 5
+        self.backup_format = "link"
+        self.save_processes = 1
         self.max_number_changes = 5
         self.min_number_changes = 1
         self.change_stabilizing_time = 1000000  # 11 days, 13 hours, 46 minutes, and 40 seconds.
+        self.change_sweep_interval = 3600
+        self.reload_interval = 0
         self.data_format = "xml"
+        self.compression = "none"
+        self.change_storage = "objects"
 
     def load_settings_from_xml(self):
         """
@@ -154,6 +278,18 @@ class Config:
 
         self.server_host = get_subnode_text(cfg, "server-host")
         self.server_port = data.convert_num(get_subnode_text(cfg, "server-port"), 80)
+        self.server_threads = max(1, data.convert_num(get_subnode_text(cfg, "server-threads"), self.server_threads))
+        self.server_processes = data.convert_num(get_subnode_text(cfg, "server-processes"), self.server_processes)
+        self.server_processes = max(1, self.server_processes)
+        self.project_affinity = get_subnode_text(cfg, "project-affinity")
+        if self.project_affinity != "hash":
+            self.project_affinity = "none"
+        self.admission_limits = admission.parse_limits(get_subnode_text(cfg, "admission-limits"))
+        self.job_threads = max(0, data.convert_num(get_subnode_text(cfg, "job-threads"), self.job_threads))
+        self.session_file = get_subnode_text(cfg, "session-file")
+        if self.session_file == "":
+            self.session_file = None
+        self.keep_alive_timeout = data.convert_num(get_subnode_text(cfg, "keep-alive-timeout"), self.keep_alive_timeout)
         self.authentication = get_subnode_text(cfg, "authentication")
         if self.authentication not in ("development", "redmine", "github", "ldap"):
             log.error("Incorrect authentication in the configuration, aborting!")
@@ -183,6 +319,8 @@ class Config:
             self.storage_format = STORAGE_ONE_FILE
         elif storage_type == "split-languages":
             self.storage_format = STORAGE_SEPARATE_LANGUAGES
+        elif storage_type == "sqlite":
+            self.storage_format = STORAGE_SQLITE
         else:
             log.error('Unrecognized preferred storage format "%s", aborting!', storage_type)
             sys.exit(1)
@@ -191,12 +329,24 @@ class Config:
         if self.data_format not in ("xml", "json"):
             self.data_format = "xml"
 
+        self.compression = get_subnode_text(cfg, "compression")
+        if self.compression not in data.COMPRESSION_EXTENSIONS:
+            self.compression = "none"
+
         self.language_file_size = data.convert_num(get_subnode_text(cfg, "language-file-size"), self.language_file_size)
         self.num_backup_files = data.convert_num(get_subnode_text(cfg, "num-backup-files"), self.num_backup_files)
-        # To limit it two digits in backup files.
+        # Keep the number of backup files reasonable.
         if self.num_backup_files > 100:
             self.num_backup_files = 100
 
+        self.backup_format = get_subnode_text(cfg, "backup-format")
+        if self.backup_format != "delta":
+            self.backup_format = "link"
+
+        self.save_processes = data.convert_num(get_subnode_text(cfg, "save-processes"), self.save_processes)
+        if self.save_processes < 1:
+            self.save_processes = 1
+
         self.max_number_changes = data.convert_num(get_subnode_text(cfg, "max-num-changes"), self.max_number_changes)
         self.min_number_changes = data.convert_num(get_subnode_text(cfg, "min-num-changes"), self.min_number_changes)
         # You do want to keep the latest version.
@@ -206,10 +356,44 @@ class Config:
         self.change_stabilizing_time = data.convert_num(
             get_subnode_text(cfg, "change-stable-age"), self.change_stabilizing_time
         )
+        self.change_sweep_interval = data.convert_num(
+            get_subnode_text(cfg, "change-sweep-interval"), self.change_sweep_interval
+        )
+        self.reload_interval = data.convert_num(get_subnode_text(cfg, "reload-interval"), self.reload_interval)
+
+        self.change_storage = get_subnode_text(cfg, "change-storage").strip()
+        if self.change_storage not in ("objects", "columnar"):
+            self.change_storage = "objects"
 
         cache_size = data.convert_num(get_subnode_text(cfg, "project-cache"), 10)
         cache.init(self.project_root, cache_size)
 
+    def load_language_info(self):
+        """
+        Load the meta-information of the stable and (if used) unstable languages.
+        """
+        languages = []
+        if self.stable_languages_path is not None:
+            for lang in language_info.load_dir(self.stable_languages_path):
+                lang.is_stable = True
+                languages.append(lang)
+
+        if self.unstable_languages_path is not None:
+            # Check if any allowed project type uses unstable languages before loading them.
+            unstable_used = False
+            for ptype_name in self.project_types:
+                ptype = project_type.project_types.get(ptype_name)
+                if ptype is not None and ptype.allow_unstable_lng:
+                    unstable_used = True
+                    break
+
+            if unstable_used:
+                for lang in language_info.load_dir(self.unstable_languages_path):
+                    lang.is_stable = False
+                    languages.append(lang)
+
+        language_info.set_all_languages(languages)
+
     def load_userauth_from_xml(self):
         """
         Load 'redmine', 'github' and 'ldap' authentication if they exist.
@@ -340,6 +524,269 @@ class Config:
                     del ldap.translator_groups[iso_code]
 
 
+class ReadWriteLock:
+    """
+    Lock that is held by any number of reading threads, or by a single writing thread. Threads waiting
+    for writing go before new readers, so a steady stream of readers cannot keep a writer waiting. A
+    thread holding the lock may acquire it again, the writer may also acquire it for reading.
+
+    @ivar condition: Condition for waiting on a change of the holders of the lock.
+    @type condition: L{threading.Condition}
+
+    @ivar readers: Number of times that each reading thread acquired the lock, ordered by thread identity.
+    @type readers: C{dict} of C{int} to C{int}
+
+    @ivar writer: Identity of the thread holding the lock for writing, if any.
+    @type writer: C{int} or C{None}
+
+    @ivar writer_count: Number of times that L{writer} acquired the lock.
+    @type writer_count: C{int}
+
+    @ivar waiting_writers: Number of threads waiting to acquire the lock for writing.
+    @type waiting_writers: C{int}
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = {}
+        self.writer = None
+        self.writer_count = 0
+        self.waiting_writers = 0
+
+    def acquire_read(self):
+        """
+        Acquire the lock for reading, wait until no thread writes or waits for writing.
+        """
+        ident = threading.get_ident()
+        with self.condition:
+            if self.writer == ident:
+                self.writer_count = self.writer_count + 1
+                return
+
+            count = self.readers.get(ident)
+            if count is None:
+                while self.writer is not None or self.waiting_writers > 0:
+                    self.condition.wait()
+                count = 0
+            self.readers[ident] = count + 1
+
+    def release_read(self):
+        """
+        Release the lock after reading.
+        """
+        ident = threading.get_ident()
+        with self.condition:
+            if self.writer == ident:
+                self.writer_count = self.writer_count - 1
+                return
+
+            count = self.readers[ident] - 1
+            if count > 0:
+                self.readers[ident] = count
+            else:
+                del self.readers[ident]
+                if len(self.readers) == 0:
+                    self.condition.notify_all()
+
+    def acquire_write(self, blocking=True):
+        """
+        Acquire the lock for writing, wait until no other thread holds the lock.
+
+        @param blocking: Whether to wait for the lock. Otherwise, give up if the lock is held by another thread.
+        @type  blocking: C{bool}
+
+        @return: Whether the lock was acquired.
+        @rtype:  C{bool}
+        """
+        ident = threading.get_ident()
+        with self.condition:
+            if self.writer == ident:
+                self.writer_count = self.writer_count + 1
+                return True
+
+            if self.writer is not None or len(self.readers) > 0:
+                if not blocking:
+                    return False
+                if ident in self.readers:
+                    raise RuntimeError("Cannot acquire a lock for writing while holding it for reading")
+
+                self.waiting_writers = self.waiting_writers + 1
+                try:
+                    while self.writer is not None or len(self.readers) > 0:
+                        self.condition.wait()
+                finally:
+                    self.waiting_writers = self.waiting_writers - 1
+
+            self.writer = ident
+            self.writer_count = 1
+            return True
+
+    def release_write(self):
+        """
+        Release the lock after writing.
+        """
+        with self.condition:
+            assert self.writer == threading.get_ident()
+            self.writer_count = self.writer_count - 1
+            if self.writer_count == 0:
+                self.writer = None
+                self.condition.notify_all()
+
+    @contextlib.contextmanager
+    def read_locked(self):
+        """
+        Context manager holding the lock for reading.
+        """
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextlib.contextmanager
+    def write_locked(self):
+        """
+        Context manager holding the lock for writing.
+        """
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+# Name of the lock file that counts the projects created by the processes of the server. A project cannot have
+# this name, see L{may_create_project}.
+PROJECTS_LOCK_NAME = "projects"
+
+# Number of seconds between two checks whether loaded projects need a sweep.
+SWEEP_CHECK_INTERVAL = 60
+
+
+class ProjectFileLock:
+    """
+    Lock of the files of a project, shared by the processes of the server, see L{Config.server_processes}.
+    The lock file also holds the generation of the project files, which increases with every save, so
+    the processes detect that another process saved the project.
+
+    Within a process, the lock is held exclusively by a single thread for saving the project, which may
+    acquire it again, or shared by any number of threads for loading the project.
+
+    @ivar path: Path of the lock file.
+    @type path: C{str}
+
+    @ivar condition: Condition for waiting on the release of the lock in this process.
+    @type condition: L{threading.Condition}
+
+    @ivar handle: Open lock file while the lock is held.
+    @type handle: C{int} or C{None}
+
+    @ivar exclusive: Whether the lock is held exclusively.
+    @type exclusive: C{bool}
+
+    @ivar owner: Identity of the thread that acquired the lock.
+    @type owner: C{int} or C{None}
+
+    @ivar count: Number of times that the lock is held.
+    @type count: C{int}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.condition = threading.Condition(threading.Lock())
+        self.handle = None
+        self.exclusive = False
+        self.owner = None
+        self.count = 0
+
+    def acquire(self, exclusive):
+        """
+        Acquire the lock, wait until other threads and processes release it.
+
+        @param exclusive: Whether to acquire the lock exclusively.
+        @type  exclusive: C{bool}
+        """
+        ident = threading.get_ident()
+        with self.condition:
+            if self.count > 0 and (self.owner == ident if self.exclusive else not exclusive):
+                self.count = self.count + 1
+                return
+
+            while self.count > 0:
+                self.condition.wait()
+
+            handle = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            except BaseException:
+                os.close(handle)
+                raise
+            self.handle = handle
+            self.exclusive = exclusive
+            self.owner = ident
+            self.count = 1
+
+    def release(self):
+        """
+        Release the lock.
+        """
+        with self.condition:
+            self.count = self.count - 1
+            if self.count == 0:
+                os.close(self.handle)  # Also releases the lock of the file.
+                self.handle = None
+                self.owner = None
+                self.condition.notify_all()
+
+    @contextlib.contextmanager
+    def locked(self, exclusive):
+        """
+        Context manager holding the lock.
+
+        @param exclusive: Whether to hold the lock exclusively.
+        @type  exclusive: C{bool}
+        """
+        self.acquire(exclusive)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def read_generation(self):
+        """
+        Get the generation of the project files. The lock does not need to be held.
+
+        @return: The current generation, C{0} for a project that was never saved, or C{-1} if the lock
+                 file could not be read.
+        @rtype:  C{int}
+        """
+        try:
+            with open(self.path, "rb") as handle:
+                text = handle.read()
+        except FileNotFoundError:
+            return 0
+
+        if len(text) == 0:
+            return 0
+        try:
+            return int(text)
+        except ValueError:
+            return -1
+
+    def next_generation(self):
+        """
+        Increment the generation of the project files, after saving the project. The lock must be held
+        exclusively.
+
+        @return: The new generation.
+        @rtype:  C{int}
+        """
+        assert self.exclusive and self.count > 0
+        generation = max(self.read_generation(), 0) + 1
+        os.pwrite(self.handle, b"%020d\n" % generation, 0)  # Fixed size, readers never see a shorter text.
+        return generation
+
+
 class ProjectCache:
     """
     Cache for project data.
@@ -355,6 +802,35 @@ class ProjectCache:
 
     @ivar lru: LRU storage of loaded projects.
     @type lru: C{list} of L{ProjectMetaData}
+
+    @ivar project_locks: Locks of the projects ordered by name, held for writing while changing the project,
+                         or while replacing or unloading its data, and held for reading while changing a single
+                         language of the project. A project that is loaded again from the disk keeps its lock.
+                         Reading the project needs no lock, see L{use_project}.
+    @type project_locks: C{dict} of C{str} to L{ReadWriteLock}
+
+    @ivar language_locks: Locks of the languages of the projects ordered by project and language name, held
+                          while changing a single language of the project.
+    @type language_locks: C{dict} of (C{str}, C{str}) to L{threading.Lock}
+
+    @ivar used_projects: Projects used by the requests being handled, ordered by thread identity and
+                         project name.
+    @type used_projects: C{dict} of (C{int}, C{str}) to L{ProjectMetaData}
+
+    @ivar file_locks: Locks of the project files ordered by project name, shared with the other processes
+                      of the server. The lock of L{PROJECTS_LOCK_NAME} counts the created projects instead.
+    @type file_locks: C{dict} of C{str} to L{ProjectFileLock}
+
+    @ivar projects_generation: Number of projects created by the processes of the server, when the
+                               projects were last examined, or C{None} if not known.
+    @type projects_generation: C{int} or C{None}
+
+    @ivar lock: Lock for changing the cache.
+    @type lock: L{threading.RLock}
+
+    @note: L{projects} and L{lru} are replaced rather than changed, so threads can iterate over them
+           without holding the lock. A thread that needs more than one lock acquires the project lock
+           first, then the language lock, the file lock, and L{lock} last.
     """
 
     def __init__(self):
@@ -362,6 +838,12 @@ class ProjectCache:
         self.cache_size = 0  # Disable cache
         self.projects = {}
         self.lru = []
+        self.project_locks = {}
+        self.language_locks = {}
+        self.used_projects = {}
+        self.file_locks = {}
+        self.projects_generation = None
+        self.lock = threading.RLock()
 
     def init(self, project_root, cache_size):
         """
@@ -382,10 +864,226 @@ class ProjectCache:
         """
         Examine the disk for translation projects and create stubs for them.
         """
+        if cfg.server_processes > 1:
+            self.projects_generation = self.get_file_lock(PROJECTS_LOCK_NAME).read_generation()
+
         for proj in find_project_files(self.project_root):
             self.projects[proj.name] = ProjectMetaData(proj)
             self.get_pmd(proj.name)
 
+    def refresh_projects(self):
+        """
+        Add the projects that were created by other processes of the server since the projects were last
+        examined.
+        """
+        if cfg.server_processes <= 1:
+            return
+
+        generation = self.get_file_lock(PROJECTS_LOCK_NAME).read_generation()
+        if generation == self.projects_generation:
+            return
+
+        self.projects_generation = generation
+        for proj_store in scan_project_files(self.project_root, False):
+            if proj_store.name not in self.projects:
+                self.refresh_project(proj_store.name)
+
+    def get_project_lock(self, proj_name):
+        """
+        Get the lock of a project.
+
+        @param proj_name: Name of the project (filename without extension).
+        @type  proj_name: C{str}
+
+        @return: Lock of the project.
+        @rtype:  L{ReadWriteLock}
+        """
+        with self.lock:
+            lock = self.project_locks.get(proj_name)
+            if lock is None:
+                lock = ReadWriteLock()
+                self.project_locks[proj_name] = lock
+            return lock
+
+    def get_language_lock(self, proj_name, lng_name):
+        """
+        Get the lock of a language of a project.
+
+        @param proj_name: Name of the project (filename without extension).
+        @type  proj_name: C{str}
+
+        @param lng_name: Name of the language.
+        @type  lng_name: C{str}
+
+        @return: Lock of the language.
+        @rtype:  L{threading.Lock}
+        """
+        with self.lock:
+            lock = self.language_locks.get((proj_name, lng_name))
+            if lock is None:
+                lock = threading.Lock()
+                self.language_locks[(proj_name, lng_name)] = lock
+            return lock
+
+    def get_lock_path(self, proj_name):
+        """
+        Get the path of the lock file of a project.
+
+        @param proj_name: Name of the project (filename without extension).
+        @type  proj_name: C{str}
+
+        @return: Path of the lock file.
+        @rtype:  C{str}
+        """
+        return os.path.join(self.project_root, proj_name + ".lock")
+
+    def get_file_lock(self, proj_name):
+        """
+        Get the lock of the files of a project.
+
+        @param proj_name: Name of the project (filename without extension).
+        @type  proj_name: C{str}
+
+        @return: Lock of the project files.
+        @rtype:  L{ProjectFileLock}
+        """
+        with self.lock:
+            file_lock = self.file_locks.get(proj_name)
+            if file_lock is None:
+                file_lock = ProjectFileLock(self.get_lock_path(proj_name))
+                self.file_locks[proj_name] = file_lock
+            return file_lock
+
+    def file_locked(self, proj_name, exclusive):
+        """
+        Context manager holding the lock of the files of a project, if the server has several processes.
+
+        @param proj_name: Name of the project (filename without extension).
+        @type  proj_name: C{str}
+
+        @param exclusive: Whether to hold the lock exclusively, for saving the project.
+        @type  exclusive: C{bool}
+        """
+        if cfg.server_processes <= 1:
+            return contextlib.nullcontext()
+        return self.get_file_lock(proj_name).locked(exclusive)
+
+    @contextlib.contextmanager
+    def use_project(self, proj_name, write, lng_name=None):
+        """
+        Context manager for using a project in a request. A request reading the project uses the version of
+        the project data at the start of the request until its end, without waiting for other requests.
+        Requests that may change the project run one at a time, each changes a new version of the project
+        data, which replaces the current version when the project is saved, see L{ProjectMetaData.use_version}.
+        Requests that change a single language only wait for requests changing the same language or the
+        whole project, they save their language with L{save_language}. Changes of the project by other
+        processes of the server are loaded first.
+
+        @param proj_name: Name of the project (filename without extension).
+        @type  proj_name: C{str}
+
+        @param write: Whether the project may be changed.
+        @type  write: C{bool}
+
+        @param lng_name: Name of the only language that is changed, if any.
+        @type  lng_name: C{str} or C{None}
+        """
+        self.refresh_project(proj_name)
+        if proj_name not in self.projects:
+            yield  # Not a project, nothing to protect.
+            return
+
+        if not write:
+            with self.pinned_project(self.get_pmd(proj_name), False):
+                yield
+            return
+
+        lock = self.get_project_lock(proj_name)
+        if lng_name is not None and cfg.server_processes <= 1:
+            # With several processes, the project files stay locked while changing, see below, which also
+            # excludes requests for other languages.
+            with lock.read_locked(), self.get_language_lock(proj_name, lng_name):
+                with self.pinned_project(self.get_pmd(proj_name), True):
+                    yield
+            return
+
+        with lock.write_locked(), self.file_locked(proj_name, True):
+            self.refresh_project(proj_name)  # Other processes may have saved the project meanwhile.
+            with self.pinned_project(self.get_pmd(proj_name), True):
+                yield
+
+    @contextlib.contextmanager
+    def pinned_project(self, pmd, write):
+        """
+        Context manager for using a loaded project in the current thread, L{get_pmd} returns the same
+        project until the end, even if the project is loaded again from the disk meanwhile.
+
+        @param pmd: Project meta data, if the project exists.
+        @type  pmd: L{ProjectMetaData} or C{None}
+
+        @param write: Whether the project may be changed.
+        @type  write: C{bool}
+        """
+        if pmd is None:
+            yield
+            return
+
+        with pmd.use_version(write) as pdata:
+            if pdata is None:
+                yield  # Unloaded meanwhile, the request loads it again.
+                return
+
+            key = (threading.get_ident(), pmd.name)
+            self.used_projects[key] = pmd
+            try:
+                yield
+            finally:
+                del self.used_projects[key]
+
+    def refresh_project(self, proj_name):
+        """
+        Load a project again if it was saved by another process of the server since it was loaded, or add it
+        if it was created by another process.
+
+        @param proj_name: Name of the project (filename without extension).
+        @type  proj_name: C{str}
+        """
+        if cfg.server_processes <= 1:
+            return
+
+        pmd = self.projects.get(proj_name)
+        if pmd is None:
+            # Do not keep a lock of a name that may not be a project.
+            generation = ProjectFileLock(self.get_lock_path(proj_name)).read_generation()
+            if generation == 0:
+                return
+        else:
+            generation = self.get_file_lock(proj_name).read_generation()
+            if pmd.generation is None or pmd.generation == generation:
+                return
+
+        for proj_store in scan_project_files(self.project_root, False):
+            if proj_store.name == proj_name:
+                break
+        else:
+            return  # Removed projects are handled by the project watcher.
+
+        new_pmd = ProjectMetaData(proj_store)
+        self.load_pmd(new_pmd)
+        with self.get_project_lock(proj_name).write_locked(), self.lock:
+            if self.projects.get(proj_name) is not pmd:
+                return  # Loaded by another thread meanwhile.
+
+            projects = dict(self.projects)
+            projects[proj_name] = new_pmd
+            self.projects = projects
+
+            if pmd is None or pmd not in self.lru:
+                new_pmd.unload()  # Keep the overview, the project is loaded again when it is used.
+            else:
+                self.lru = [new_pmd] + [p for p in self.lru if p is not pmd]
+                self.make_room()
+
     def create_project(self, disk_name, human_name, projtype, url):
         """
         Create a new project.
@@ -405,30 +1103,47 @@ class ProjectCache:
         @return: Error description, or nothing if creation succeeded.
         @rtype:  C{str} or C{None}
         """
-        if disk_name in self.projects:
-            return 'A project named "{}" already exists'.format(disk_name)
-
-        if not may_create_project(self.project_root, disk_name):
-            return 'A project file named "{}" already exists'.format(disk_name)
-
-        # Construct a new project from scratch.
-        storage = cfg.storage_format
-        if storage == STORAGE_ONE_FILE:
-            path = os.path.join(self.project_root, disk_name + "." + cfg.data_format)
-        else:
-            path = os.path.join(self.project_root, disk_name)
-            if not os.path.isdir(path):
-                assert not os.path.exists(path)
-                os.mkdir(path)
-
-        proj_store = ProjectStorage(path, disk_name, [], cfg.storage_format, cfg.data_format)
-        pmd = ProjectMetaData(proj_store, human_name)
-        self.projects[disk_name] = pmd
-        pmd.pdata = data.Project(human_name, projtype, url)
-        pmd.pdata.set_modified()
-        pmd.create_statistics()
-        self.lru.append(pmd)
-        self.save_pmd(pmd)
+        with self.get_project_lock(disk_name).write_locked(), self.file_locked(disk_name, True):
+            self.refresh_project(disk_name)  # The project may have been created by another process.
+            with self.lock:
+                if disk_name in self.projects:
+                    return 'A project named "{}" already exists'.format(disk_name)
+
+                if not may_create_project(self.project_root, disk_name):
+                    return 'A project file named "{}" already exists'.format(disk_name)
+
+                # Construct a new project from scratch.
+                storage = cfg.storage_format
+                data_format = cfg.data_format
+                compression = cfg.compression
+                if storage == STORAGE_ONE_FILE:
+                    path = os.path.join(self.project_root, disk_name + get_file_extension(data_format, compression))
+                elif storage == STORAGE_SQLITE:
+                    data_format = "sqlite"
+                    compression = "none"
+                    path = os.path.join(self.project_root, disk_name + get_file_extension(data_format, compression))
+                else:
+                    path = os.path.join(self.project_root, disk_name)
+                    if not os.path.isdir(path):
+                        assert not os.path.exists(path)
+                        os.mkdir(path)
+
+                proj_store = ProjectStorage(path, disk_name, [], storage, data_format, compression)
+                pmd = ProjectMetaData(proj_store, human_name)
+                pmd.pdata = data.Project(human_name, projtype, url)
+                pmd.pdata.set_modified()
+                pmd.create_statistics()
+
+                projects = dict(self.projects)
+                projects[disk_name] = pmd
+                self.projects = projects
+                self.lru = self.lru + [pmd]
+
+            self.save_pmd(pmd)
+
+        if cfg.server_processes > 1:
+            with self.file_locked(PROJECTS_LOCK_NAME, True):
+                self.get_file_lock(PROJECTS_LOCK_NAME).next_generation()
         return None
 
     def get_pmd(self, proj_name):
@@ -441,61 +1156,193 @@ class ProjectCache:
         @return: The project, or C{None}
         @rtype:  L{ProjectMetaData} or C{None}
         """
+        # Used by the request of this thread?
+        pmd = self.used_projects.get((threading.get_ident(), proj_name))
+        if pmd is not None:
+            return pmd
+
         # Does it exist?
         pmd = self.projects.get(proj_name)
         if pmd is None:
             return None
 
-        # Is it loaded?
-        if pmd.pdata is not None:
-            lru = [pmd]
-            for p in self.lru:
-                if p != pmd:
-                    lru.append(p)
-            assert len(lru) == len(self.lru)
+        # Load it if needed, other threads asking for the project wait until it is ready. Loaded projects are
+        # swept in the background, see ProjectSweeper.
+        self.load_pmd(pmd)
+
+        with self.lock:
+            # Shuffle project to the front in the lru cache, unless it was replaced meanwhile.
+            if self.projects.get(proj_name) is pmd:
+                lru = [pmd]
+                for p in self.lru:
+                    if p is not pmd:
+                        lru.append(p)
+                self.lru = lru
+                self.make_room()
+        return pmd
+
+    def load_pmd(self, pmd):
+        """
+        Load the data of a project if it is not loaded, while no other process saves the project.
+
+        @param pmd: Project meta data.
+        @type  pmd: L{ProjectMetaData}
+        """
+        with self.file_locked(pmd.name, False), pmd.load_lock:
+            if pmd.pdata is not None:
+                return
+
+            if cfg.server_processes > 1 and pmd.generation is None:
+                pmd.generation = self.get_file_lock(pmd.name).read_generation()
+            pmd.load()
+            pmd.create_statistics()
+            pmd.pack_changes()
+
+    def make_room(self):
+        """
+        Unload the least recently used projects that do not fit in the cache. Projects that are changed by
+        other threads stay loaded, they are unloaded by a later call. Requests reading an unloaded project
+        keep using their version of the project data.
+        """
+        with self.lock:
+            lru = list(self.lru)
+            for pmd in reversed(self.lru[1:]):
+                if len(lru) <= self.cache_size:
+                    break
+
+                lock = self.get_project_lock(pmd.name)
+                if not lock.acquire_write(False):
+                    continue
+                try:
+                    pmd.unload()
+                finally:
+                    lock.release_write()
+                lru.remove(pmd)
+
             self.lru = lru
-            return pmd
 
-        # Load the data, first make some room.
-        size = len(self.lru)
-        i = size - 1
-        while size >= self.cache_size and i >= 0:
-            # XXX If project is locked, skip it.
-            assert self.lru[i].pdata is not None
-            self.lru[i].unload()
-            self.lru[i] = None
-            size = size - 1
-            i = i - 1
-
-        # Shuffle project to the front in the lru cache, and drop the removed entries.
-        # XXX We should compute beforehand, whether there is space in the lru
-        # XXX to add the requested project.
-        lru = [pmd]
-        for p in self.lru:
-            if p is not None:
-                lru.append(p)
-        self.lru = lru
-
-        pmd.load()
-        pmd.create_statistics()
-        return pmd
+    def get_metrics(self):
+        """
+        Get metrics of the cache, and of the contents of the texts shared by the loaded projects.
+
+        @return: Names and values of the metrics.
+        @rtype:  C{list} of (C{str}, C{int})
+        """
+        loaded = sum(1 for pmd in self.lru if pmd.pdata is not None)
+        return [
+            ("projects", len(self.projects)),
+            ("projects_loaded", loaded),
+            ("cache_size", self.cache_size),
+            ("text_contents", len(data.text_contents)),
+            ("text_content_lookups", data.text_contents.lookups),
+            ("text_content_hits", data.text_contents.hits),
+        ]
 
     def save_pmd(self, pmd):
         """
-        Save the project.
+        Save the project. The version of the project data changed by the current thread becomes the current
+        version of the project.
+
+        @param pmd: Project meta data.
+        @type  pmd: L{ProjectMetaData}
+        """
+        with self.get_project_lock(pmd.name).write_locked(), self.file_locked(pmd.name, True):
+            pmd.save()
+            pmd.publish()
+            if cfg.server_processes > 1:
+                pmd.generation = self.get_file_lock(pmd.name).next_generation()
+
+    def save_language(self, pmd, lng):
+        """
+        Save a language changed by a request that changes a single language (see L{use_project}), and update
+        its statistics. The language replaces its previous version in the current version of the project,
+        which may have other languages changed by other requests meanwhile.
 
         @param pmd: Project meta data.
         @type  pmd: L{ProjectMetaData}
+
+        @param lng: Changed language, from the version of the project data of the current thread.
+        @type  lng: L{Language}
+        """
+        with self.file_locked(pmd.name, True), pmd.publish_lock:
+            pmd.merge_language(lng)
+            pmd.save()
+            pmd.create_statistics(lng)
+            pmd.publish()
+            if cfg.server_processes > 1:
+                pmd.generation = self.get_file_lock(pmd.name).next_generation()
+
+    def replace_project(self, old_pmd, new_pmd):
+        """
+        Replace a project by a version loaded again from the disk, unless the project was changed meanwhile.
+        If the old project was not in memory, the new project is unloaded as well.
+
+        @param old_pmd: Project to replace, or C{None} for a new project.
+        @type  old_pmd: L{ProjectMetaData} or C{None}
+
+        @param new_pmd: Loaded project.
+        @type  new_pmd: L{ProjectMetaData}
+
+        @return: Whether the project was replaced.
+        @rtype:  C{bool}
+        """
+        with self.get_project_lock(new_pmd.name).write_locked(), self.lock:
+            if self.projects.get(new_pmd.name) is not old_pmd:
+                return False  # Project was created or replaced meanwhile.
+            if new_pmd.get_disk_state() != new_pmd.disk_state:
+                return False  # Files were changed (or saved by the server) while loading.
+
+            projects = dict(self.projects)
+            projects[new_pmd.name] = new_pmd
+            self.projects = projects
+
+            if old_pmd is not None and old_pmd in self.lru:
+                self.lru = [new_pmd if pmd is old_pmd else pmd for pmd in self.lru]
+            else:
+                new_pmd.unload()
+            return True
+
+    def remove_project(self, pmd):
+        """
+        Remove a project that was removed from the disk.
+
+        @param pmd: Project to remove.
+        @type  pmd: L{ProjectMetaData}
+
+        @return: Whether the project was removed.
+        @rtype:  C{bool}
         """
-        pmd.save()
+        with self.get_project_lock(pmd.name).write_locked(), self.lock:
+            if self.projects.get(pmd.name) is not pmd or pmd.get_disk_state() is not None:
+                return False
+
+            self.projects = {name: p for name, p in self.projects.items() if p is not pmd}
+            self.lru = [p for p in self.lru if p is not pmd]
+            return True
+
+
+class ProjectChangedError(Exception):
+    """
+    The files of a project were changed at the disk by others since the project was loaded, saving it would
+    overwrite the changes. The project watcher loads the project again, see L{ProjectWatcher}.
+    """
 
 
 class ProjectMetaData:
     """
     Some project meta data for the translation service.
 
-    @ivar pdata: Project data if it is loaded in memory.
-    @type pdata: C{None} or L{Project}
+    @ivar published: Current version of the project data if it is loaded in memory. A version is not
+                     changed after it became the current version, except by replacing its statistics.
+    @type published: C{None} or L{Project}
+
+    @ivar versions: Version of the project data used by each thread handling a request, ordered by thread
+                    identity, see L{use_version}.
+    @type versions: C{dict} of C{int} to L{Project}
+
+    @ivar publish_lock: Lock held while making a new current version with a changed language, see
+                        L{merge_language}.
+    @type publish_lock: L{threading.Lock}
 
     @ivar name: Name of the project (basename).
     @type name: C{str}
@@ -522,13 +1369,29 @@ class ProjectMetaData:
     @type path: C{str}
 
     @ivar storage_type: Files used to store the project.
-    @type storage_type: C{str}, either L{STORAGE_ONE_FILE} or L{STORAGE_SEPARATE_LANGUAGES}
+    @type storage_type: C{str}, one of L{STORAGE_ONE_FILE}, L{STORAGE_SEPARATE_LANGUAGES}, or L{STORAGE_SQLITE}
 
     @ivar data_format: Data format used to store the data.
     @type data_format: C{str}, either 'xml', or 'json'
+
+    @ivar compression: Compression of the files.
+    @type compression: C{str}, one of the keys of L{data.COMPRESSION_EXTENSIONS}
+
+    @ivar disk_state: State of the files of the project when it was last loaded or saved, see L{get_disk_state}.
+    @type disk_state: C{frozenset} or C{None}
+
+    @ivar load_lock: Lock held while loading the project data, so a single thread loads it.
+    @type load_lock: L{threading.Lock}
+
+    @ivar generation: Generation of the project files when the project was first loaded or last saved, or
+                      C{None} if not known yet. Only used by a server with several processes, see
+                      L{ProjectFileLock}.
+    @type generation: C{int} or C{None}
     """
 
     def __init__(self, proj_store, human_name=None):
+        self.versions = {}
+        self.publish_lock = threading.Lock()
         self.pdata = None
         self.name = proj_store.name
 
@@ -549,56 +1412,229 @@ class ProjectMetaData:
         self.path = proj_store.path
         self.storage_type = proj_store.storage_type
         self.data_format = proj_store.data_format
+        self.compression = proj_store.compression
+        self.disk_state = None
+        self.load_lock = threading.Lock()
+        self.generation = None
 
         if self.storage_type == STORAGE_SEPARATE_LANGUAGES:
-            assert not self.path.endswith(".xml") and not self.path.endswith(".json")
+            assert split_file_name(self.path) is None
+        elif self.storage_type == STORAGE_SQLITE:
+            assert self.data_format == "sqlite" and split_file_name(self.path) is not None
         else:
             assert self.storage_type == STORAGE_ONE_FILE
-            assert self.path.endswith(".xml") or self.path.endswith(".json")
+            assert split_file_name(self.path) is not None
 
-    def load(self):
-        assert self.pdata is None
+    @property
+    def pdata(self):
+        """
+        Project data used by the current thread, if it is loaded in memory. Assigning it sets the current
+        version of the project data.
 
-        if self.storage_type == STORAGE_ONE_FILE:
-            if self.data_format == "xml":
-                xloader = data.XmlLoader(False)
-            else:
-                xloader = data.JsonLoader(False)
+        @rtype: C{None} or L{Project}
+        """
+        return self.versions.get(threading.get_ident(), self.published)
 
-            del self.pdata
-            self.pdata = xloader.load_project(self.path)
-        else:
-            assert self.storage_type == STORAGE_SEPARATE_LANGUAGES
-            if self.data_format == "xml":
-                xloader = data.XmlLoader(True)
-            else:
-                xloader = data.JsonLoader(True)
+    @pdata.setter
+    def pdata(self, pdata):
+        self.published = pdata
 
-            del self.pdata
-            self.pdata = xloader.load_project(os.path.join(self.path, "project_data." + self.data_format))
-            for lng_name in self.overview:
-                path = os.path.join(self.path, lng_name + "." + self.data_format)
-                self.pdata.languages[lng_name] = xloader.load_language(self.pdata.projtype, path)
+    @pdata.deleter
+    def pdata(self):
+        self.published = None
 
-            # Check that we have a base language, else drop translations.
-            project = self.pdata
-            if project.get_base_language() is None:
+    @contextlib.contextmanager
+    def use_version(self, write):
+        """
+        Context manager for using the loaded project data in the current thread. A reading thread keeps the
+        current version until the end, so it sees consistent data while another thread changes the
+        project. A writing thread changes a new version, which becomes the current version by L{publish}.
+
+        @param write: Whether the project data may be changed.
+        @type  write: C{bool}
+
+        @return: The used version of the project data, or C{None} if the project is not loaded.
+        @rtype:  L{Project} or C{None}
+        """
+        pdata = self.published
+        if pdata is None:
+            yield None
+            return
+
+        ident = threading.get_ident()
+        if write:
+            pdata = pdata.copy()
+        self.versions[ident] = pdata
+        try:
+            yield pdata
+        finally:
+            del self.versions[ident]
+
+    def publish(self):
+        """
+        Make the version of the project data changed by the current thread the current version.
+        """
+        pdata = self.versions.get(threading.get_ident())
+        if pdata is not None:
+            self.published = pdata
+
+    def merge_language(self, lng):
+        """
+        Make a new version of the current project data with a changed language, and use it in the current
+        thread instead of its own version. The caller holds L{publish_lock} until the new version is published.
+
+        @param lng: Changed language.
+        @type  lng: L{Language}
+        """
+        pdata = self.published.copy()
+        pdata.languages[lng.name] = lng
+        pdata.shared_languages.discard(lng.name)
+        self.versions[threading.get_ident()] = pdata
+
+    def get_file_path(self, name):
+        """
+        Get the path of a file of a project stored as L{STORAGE_SEPARATE_LANGUAGES}.
+
+        @param name: Name of the file without extension, C{project_data} or the name of a language.
+        @type  name: C{str}
+
+        @return: Path of the file.
+        @rtype:  C{str}
+        """
+        return os.path.join(self.path, name + get_file_extension(self.data_format, self.compression))
+
+    def get_disk_state(self):
+        """
+        Get the state of the data files of the project at the disk, to detect changes by others.
+
+        @return: Names, modification times, and sizes of the data files, or C{None} if the project is not
+                 at the disk.
+        @rtype:  C{frozenset} of (C{str}, C{int}, C{int}), or C{None}
+        """
+        try:
+            if self.storage_type == STORAGE_SEPARATE_LANGUAGES:
+                state = []
+                with os.scandir(self.path) as entries:
+                    for entry in entries:
+                        if split_file_name(entry.name) is not None:
+                            stat = entry.stat()
+                            state.append((entry.name, stat.st_mtime_ns, stat.st_size))
+                return frozenset(state)
+
+            stat = os.stat(self.path)
+            return frozenset([(os.path.basename(self.path), stat.st_mtime_ns, stat.st_size)])
+        except FileNotFoundError:
+            return None
+
+    def load(self, sweep=True):
+        """
+        Load the project data from the disk.
+
+        @param sweep: Whether to sweep the changes if the last sweep is too old, see L{needs_sweep}.
+        @type  sweep: C{bool}
+        """
+        assert self.pdata is None
+
+        # Files changed while loading are detected as changed afterwards.
+        self.disk_state = self.get_disk_state()
+        if self.storage_type == STORAGE_ONE_FILE:
+            if self.data_format == "xml":
+                xloader = data.XmlLoader(False)
+            else:
+                xloader = data.JsonLoader(False)
+
+            del self.pdata
+            self.pdata = xloader.load_project(self.path)
+        elif self.storage_type == STORAGE_SQLITE:
+            del self.pdata
+            self.pdata = data.SqliteStore().load_project(self.path)
+        else:
+            assert self.storage_type == STORAGE_SEPARATE_LANGUAGES
+            if self.data_format == "xml":
+                xloader = data.XmlLoader(True)
+            else:
+                xloader = data.JsonLoader(True)
+
+            del self.pdata
+            self.pdata = xloader.load_project(self.get_file_path("project_data"))
+            for lng_name in self.overview:
+                path = self.get_file_path(lng_name)
+                self.pdata.languages[lng_name] = xloader.load_language(self.pdata.projtype, path)
+
+            # Check that we have a base language, else drop translations.
+            project = self.pdata
+            if project.get_base_language() is None:
                 project.base_language = None
                 if len(self.pdata.languages) > 0:
                     log.warning('Project "%s" has no base language, dropping all translations', project.human_name)
                 project.languages = {}
 
-        process_project_changes(self.pdata)
+        # Changes are pruned before saving, a full sweep is only needed if the last one is too old.
+        if sweep and self.needs_sweep():
+            self.sweep_changes()
         self.human_name = self.pdata.human_name  # Copy the human-readable name from the project data.
 
     def unload(self):
         # XXX Unlink the data
         self.pdata = None
 
+    def needs_sweep(self):
+        """
+        Decide whether the changes of the loaded project should be swept for old changes.
+
+        @return: Whether the last sweep of the changes is too long ago.
+        @rtype:  C{bool}
+        """
+        last_sweep = self.pdata.last_sweep
+        return last_sweep is None or int(time.time()) - last_sweep >= cfg.change_sweep_interval
+
+    def sweep_changes(self):
+        """
+        Sweep over all changes of the loaded project, and discard the changes that are not needed any more.
+        Between sweeps, only changes of modified strings are discarded (see L{process_string_changes}).
+        The sweep changes the version of the project data of the current thread if it has one (see
+        L{use_version}), else it makes a new current version. The columnar stored changes get new tables that
+        hold only the values still in use.
+        """
+        own_version = self.versions.get(threading.get_ident())
+        if own_version is not None:
+            pdata = own_version
+        else:
+            pdata = self.pdata.copy()
+        pdata.last_sweep = int(time.time())
+        if process_project_changes(pdata):
+            pdata.set_modified()  # Also store the time of the sweep.
+        if cfg.change_storage == "columnar":
+            pdata.rebuild_change_tables()
+        if own_version is None:
+            self.pdata = pdata
+
+    def pack_changes(self):
+        """
+        Move the changes of all languages into columnar storage, if enabled in the configuration.
+        """
+        if cfg.change_storage != "columnar":
+            return
+
+        pdata = self.pdata
+        for lng_name, lng in list(pdata.languages.items()):
+            if isinstance(lng.changes, data.PackedChanges) and len(lng.changes.live) + len(lng.changes.hidden) == 0:
+                continue  # Nothing to move, the language may be shared with other versions of the project.
+            pdata.edit_language(lng_name).pack_changes(pdata.change_tables)
+
     def save(self):
         """
         Save project data into a data file, and manage the backup files.
+
+        @raise ProjectChangedError: The files were changed at the disk by others, and the project is loaded
+                                    again by the project watcher.
         """
+        if cfg is not None and cfg.reload_interval > 0 and self.disk_state is not None:
+            if self.get_disk_state() != self.disk_state:
+                raise ProjectChangedError(
+                    'Project "{}" was changed at the disk, try again when it is loaded again'.format(self.name)
+                )
+
         if self.storage_type == STORAGE_ONE_FILE:
             needs_save = self.pdata.modified
             if not needs_save:
@@ -613,32 +1649,44 @@ class ProjectMetaData:
                 else:
                     xsaver = data.JsonSaver(False)
 
-                xsaver.save_project(self.pdata, self.path + ".new")
-                rotate_files(self.path)
+                save_data_file(self.path, xsaver.dump_project(self.pdata))
 
                 self.pdata.modified = False
                 for lng in self.pdata.languages.values():
                     lng.modified = False
+        elif self.storage_type == STORAGE_SQLITE:
+            # The data base is changed in place, without backup files.
+            data.SqliteStore().save_project(self.pdata, self.path)
+            self.pdata.modified = False
+            for lng in self.pdata.languages.values():
+                lng.modified = False
         else:
             # Project directory should already exist, created as part of project creation.
+            # All new files are written first, and then replaced together.
             assert self.storage_type == STORAGE_SEPARATE_LANGUAGES
-            if self.data_format == "xml":
-                xsaver = data.XmlSaver(True, False)
-            else:
-                xsaver = data.JsonSaver(True)
+            files = []
+
+            languages = [(self.get_file_path(lng.name), lng) for lng in self.pdata.languages.values() if lng.modified]
+            contents = prepare_language_files(self.data_format, self.pdata.projtype, languages)
+            files.extend((path, content) for (path, _lng), content in zip(languages, contents) if content is not None)
 
             if self.pdata.modified:
-                path = os.path.join(self.path, "project_data." + self.data_format)
-                xsaver.save_project(self.pdata, path + ".new")
-                rotate_files(path)
-                self.pdata.modified = False
+                if self.data_format == "xml":
+                    xsaver = data.XmlSaver(True, False)
+                else:
+                    xsaver = data.JsonSaver(True)
+                path = self.get_file_path("project_data")
+                content = prepare_data_file(path, xsaver.dump_project(self.pdata))
+                if content is not None:
+                    files.append((path, content))
 
-            for lng in self.pdata.languages.values():
-                if lng.modified:
-                    path = os.path.join(self.path, lng.name + "." + self.data_format)
-                    xsaver.save_language(self.pdata.projtype, lng, path + ".new")
-                    rotate_files(path)
-                    lng.modified = False
+            commit_data_files(self.path, files)
+            self.pdata.modified = False
+            for _path, lng in languages:
+                lng.modified = False
+
+        self.disk_state = self.get_disk_state()
+        self.pack_changes()
 
     def create_statistics(self, parm_lng=None):
         """
@@ -656,74 +1704,69 @@ class ProjectMetaData:
         self.blang_name = blng.name
         self.blang_count = len(blng.changes)
 
+        # The statistics are replaced rather than changed, as other versions of the project may share them.
         if parm_lng is None or parm_lng is blng:  # Update all languages.
-            pdata.statistics = {}
+            statistics = {}
+            lngs = pdata.languages.items()
+        else:
+            statistics = dict(pdata.statistics)
+            lngs = [(parm_lng.name, parm_lng)]  # Update just 'parm_lng'
 
-        # Get the pdata.statistics[lname] map for the base language.
-        bstat = pdata.statistics.get(pdata.base_language)
-        if bstat is None:
-            bstat = {}
-            pdata.statistics[pdata.base_language] = bstat
+        # Get the statistics[lname] map for the base language.
+        bstat = {}
+        statistics[pdata.base_language] = bstat
+        for lname, lng in lngs:
+            if lng is not blng:
+                statistics[lname] = {}
 
         projtype = pdata.projtype
 
         # First construct detailed information in the project
-        for sname, bchgs in blng.changes.items():
+        for sname in blng.changes:
             # Check newest base language string.
-            bchg = data.get_newest_change(bchgs, "")
+            bchg = blng.get_newest_change(sname, "")
             binfo = language_file.check_string(projtype, bchg.base_text.text, True, None, blng, True)
             if binfo.has_error:
                 bstat[sname] = [("", data.INVALID)]
             else:
                 bstat[sname] = [("", data.UP_TO_DATE)]
 
-            if parm_lng is None or parm_lng is blng:  # Update all languages.
-                lngs = pdata.languages.items()
-            else:
-                lngs = [(parm_lng.name, parm_lng)]  # Update just 'parm_lng'
-
             for lname, lng in lngs:
                 assert projtype.allow_case or lng.case == [""]
                 if lng is blng:
                     continue
-                # Get the pdata.statistics[lname][sname] list.
-                lstat = pdata.statistics.get(lname)
-                if lstat is None:
-                    lstat = {}
-                    pdata.statistics[lname] = lstat
-                sstat = lstat.get(sname)
-                if sstat is None:
-                    sstat = []
-                    lstat[sname] = sstat
+                # Get the statistics[lname] map.
+                lstat = statistics[lname]
 
                 if binfo is None:  # Base string is broken, cannot judge translations.
-                    sstat[:] = [("", data.UNKNOWN)]
+                    lstat[sname] = [("", data.UNKNOWN)]
                     continue
 
-                chgs = lng.changes.get(sname)
+                chgs = lng.get_all_newest_changes(sname)
                 if chgs is None:  # No translation at all
-                    sstat[:] = [("", data.MISSING)]
+                    lstat[sname] = [("", data.MISSING)]
                     continue
 
-                chgs = data.get_all_newest_changes(chgs, lng.case)
                 detailed_state = data.decide_all_string_status(projtype, bchg, chgs, lng, binfo)
-                sstat[:] = sorted((c, se[0]) for c, se in detailed_state.items())
+                lstat[sname] = sorted((c, se[0]) for c, se in detailed_state.items())
+        pdata.statistics = statistics
 
-        # Construct overview statistics for each language.
+        # Construct overview statistics for each language. The overview is replaced rather than changed, as
+        # pages of other projects may read it.
         if parm_lng is None or parm_lng is blng:  # Update all languages.
-            lngs = pdata.languages.items()
-            self.overview = {}
+            overview = {}
         else:
-            lngs = [(parm_lng.name, parm_lng)]  # Update just 'parm_lng'
+            overview = dict(self.overview)
 
         for lname, lng in lngs:
             # if lng is blng: continue
             counts = [0 for i in range(data.MAX_STATE)]
             for sname in blng.changes:
-                state = max(s[1] for s in pdata.statistics[lname][sname])
+                state = max(s[1] for s in statistics[lname][sname])
                 if state != data.MISSING_OK:
                     counts[state] = counts[state] + 1
-            self.overview[lname] = counts
+            overview[lname] = counts
+        self.overview = overview
 
 
 def find_project_files(root):
@@ -738,20 +1781,51 @@ def find_project_files(root):
 
     @note: the L{ProjectStorage.languages} field is not used in case of L{STORAGE_ONE_FILE}.
     """
+    projects = scan_project_files(root, True)
+
+    pnames = {}
+    found_error = False
+    for p in projects:
+        if p.name in pnames:
+            log.error(
+                'Project "%s" exists twice (as "%s" and as "%s"), please fix.', p.name, p.path, pnames[p.name].path
+            )
+            found_error = True
+
+        pnames[p.name] = p
+
+    if found_error:
+        log.error("One or more errors. Aborting.")
+        sys.exit(1)
+
+    return projects
+
+
+def scan_project_files(root, recover):
+    """
+    Scan the L{root} directory for projects.
+
+    @param root: Root of the projects disk storage.
+    @type  root: C{str}
+
+    @param recover: Whether to recover from interrupted saves of projects (see L{recover_data_files}).
+                    Only safe while no project is being saved.
+    @type  recover: C{bool}
+
+    @return: Found projects, a project name may be found more than once.
+    @rtype:  C{list} of L{ProjectStorage}
+    """
     projects = []
     for name in os.listdir(root):
         path = os.path.join(root, name)
         if os.path.isfile(path):
-            if name.endswith(".xml"):
-                name = name[:-4]
-                data_format = "xml"
-            elif name.endswith(".json"):
-                name = name[:-5]
-                data_format = "json"
-            else:
+            parts = split_file_name(name)
+            if parts is None:
                 continue
 
-            projects.append(ProjectStorage(path, name, [], STORAGE_ONE_FILE, data_format))
+            name, data_format, compression = parts
+            storage_type = STORAGE_SQLITE if data_format == "sqlite" else STORAGE_ONE_FILE
+            projects.append(ProjectStorage(path, name, [], storage_type, data_format, compression))
             continue
 
         elif os.path.isdir(path):
@@ -759,41 +1833,29 @@ def find_project_files(root):
                 # Ignore obsolete 'projects' sub-directory, projects should be moved.
                 continue
 
+            if recover:
+                recover_data_files(path)
+
             found_format = None
             found_languages = []
             for sub_name in os.listdir(path):
-                if sub_name.endswith(".xml"):
-                    sub_name = sub_name[:-4]
-                    data_format = "xml"
-                elif sub_name.endswith(".json"):
-                    sub_name = sub_name[:-5]
-                    data_format = "json"
-                else:
+                parts = split_file_name(sub_name)
+                if parts is None or parts[1] == "sqlite":
                     continue
 
+                sub_name = parts[0]
                 if sub_name == "project_data":
-                    found_format = data_format
+                    found_format = parts[1:]
                 elif sub_name in language_info.isocode:
                     found_languages.append(sub_name)
 
             if found_format is not None:
                 # Languages may be empty (in case the project has no base language).
-                projects.append(ProjectStorage(path, name, found_languages, STORAGE_SEPARATE_LANGUAGES, found_format))
-
-    pnames = {}
-    found_error = False
-    for p in projects:
-        if p.name in pnames:
-            log.error(
-                'Project "%s" exists twice (as "%s" and as "%s"), please fix.', p.name, p.path, pnames[p.name].path
-            )
-            found_error = True
-
-        pnames[p.name] = p
-
-    if found_error:
-        log.error("One or more errors. Aborting.")
-        sys.exit(1)
+                data_format, compression = found_format
+                proj_store = ProjectStorage(
+                    path, name, found_languages, STORAGE_SEPARATE_LANGUAGES, data_format, compression
+                )
+                projects.append(proj_store)
 
     return projects
 
@@ -816,9 +1878,11 @@ def may_create_project(root, name):
 
     path = os.path.join(root, name)
 
-    # Does a L{STORAGE_ONE_FILE} project with the given name exists?
-    if os.path.exists(path + ".xml") or os.path.exists(path + ".json"):
-        return False
+    # Does a L{STORAGE_ONE_FILE} or L{STORAGE_SQLITE} project with the given name exists?
+    for data_format in ("xml", "json", "sqlite"):
+        for compression in data.COMPRESSION_EXTENSIONS:
+            if os.path.exists(path + get_file_extension(data_format, compression)):
+                return False
 
     # Does a L{STORAGE_SEPARATE_LANGUAGES} project with the give name exists?
     # Over-estimate, just name existence is sufficient reason to reject.
@@ -832,50 +1896,48 @@ def process_changes(lchgs, cases, stamp, used_basetexts):
     """
     Check whether the changes should all still be kept.
 
-    @param lchgs: Language changes of a string.
+    @param lchgs: Language changes of a string, sorted from old to new.
     @type  lchgs: C{list} of L{Change}
 
     @param cases: Cases of the language.
     @type  cases: C{list} of C{str}
 
     @param stamp: Current moment in time.
-    @type  stamp: L{Stamp}
+    @type  stamp: C{int}
 
     @param used_basetexts: Collected base texts in the kept language changes.
     @type  used_basetexts: C{set} of L{Text}
 
-    @return: Updated changes. If the length has not changed, they are still the same.
+    @return: Updated changes, sorted from old to new. If the length has not changed, they are still the same.
     @rtype:  C{list} of L{Change}
     """
-    lchgs.sort()
-    lchgs.reverse()
+    now = data.get_stamp_seconds(stamp)
     cases = dict((c, 0) for c in cases)
-    newchgs = []
     done = set()
-    # First round, copy what cannot be thrown out.
-    for i in range(len(lchgs)):
+    # First round, copy what cannot be thrown out. Walk from new to old.
+    for i in range(len(lchgs) - 1, -1, -1):
         chg = lchgs[i]
         case_count = cases[chg.case]
-        if chg.last_upload or (
-            stamp.seconds - chg.stamp.seconds < cfg.change_stabilizing_time and case_count <= cfg.max_number_changes
-        ):
+        young = now - data.get_stamp_seconds(chg.stamp) < cfg.change_stabilizing_time
+        if chg.last_upload or (young and case_count <= cfg.max_number_changes):
             # Last uploaded change, or still too young to throw away.
-            newchgs.append(chg)
             cases[chg.case] = case_count + 1
             used_basetexts.add(chg.base_text)
             done.add(i)
     # Second round, copy more if there is room.
-    for i in range(len(lchgs)):
+    for i in range(len(lchgs) - 1, -1, -1):
         chg = lchgs[i]
         if i in done:
             continue
         case_count = cases[chg.case]
         if case_count < cfg.min_number_changes:
-            newchgs.append(chg)
             cases[chg.case] = case_count + 1
             used_basetexts.add(chg.base_text)
+            done.add(i)
 
-    return newchgs
+    if len(done) == len(lchgs):
+        return lchgs
+    return [lchgs[i] for i in sorted(done)]
 
 
 def process_project_changes(pdata):
@@ -895,37 +1957,26 @@ def process_project_changes(pdata):
         return False  # No base language -> nothing to do.
 
     # Update translation changes.
-    for lname, lng in pdata.languages.items():
+    for lname, lng in list(pdata.languages.items()):
         if lname == pdata.base_language:
             continue
         lng_modified = False
-        for chgs in lng.changes.values():
+        for sname in lng.changes:
+            chgs = lng.get_changes(sname)
             nchgs = process_changes(chgs, lng.case, stamp, used_basetexts)
             if len(nchgs) != len(chgs):
-                chgs[:] = nchgs
+                pdata.edit_language(lname).set_changes(sname, nchgs)
                 modified = True
                 lng_modified = True
 
         if lng_modified:
-            lng.set_modified()
+            pdata.edit_language(lname).set_modified()
 
     # Update base language changes.
-    blng = pdata.languages[pdata.base_language]
+    blng = pdata.edit_language(pdata.base_language)
     blng_modified = False
-    for chgs in blng.changes.values():
-        chgs.sort()
-        nchgs = []
-        changed = False
-        first = True
-        for chg in reversed(chgs):
-            if first or chg.base_text in used_basetexts:
-                nchgs.append(chg)
-                first = False
-            else:
-                changed = True
-
-        if changed:
-            chgs[:] = nchgs
+    for sname in blng.changes:
+        if process_base_changes(blng, sname, used_basetexts):
             modified = True
             pdata.flush_related_cache()
             blng_modified = True
@@ -936,70 +1987,699 @@ def process_project_changes(pdata):
     return modified
 
 
-def rotate_files(fpath):
+def process_base_changes(blng, sname, used_basetexts):
+    """
+    Drop the older changes of a string in the base language that are not used by translations.
+
+    @param blng: Base language.
+    @type  blng: L{Language}
+
+    @param sname: Name of the string.
+    @type  sname: C{str}
+
+    @param used_basetexts: Base texts used in the kept changes of the translations.
+    @type  used_basetexts: C{set} of L{Text}
+
+    @return: Changes were changed.
+    @rtype:  C{bool}
+    """
+    chgs = blng.get_changes(sname)
+    if chgs is None:
+        return False
+
+    # Keep the newest change, and older changes still used by translations.
+    nchgs = [chg for chg in chgs[:-1] if chg.base_text in used_basetexts]
+    if len(nchgs) + 1 == len(chgs):
+        return False
+
+    nchgs.append(chgs[-1])
+    blng.set_changes(sname, nchgs)
+    return True
+
+
+def process_string_changes(pdata, sname, lngnames, base_changes=True):
+    """
+    Update the changes of a string in the project, after it was changed in some languages.
+    Changes in other languages are only expired by the periodic sweep of the project,
+    see L{ProjectMetaData.sweep_changes}.
+
+    @param pdata: Project data to examine and change.
+    @type  pdata: L{Project}
+
+    @param sname: Name of the changed string.
+    @type  sname: C{str}
+
+    @param lngnames: Names of the translations that were changed.
+    @type  lngnames: C{set} of C{str}
+
+    @param base_changes: Whether to also update the changes of the base language. Otherwise, they are
+                         left to the sweep, which a request changing a single language must do.
+    @type  base_changes: C{bool}
+
+    @return: Changes were changed.
+    @rtype:  C{bool}
+    """
+    if pdata.base_language is None:
+        return False  # No base language -> nothing to do.
+
+    used_basetexts = set()
+    stamp = data.make_stamp()
+    modified = False
+    for lname, lng in list(pdata.languages.items()):
+        if lname == pdata.base_language:
+            continue
+        chgs = lng.get_changes(sname)
+        if chgs is None:
+            continue
+
+        if lname in lngnames:
+            nchgs = process_changes(chgs, lng.case, stamp, used_basetexts)
+            if len(nchgs) != len(chgs):
+                lng = pdata.edit_language(lname)
+                lng.set_changes(sname, nchgs)
+                lng.set_modified()
+                modified = True
+        else:
+            used_basetexts.update(chg.base_text for chg in chgs)
+
+    if not base_changes:
+        return modified
+
+    blng = pdata.edit_language(pdata.base_language)
+    if process_base_changes(blng, sname, used_basetexts):
+        pdata.flush_related_cache()
+        blng.set_modified()
+        modified = True
+
+    return modified
+
+
+def save_data_file(path, text):
+    """
+    Write a data file of a project, compressed as needed for its name. The new file is written
+    next to the current file, and renamed into place when it is completely on the disk. The current
+    file is kept as backup file (see L{make_backup}). Nothing is written if the file already
+    contains the text.
+
+    @param path: Path of the data file.
+    @type  path: C{str}
+
+    @param text: New contents of the data file.
+    @type  text: C{str}
+
+    @return: Whether the file was written.
+    @rtype:  C{bool}
+    """
+    content = prepare_data_file(path, text)
+    if content is None:
+        return False
+
+    commit_data_file(path, content)
+    sync_directory(os.path.dirname(path))
+    return True
+
+
+def prepare_data_file(path, text):
+    """
+    Write the new version of a data file next to the current file, compressed as needed for its name.
+    Nothing is written if the file already contains the text.
+
+    @param path: Path of the data file.
+    @type  path: C{str}
+
+    @param text: New contents of the data file.
+    @type  text: C{str}
+
+    @return: New data of the file if it was written, else C{None}.
+    @rtype:  C{bytes} or C{None}
+    """
+    content = text.encode("utf-8")
+    stored = data.compress_data(path, content)
+    try:
+        if os.path.getsize(path) == len(stored):
+            with open(path, "rb") as handle:
+                if handle.read() == stored:
+                    return None
+    except FileNotFoundError:
+        pass  # New data file.
+
+    with open(path + ".new", "wb") as handle:
+        handle.write(stored)
+        handle.flush()
+        os.fsync(handle.fileno())
+    return content
+
+
+def commit_data_file(path, content):
+    """
+    Replace a data file by its new version, written by L{prepare_data_file}. The current file is
+    kept as backup file (see L{make_backup}).
+
+    @param path: Path of the data file.
+    @type  path: C{str}
+
+    @param content: New data of the file.
+    @type  content: C{bytes}
+    """
+    if os.path.exists(path):
+        make_backup(path, content)
+    os.replace(path + ".new", path)
+    backup_cleaner.add(path)
+
+
+def commit_data_files(directory, files):
+    """
+    Replace a set of data files in a directory by their new versions, written by L{prepare_data_file}.
+    The names of the files are written in a journal first, so an interrupted commit can be completed
+    by L{recover_data_files}, rather than leaving files of different generations.
+
+    @param directory: Directory containing the data files.
+    @type  directory: C{str}
+
+    @param files: Paths and new data of the files.
+    @type  files: C{list} of (C{str}, C{bytes})
+    """
+    if len(files) == 0:
+        return
+    if len(files) == 1:
+        # Renaming a single file cannot be interrupted halfway.
+        path, content = files[0]
+        commit_data_file(path, content)
+        sync_directory(directory)
+        return
+
+    journal_path = os.path.join(directory, SAVE_JOURNAL)
+    with open(journal_path + ".new", "w") as handle:
+        json.dump([os.path.basename(path) for path, _content in files], handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(journal_path + ".new", journal_path)
+    sync_directory(directory)
+
+    for path, content in files:
+        commit_data_file(path, content)
+    sync_directory(directory)
+    os.remove(journal_path)
+
+
+def recover_data_files(directory):
+    """
+    Complete a commit of data files in a directory that was interrupted (see L{commit_data_files}),
+    and remove new versions of data files that were never committed.
+
+    @param directory: Directory containing the data files.
+    @type  directory: C{str}
+    """
+    journal_path = os.path.join(directory, SAVE_JOURNAL)
+    if os.path.exists(journal_path):
+        log.warning('Completing interrupted save of the files in "%s"', directory)
+        with open(journal_path, "r") as handle:
+            names = json.load(handle)
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.exists(path + ".new"):
+                os.replace(path + ".new", path)  # Without backup of the previous version.
+        sync_directory(directory)
+        os.remove(journal_path)
+
+    for name in os.listdir(directory):
+        if name.endswith(".new") and (name == SAVE_JOURNAL + ".new" or split_file_name(name[:-4]) is not None):
+            os.remove(os.path.join(directory, name))
+
+
+def sync_directory(directory):
     """
-    Rotate backup files of the provided filename path. It is assumed a C{fpath + ".new"} file exists
-    to rotate in.
+    Make the changes of the file names in a directory durable.
 
-    @param fpath: Path of the file to rotate.
-    @type  fpath: C{str}
+    @param directory: Directory to synchronize.
+    @type  directory: C{str}
     """
-    dirname, filename = os.path.split(fpath)
-    assert dirname != "" and filename != ""  # Assume it is a path with a / in it.
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class SavePool:
+    """
+    Worker processes for saving the languages of a project, see L{prepare_language_files}. The workers are
+    started when first needed, and kept for later saves. The server process runs other threads, which makes
+    forking it unsafe. The workers are forked from a separate server process of L{multiprocessing} instead,
+    and get the languages to save by pickling.
+
+    @ivar executor: Executor with the worker processes, if started.
+    @type executor: L{concurrent.futures.ProcessPoolExecutor} or C{None}
+
+    @ivar started: Process that started the workers.
+    @type started: C{int} or C{None}
+
+    @ivar lock: Lock for starting the workers.
+    @type lock: L{threading.Lock}
+    """
+
+    def __init__(self):
+        self.executor = None
+        self.started = None
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        """
+        Get the executor with the worker processes of this process, starting them if needed.
+
+        @return: The executor.
+        @rtype:  L{concurrent.futures.ProcessPoolExecutor}
+        """
+        with self.lock:
+            pid = os.getpid()
+            if self.started != pid:
+                # Worker processes do not survive forking the server process.
+                context = multiprocessing.get_context("forkserver")
+                self.executor = concurrent.futures.ProcessPoolExecutor(cfg.save_processes, mp_context=context)
+                self.started = pid
+            return self.executor
+
+
+def prepare_language_files(data_format, projtype, languages):
+    """
+    Write the new versions of the data files of languages (see L{prepare_data_file}). Several languages
+    are converted and written by the worker processes of L{save_pool} at the same time.
+
+    @param data_format: Data format of the files.
+    @type  data_format: C{str}, C{xml} or C{json}
+
+    @param projtype: Project type.
+    @type  projtype: L{ProjectType}
+
+    @param languages: Paths of the data files, and the languages to save in them.
+    @type  languages: C{list} of (C{str}, L{Language})
+
+    @return: New data of each file if it was written, else C{None}.
+    @rtype:  C{list} of (C{bytes} or C{None})
+    """
+    num_processes = min(cfg.save_processes, len(languages))
+    if num_processes <= 1:
+        return [prepare_language_file(data_format, projtype, path, lng) for path, lng in languages]
+
+    # Each worker gets one batch of languages, values shared by the languages of a batch are pickled once.
+    batch_size = (len(languages) + num_processes - 1) // num_processes
+    paths = [path for path, _lng in languages]
+    lngs = [lng for _path, lng in languages]
+    count = len(languages)
+    executor = save_pool.get_executor()
+    results = executor.map(
+        prepare_language_file, [data_format] * count, [projtype] * count, paths, lngs, chunksize=batch_size
+    )
+    return list(results)
+
+
+def prepare_language_file(data_format, projtype, path, lng):
+    """
+    Write the new version of the data file of a language (see L{prepare_data_file}).
+
+    @param data_format: Data format of the file.
+    @type  data_format: C{str}, C{xml} or C{json}
+
+    @param projtype: Project type.
+    @type  projtype: L{ProjectType}
+
+    @param path: Path of the data file.
+    @type  path: C{str}
+
+    @param lng: Language to save.
+    @type  lng: L{Language}
+
+    @return: New data of the file if it was written, else C{None}.
+    @rtype:  C{bytes} or C{None}
+    """
+    if data_format == "xml":
+        xsaver = data.XmlSaver(True, False)
+    else:
+        xsaver = data.JsonSaver(True)
+    return prepare_data_file(path, xsaver.dump_language(projtype, lng))
+
+
+def make_backup(path, content):
+    """
+    Keep the current data file as backup file, named after the current time. Depending on the
+    configuration, the backup file is a hard link to the current data file (which is not modified
+    but replaced when saving), or a compressed delta to get the current data from the new data.
+
+    @param path: Path of the data file.
+    @type  path: C{str}
+
+    @param content: New data of the file.
+    @type  content: C{bytes}
+    """
+    if cfg.backup_format == "delta":
+        with open(path, "rb") as handle:
+            old_content = data.decompress_data(path, handle.read())
+        bup_delta = delta.make_delta(old_content, content)
+    else:
+        bup_delta = None
+
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    bup_path = "{}.bup-{}".format(path, stamp)
+    number = 1
+    while os.path.exists(bup_path) or os.path.exists(bup_path + ".delta"):
+        # Already saved in the same second.
+        bup_path = "{}.bup-{}-{}".format(path, stamp, number)
+        number = number + 1
+
+    if bup_delta is not None:
+        with open(bup_path + ".delta", "xb") as handle:
+            handle.write(bup_delta)
+        return
+
+    try:
+        os.link(path, bup_path)
+    except OSError:
+        # File system without hard links.
+        shutil.copyfile(path, bup_path)
+
+
+def get_backup_order(suffix):
+    """
+    Get the order of a backup file.
+
+    @param suffix: Part of the name of the backup file after C{".bup"}.
+    @type  suffix: C{str}
+
+    @return: Sort key of the backup file, newer backups sort higher, or C{None} if not a backup file.
+    @rtype:  C{tuple} or C{None}
+    """
+    if suffix.startswith("-"):
+        if suffix.endswith(".delta"):
+            suffix = suffix[:-6]
+        parts = suffix[1:].split("-")
+        if len(parts) == 2:
+            return (1, parts[0], parts[1], 0)
+        if len(parts) == 3:
+            return (1, parts[0], parts[1], data.convert_num(parts[2], 0))
+        return None
+
+    # Backup file of an older version of Eints, numbered from new to old.
+    num = data.convert_num(suffix, None)
+    if num is None or num <= 0:
+        return None
+    return (0, -num)
 
-    data_files = {}
-    new_name = filename + ".new"
+
+def find_backups(path):
+    """
+    Find the backup files of a data file.
+
+    @param path: Path of the data file.
+    @type  path: C{str}
+
+    @return: Names of the backup files, from new to old.
+    @rtype:  C{list} of C{str}
+    """
+    dirname, filename = os.path.split(path)
     bup_name = filename + ".bup"
+    backups = []
     for name in os.listdir(dirname):
-        if not name.startswith(filename):
+        if not name.startswith(bup_name):
             continue
 
-        path = os.path.join(dirname, name)
-        if name == filename:
-            data_files[0] = path
+        order = get_backup_order(name[len(bup_name) :])
+        if order is not None:
+            backups.append((order, name))
 
-        elif name == new_name:
-            data_files[-1] = path
+    backups.sort(reverse=True)
+    return [name for order, name in backups]
 
-        elif name.startswith(bup_name):
-            num = data.convert_num(name[len(bup_name) :], None)
-            if num is None or num <= 0:
-                continue
-            data_files[num] = path
-
-    assert -1 in data_files  # We should have a '.new' file.
-    missing = 0
-    while missing in data_files and missing < 99 and missing < cfg.num_backup_files:
-        missing = missing + 1
-
-    cmds = []
-    if missing in data_files:
-        # Missing isn't really missing, loop ended due to upper bound check.
-        # Remove the 'missing' file to make room.
-        cmds.append(("rm", data_files[missing]))
-    else:
-        # 'missing' was really missing, add it so it can be used below.
-        if missing == 0:
-            data_files[missing] = os.path.join(dirname, filename)
+
+def remove_old_backups(path, keep):
+    """
+    Remove the oldest backup files of a data file.
+
+    @param path: Path of the data file.
+    @type  path: C{str}
+
+    @param keep: Number of backup files to keep.
+    @type  keep: C{int}
+    """
+    dirname = os.path.dirname(path)
+    for name in find_backups(path)[keep:]:
+        os.unlink(os.path.join(dirname, name))
+
+
+def read_backup(path, backup_name):
+    """
+    Get the data of a backup file. Deltas of newer backup files are applied as needed.
+
+    @param path: Path of the data file.
+    @type  path: C{str}
+
+    @param backup_name: Name of the backup file.
+    @type  backup_name: C{str}
+
+    @return: Data of the backup file, if it exists.
+    @rtype:  C{bytes} or C{None}
+    """
+    dirname = os.path.dirname(path)
+    with open(path, "rb") as handle:
+        content = data.decompress_data(path, handle.read())
+
+    for name in find_backups(path):
+        with open(os.path.join(dirname, name), "rb") as handle:
+            stored = handle.read()
+        if name.endswith(".delta"):
+            content = delta.apply_delta(stored, content)
         else:
-            data_files[missing] = os.path.join(dirname, "{}{:02d}".format(bup_name, missing))
+            content = data.decompress_data(path, stored)
+
+        if name == backup_name:
+            return content
+
+    return None
+
+
+class BackupCleaner:
+    """
+    Removal of old backup files in the background, to keep saving a project fast.
+
+    @ivar queue: Paths of data files that got a new backup file.
+    @type queue: L{queue.Queue} of C{str}
+
+    @ivar thread: Thread removing the backup files, if started.
+    @type thread: L{threading.Thread} or C{None}
+
+    @ivar pid: Process that started L{thread}.
+    @type pid: C{int} or C{None}
+    """
+
+    def __init__(self):
+        self.queue = None
+        self.thread = None
+        self.pid = None
+
+    def add(self, path):
+        """
+        Remove the old backup files of a data file.
+
+        @param path: Path of the data file.
+        @type  path: C{str}
+        """
+        if self.pid != os.getpid():
+            # Not started yet, or started before forking this process.
+            self.queue = queue.Queue()
+            self.thread = threading.Thread(target=self.run, name="backup-cleaner", daemon=True)
+            self.pid = os.getpid()
+            self.thread.start()
+
+        self.queue.put(path)
+
+    def run(self):
+        """
+        Remove old backup files, until the process ends.
+        """
+        while True:
+            path = self.queue.get()
+            try:
+                remove_old_backups(path, cfg.num_backup_files)
+            except OSError:
+                log.exception('Could not remove old backup files of "%s"', path)
+            finally:
+                self.queue.task_done()
+
+    def wait(self):
+        """
+        Wait until all old backup files are removed.
+        """
+        if self.pid == os.getpid():
+            self.queue.join()
+
+
+class ProjectWatcher:
+    """
+    Detection of projects that are added, removed, or changed at the disk by others than the translation
+    service, by polling the modification times of the project files. Changed projects are loaded again in
+    the background, and replace the cached project afterwards.
 
-    # Generate mv and rm commands for the data files.
-    num = missing - 1
-    while num >= -1:
-        cmds.append(("mv", data_files[num], data_files[num + 1]))
-        num = num - 1
-    for num, path in data_files.items():
-        if num > cfg.num_backup_files:
-            cmds.append(("rm", path))
+    @ivar thread: Thread polling the project files, if started.
+    @type thread: L{threading.Thread} or C{None}
+
+    @ivar failed: Disk states of changed projects that could not be loaded, ordered by project name.
+    @type failed: C{dict} of C{str} to C{frozenset}
+    """
+
+    def __init__(self):
+        self.thread = None
+        self.failed = {}
+
+    def start(self, interval):
+        """
+        Start polling the project files.
+
+        @param interval: Number of seconds between two polls, C{0} disables polling.
+        @type  interval: C{int}
+        """
+        if interval <= 0 or self.thread is not None:
+            return
+
+        self.thread = threading.Thread(target=self.run, args=(interval,), name="project-watcher", daemon=True)
+        self.thread.start()
+
+    def run(self, interval):
+        """
+        Poll the project files, until the process ends.
+
+        @param interval: Number of seconds between two polls.
+        @type  interval: C{int}
+        """
+        while True:
+            time.sleep(interval)
+            try:
+                self.poll()
+            except Exception:
+                log.exception("Could not check the project files for changes")
+
+    def poll(self):
+        """
+        Check the project files once, and update the cache for the projects that were changed at the disk.
+        """
+        found = {}
+        duplicates = set()
+        for proj_store in scan_project_files(cache.project_root, False):
+            if proj_store.name in found:
+                duplicates.add(proj_store.name)  # Wait until the files are sorted out.
+            found[proj_store.name] = proj_store
+
+        with cache.lock:
+            projects = dict(cache.projects)
+
+        for name, pmd in projects.items():
+            if name not in found and cache.remove_project(pmd):
+                log.info('Project "%s" was removed from the disk', name)
+
+        for name, proj_store in found.items():
+            if name in duplicates:
+                continue
+
+            pmd = projects.get(name)
+            if pmd is not None:
+                storage = (pmd.path, pmd.storage_type, pmd.data_format, pmd.compression)
+                if storage == (
+                    proj_store.path,
+                    proj_store.storage_type,
+                    proj_store.data_format,
+                    proj_store.compression,
+                ):
+                    if pmd.get_disk_state() == pmd.disk_state:
+                        continue  # Not changed.
+
+            if cfg.server_processes > 1:
+                cache.refresh_project(name)
+                if cache.projects.get(name) is not pmd:
+                    continue  # Saved or created by another process of the server.
+
+            new_pmd = ProjectMetaData(proj_store)
+            if self.failed.get(name) == new_pmd.get_disk_state():
+                continue  # Still the same broken files.
+
+            try:
+                cache.load_pmd(new_pmd)
+            except Exception:
+                log.exception('Could not load project "%s" after it was changed at the disk', name)
+                self.failed[name] = new_pmd.disk_state
+                continue
+
+            self.failed.pop(name, None)
+            if cache.replace_project(pmd, new_pmd):
+                if pmd is None:
+                    log.info('Project "%s" was added at the disk', name)
+                else:
+                    log.info('Project "%s" was changed at the disk, loaded it again', name)
+
+
+class ProjectSweeper:
+    """
+    Periodic sweep over the changes of the loaded projects, see L{ProjectMetaData.sweep_changes}. A project
+    is swept and saved in the background like a change by a request, so requests reading the project do
+    not wait for it.
+
+    @ivar thread: Thread sweeping the projects, if started.
+    @type thread: L{threading.Thread} or C{None}
+    """
+
+    def __init__(self):
+        self.thread = None
+
+    def start(self, interval):
+        """
+        Start checking the loaded projects for a sweep.
+
+        @param interval: Number of seconds between two checks.
+        @type  interval: C{int}
+        """
+        if self.thread is not None:
+            return
+
+        self.thread = threading.Thread(target=self.run, args=(interval,), name="project-sweeper", daemon=True)
+        self.thread.start()
+
+    def run(self, interval):
+        """
+        Check the loaded projects, until the process ends.
+
+        @param interval: Number of seconds between two checks.
+        @type  interval: C{int}
+        """
+        while True:
+            time.sleep(interval)
+            with cache.lock:
+                projects = list(cache.lru)
+            for pmd in projects:
+                if pmd.pdata is None or not pmd.needs_sweep():
+                    continue
+                try:
+                    self.sweep(pmd.name)
+                except ProjectChangedError:
+                    pass  # The project watcher loads the project again, which sweeps it.
+                except Exception:
+                    log.exception('Could not sweep the changes of project "%s"', pmd.name)
+
+    def sweep(self, proj_name):
+        """
+        Sweep the changes of a project, and save it.
+
+        @param proj_name: Name of the project (filename without extension).
+        @type  proj_name: C{str}
+        """
+        with cache.use_project(proj_name, True):
+            pmd = cache.get_pmd(proj_name)
+            if pmd is None or not pmd.needs_sweep():
+                return  # Removed, or swept when it was loaded again meanwhile.
 
-    # Execute the commands.
-    for cmd in cmds:
-        if cmd[0] == "mv":
-            os.rename(cmd[1], cmd[2])
-        elif cmd[0] == "rm":
-            os.unlink(cmd[1])
+            pmd.sweep_changes()
+            cache.save_pmd(pmd)
 
 
 cfg = None
 cache = ProjectCache()
+save_pool = SavePool()
+backup_cleaner = BackupCleaner()
+project_watcher = ProjectWatcher()
+project_sweeper = ProjectSweeper()
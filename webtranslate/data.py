@@ -2,18 +2,31 @@
 Project data.
 """
 
+import array
+import bisect
 import calendar
+import collections.abc
+import contextlib
+import copy
 import functools
+import gzip
+import io
 import json
 import logging
+import lzma
+import operator
 import re
+import sqlite3
 import sys
+import threading
 import time
+import weakref
 
 from xml.dom import minidom
 from xml.dom.minidom import Node
 
 from . import (
+    json_stream,
     loader,
     project_type,
 )
@@ -25,35 +38,11 @@ from .newgrf import (
 log = logging.getLogger(__name__)
 
 
-def get_newest_change(chgs, case):
-    """
-    Get the newest change matching the case.
-
-    @param chgs: Changes to select from.
-    @type  chgs: C{list} of L{Change}
-
-    @param case: Case to match.
-    @type  case: C{str}
-
-    @return: The newest change, if available.
-    @rtype:  C{Change} or C{None}
-    """
-    best = None
-    if chgs is not None:
-        for chg in chgs:
-            if chg.case != case:
-                continue
-            if best is None or best.stamp < chg.stamp:
-                best = chg
-
-    return best
-
-
 def get_all_changes(chgs, cases, bchg):
     """
     Get all changes ordered by case and time.
 
-    @param chgs: Changes to select from.
+    @param chgs: Changes to select from, sorted from old to new.
     @type  chgs: C{list} of L{Change} (C{None} is also accepted)
 
     @param cases: Available cases.
@@ -75,32 +64,6 @@ def get_all_changes(chgs, cases, bchg):
             if clist is not None:
                 clist.append(chg)
 
-    for clist in cases.values():
-        clist.sort()
-
-    return cases
-
-
-def get_all_newest_changes(chgs, cases):
-    """
-    Get the newest changes for all cases.
-
-    @param chgs: Changes to select from.
-    @type  chgs: C{list} of L{Change}
-
-    @param cases: Available cases.
-    @type  cases: C{list} of C{str}
-
-    @return: Newest change for each case (for as far as it exists in the given L{chgs}).
-    @rtype:  C{dict} of C{str} to (L{Change} or C{None})
-    """
-    cases = dict((c, None) for c in cases)
-    cases[""] = None
-
-    for chg in chgs:
-        if chg.case in cases:
-            if cases[chg.case] is None or cases[chg.case].stamp < chg.stamp:
-                cases[chg.case] = chg
     return cases
 
 
@@ -257,12 +220,93 @@ def convert_num(txt, default):
     return int(txt, 10)
 
 
+# File name extensions of the compressions of data files.
+COMPRESSION_EXTENSIONS = {"none": "", "gzip": ".gz", "lzma": ".xz"}
+
+
+def get_file_compression(fname):
+    """
+    Get the compression of a data file from its name.
+
+    @param fname: Name of the data file.
+    @type  fname: C{str}
+
+    @return: Compression of the file, one of the keys of L{COMPRESSION_EXTENSIONS}.
+    @rtype:  C{str}
+    """
+    if fname.endswith(".gz"):
+        return "gzip"
+    if fname.endswith(".xz"):
+        return "lzma"
+    return "none"
+
+
+def open_data_file(fname):
+    """
+    Open a data file for reading, decompressing it if needed.
+
+    @param fname: Name of the data file.
+    @type  fname: C{str}
+
+    @return: Binary file handle with the (decompressed) data.
+    @rtype:  C{file}
+    """
+    compression = get_file_compression(fname)
+    if compression == "gzip":
+        return gzip.open(fname, "rb")
+    if compression == "lzma":
+        return lzma.open(fname, "rb")
+    return open(fname, "rb")
+
+
+def compress_data(fname, content):
+    """
+    Compress the data of a file, as needed for its name.
+
+    @param fname: Name of the data file.
+    @type  fname: C{str}
+
+    @param content: Data to store in the file.
+    @type  content: C{bytes}
+
+    @return: Stored data of the file.
+    @rtype:  C{bytes}
+    """
+    compression = get_file_compression(fname)
+    if compression == "gzip":
+        return gzip.compress(content, mtime=0)  # Same data gives the same file.
+    if compression == "lzma":
+        return lzma.compress(content)
+    return content
+
+
+def decompress_data(fname, stored):
+    """
+    Decompress the stored data of a file, as needed for its name.
+
+    @param fname: Name of the data file.
+    @type  fname: C{str}
+
+    @param stored: Stored data of the file.
+    @type  stored: C{bytes}
+
+    @return: Data of the file.
+    @rtype:  C{bytes}
+    """
+    compression = get_file_compression(fname)
+    if compression == "gzip":
+        return gzip.decompress(stored)
+    if compression == "lzma":
+        return lzma.decompress(stored)
+    return stored
+
+
 class XmlLoader:
     """
     Helper class to load a project from an XML file.
 
-    @ivar stamps: Time stamps loaded so far, mapping of seconds and indices to L{Stamp}.
-    @type stamps: C{dict} of (C{int}, C{int}) to L{Stamp}
+    @ivar stamps: Time stamps loaded so far, to share them between changes and texts.
+    @type stamps: C{dict} of C{int} to C{int}
 
     @ivar texts: Loaded texts, ordered by their reference.
     @type texts: C{dict} of C{str} to L{Text}
@@ -270,12 +314,16 @@ class XmlLoader:
     @ivar split_languages: If set, don't expect the languages to be part of the project.
                            They have been saved separately.
     @type split_languages: C{bool}
+
+    @ivar text_pool: Pool of the loaded texts, to share equal texts between files of the project.
+    @type text_pool: L{TextPool}
     """
 
     def __init__(self, split_languages):
         self.stamps = {}
         self.texts = {}
         self.split_languages = split_languages
+        self.text_pool = TextPool()
 
     def get_stamp(self, secs, index):
         """
@@ -288,20 +336,11 @@ class XmlLoader:
         @type  index: C{int}
 
         @return: Associated time stamp.
-        @rtype:  L{Stamp}
+        @rtype:  C{int}
         """
-        global last_stamp, last_index
-
-        s = self.stamps.get((secs, index))
-        if s is None:
-            s = Stamp(secs, index)
-            self.stamps[(secs, index)] = s
-            if last_stamp < secs:
-                last_stamp = secs
-                last_index = index
-            elif last_stamp == secs and last_index < index:
-                last_index = index
-
+        s = pack_stamp(secs, index)
+        s = self.stamps.setdefault(s, s)
+        update_last_stamp(s)
         return s
 
     def load_project(self, fname):
@@ -315,7 +354,8 @@ class XmlLoader:
                  object, the project may not have all languages.
         @rtype:  L{Project}
         """
-        data = loader.load_dom(fname)
+        with open_data_file(fname) as handle:
+            data = loader.load_dom(handle)
         pnode = loader.get_single_child_node(data, "project")
         self.stamps = {}
 
@@ -343,7 +383,8 @@ class XmlLoader:
         @return: The loaded language.
         @rtype:  L{Language}
         """
-        data = loader.load_dom(fname)
+        with open_data_file(fname) as handle:
+            data = loader.load_dom(handle)
         pnode = loader.get_single_child_node(data, "language")
         self.stamps = {}
 
@@ -373,15 +414,33 @@ class XmlLoader:
 
 class JsonLoader:
     """
-    Helper class to load a project from a Json file.
+    Helper class to load a project from a Json file. The file is read incrementally, texts and changes are
+    converted while they are read.
 
     @ivar split_languages: If set, don't expect the languages to be part of the project.
                            They have been saved separately.
     @type split_languages: C{bool}
+
+    @ivar texts: Texts of the file being loaded, ordered by their index in the text table.
+    @type texts: C{list} of L{Text}
+
+    @ivar text_pool: Pool of the loaded texts, to share equal texts between files of the project.
+    @type text_pool: L{TextPool}
     """
 
     def __init__(self, split_languages):
         self.split_languages = split_languages
+        self.texts = []
+        self.text_pool = TextPool()
+
+    def load_texts(self, reader):
+        """
+        Load the text table of a file.
+
+        @param reader: Reader of the file, at the array of text nodes (written by L{make_text_node_json}).
+        @type  reader: L{JsonStreamReader}
+        """
+        self.texts = [get_text_node_json(self, reader.read_value()) for _index in reader.iter_array()]
 
     def load_project(self, fname):
         """
@@ -394,9 +453,11 @@ class JsonLoader:
                  object, the project may not have all languages.
         @rtype:  L{Project}
         """
-        with open(fname, "r", encoding="utf-8") as handle:
-            data = json.load(handle)
-            return load_project_json(self, data)
+        with io.TextIOWrapper(open_data_file(fname), encoding="utf-8") as handle:
+            reader = json_stream.JsonStreamReader(handle)
+            project = load_project_json(self, reader)
+            reader.read_end()
+            return project
 
     def load_language(self, projtype, fname):
         """
@@ -411,9 +472,11 @@ class JsonLoader:
         @return: The loaded language.
         @rtype:  L{Language}
         """
-        with open(fname, "r", encoding="utf-8") as handle:
-            data = json.load(handle)
-            return load_language_json(projtype, data)
+        with io.TextIOWrapper(open_data_file(fname), encoding="utf-8") as handle:
+            reader = json_stream.JsonStreamReader(handle)
+            lng = load_language_json(self, projtype, reader)
+            reader.read_end()
+            return lng
 
 
 class XmlSaver:
@@ -448,15 +511,15 @@ class XmlSaver:
         self.share_text = share_text
         self.number = 1
 
-    def save_project(self, project, fname):
+    def dump_project(self, project):
         """
-        Save a project as an xml doc document.
+        Convert a project to an xml document.
 
         @param project: Project to save.
         @type  project: L{Project}
 
-        @param fname: Name of the file to write.
-        @type  fname: C{str}
+        @return: Text of the xml document.
+        @rtype:  C{str}
         """
         self.doc = minidom.Document()
         if self.share_text:
@@ -469,12 +532,11 @@ class XmlSaver:
             node.appendChild(self.texts_node)
 
         self.doc.appendChild(node)
-        with open(fname, "w", encoding="utf-8") as handle:
-            handle.write(self.doc.toprettyxml())
+        return self.doc.toprettyxml()
 
-    def save_language(self, projtype, lng, fname):
+    def dump_language(self, projtype, lng):
         """
-        Save a language as xml document.
+        Convert a language to an xml document.
 
         @param projtype: Project type.
         @type  projtype: L{ProjectType}
@@ -482,8 +544,8 @@ class XmlSaver:
         @param lng: Language to save.
         @type  lng: L{Language}
 
-        @param fname: Name of the file to write.
-        @type  fname: C{str}
+        @return: Text of the xml document.
+        @rtype:  C{str}
         """
         assert self.split_languages
 
@@ -498,8 +560,7 @@ class XmlSaver:
             node.appendChild(self.texts_node)
 
         self.doc.appendChild(node)
-        with open(fname, "w", encoding="utf-8") as handle:
-            handle.write(self.doc.toprettyxml())
+        return self.doc.toprettyxml()
 
     def get_textref(self, text):
         """
@@ -532,28 +593,52 @@ class JsonSaver:
     @ivar split_languages: If set, don't save the languages as part of the project. They are
                            saved separately at a later stage.
     @type split_languages: C{bool}
+
+    @ivar texts: Index in the text table of the file being saved, ordered by text object.
+    @type texts: C{dict} of L{Text} to C{int}
+
+    @ivar text_nodes: Text table of the file being saved.
+    @type text_nodes: C{list} of C{list}
     """
 
     def __init__(self, split_languages):
         self.split_languages = split_languages
+        self.texts = {}
+        self.text_nodes = []
 
-    def save_project(self, project, fname):
+    def get_textref(self, text):
+        """
+        Get a reference to the provided text.
+
+        @param text: Text to refer to.
+        @type  text: L{Text}
+
+        @return: Index of the text in the text table of the file.
+        @rtype:  C{int}
+        """
+        ref = self.texts.get(text)
+        if ref is None:
+            ref = len(self.text_nodes)
+            self.texts[text] = ref
+            self.text_nodes.append(make_text_node_json(text))
+        return ref
+
+    def dump_project(self, project):
         """
-        Save a project as an xml doc document.
+        Convert a project to a json document.
 
         @param project: Project to save.
         @type  project: L{Project}
 
-        @param fname: Name of the file to write.
-        @type  fname: C{str}
+        @return: Text of the json document.
+        @rtype:  C{str}
         """
         node = save_project_json(self, project)
-        with open(fname, "w", encoding="utf-8") as handle:
-            json.dump(node, handle)
+        return json.dumps(node)
 
-    def save_language(self, projtype, lng, fname):
+    def dump_language(self, projtype, lng):
         """
-        Save a language as xml document.
+        Convert a language to a json document.
 
         @param projtype: Project type.
         @type  projtype: L{ProjectType}
@@ -561,14 +646,241 @@ class JsonSaver:
         @param lng: Language to save.
         @type  lng: L{Language}
 
-        @param fname: Name of the file to write.
-        @type  fname: C{str}
+        @return: Text of the json document.
+        @rtype:  C{str}
         """
         assert self.split_languages
 
-        node = save_language_json(projtype, lng)
-        with open(fname, "w", encoding="utf-8") as handle:
-            json.dump(node, handle)
+        self.texts = {}
+        self.text_nodes = []
+        node = save_language_json(self, projtype, lng)
+        return json.dumps(node)
+
+
+SQLITE_SCHEMA = """
+PRAGMA journal_mode = WAL;
+CREATE TABLE project (key TEXT PRIMARY KEY, value);
+CREATE TABLE languages (
+    name TEXT PRIMARY KEY, grflangid INTEGER NOT NULL, plural INTEGER, gender TEXT NOT NULL, cases TEXT NOT NULL,
+    pragmas TEXT NOT NULL
+);
+CREATE TABLE texts (id INTEGER PRIMARY KEY, text TEXT NOT NULL, "case" TEXT NOT NULL, stamp INTEGER NOT NULL);
+CREATE UNIQUE INDEX texts_value ON texts (text, "case", stamp);
+CREATE TABLE changes (
+    language TEXT NOT NULL, string TEXT NOT NULL, "case" TEXT NOT NULL, stamp INTEGER NOT NULL,
+    base_text INTEGER NOT NULL, new_text INTEGER, user TEXT NOT NULL, last_upload INTEGER NOT NULL
+);
+CREATE INDEX changes_string ON changes (language, string, "case", stamp);
+"""
+
+
+class SqliteStore:
+    """
+    Loader and saver of a project in a SQLite data base, a single file with all data of the project.
+    Unlike the xml and json files, the data base is updated in place, and only the modified strings
+    of a language are written (see L{Language.modified_strings}).
+
+    @ivar text_pool: Pool for sharing equal texts of the loaded changes.
+    @type text_pool: L{TextPool}
+
+    @ivar text_ids: Row ids of the texts in the data base, while saving.
+    @type text_ids: C{dict} of L{Text} to C{int}
+    """
+
+    def __init__(self):
+        self.text_pool = TextPool()
+        self.text_ids = {}
+
+    def load_project(self, fname):
+        """
+        Load a project from the given data base.
+
+        @param fname: Name of the data base file.
+        @type  fname: C{str}
+
+        @return: The loaded project.
+        @rtype:  L{Project}
+        """
+        with contextlib.closing(sqlite3.connect(fname)) as conn:
+            values = dict(conn.execute("SELECT key, value FROM project"))
+            assert values["version"] == 1
+            projtype = project_type.project_types[values["projtype"]]
+            project = Project(values["name"], projtype, values["url"])
+            project.last_sweep = values.get("last_sweep")
+
+            texts = {}
+            for text_id, txt, case, stamp in conn.execute('SELECT id, text, "case", stamp FROM texts'):
+                texts[text_id] = self.text_pool.get_text(txt, case, stamp)
+
+            query = "SELECT name, grflangid, plural, gender, cases, pragmas FROM languages"
+            for name, grflangid, plural, gender, cases, pragmas in conn.execute(query):
+                lng = Language(name)
+                lng.grflangid = grflangid
+                lng.plural = plural
+                lng.gender = json.loads(gender) if projtype.allow_gender else []
+                lng.case = json.loads(cases) if projtype.allow_case else [""]
+                lng.custom_pragmas = dict(json.loads(pragmas))
+                project.languages[name] = lng
+
+            # Changes arrive sorted from old to new for each string.
+            lng = None
+            query = (
+                'SELECT language, string, "case", stamp, base_text, new_text, user, last_upload FROM changes'
+                " ORDER BY language, string, stamp"
+            )
+            for lname, sname, case, stamp, base_text, new_text, user, last_upload in conn.execute(query):
+                if not projtype.allow_case and case != "":
+                    continue
+                if lng is None or lng.name != lname:
+                    lng = project.languages[lname]
+
+                new_text = None if new_text is None else texts[new_text]
+                chg = Change(sname, case, texts[base_text], new_text, stamp, user, last_upload != 0)
+                chgs = lng.changes.get(sname)
+                if chgs is None:
+                    lng.changes[sname] = [chg]
+                else:
+                    chgs.append(chg)
+
+            stamp = conn.execute("SELECT max(stamp) FROM changes").fetchone()[0]
+            if stamp is not None:
+                update_last_stamp(stamp)
+
+        for lng in project.languages.values():
+            lng.modified_strings = set()
+
+        baselang = values["baselang"]
+        if baselang is None or baselang not in project.languages:
+            if len(project.languages) > 0:
+                log.warning('Project "%s" has no base language, dropping all translations', project.human_name)
+                project.languages = {}
+            project.base_language = None
+            return project  # Also skip loading the skeleton.
+
+        project.base_language = baselang
+        project.flush_related_cache()
+        project.skeleton = load_skeleton_json(json.loads(values["skeleton"]))
+        return project
+
+    def save_project(self, project, fname):
+        """
+        Save the modified parts of a project in the given data base, in a single transaction.
+        The data base is created if it does not exist.
+
+        @param project: Project to save.
+        @type  project: L{Project}
+
+        @param fname: Name of the data base file.
+        @type  fname: C{str}
+        """
+        with contextlib.closing(sqlite3.connect(fname)) as conn:
+            if conn.execute("SELECT count(*) FROM sqlite_master").fetchone()[0] == 0:
+                conn.executescript(SQLITE_SCHEMA)
+
+            self.text_ids = {}
+            languages = [lng for lng in project.languages.values() if lng.modified]
+            with conn:
+                if project.modified:
+                    blng = project.get_base_language()
+                    values = {
+                        "version": 1,
+                        "name": project.human_name,
+                        "projtype": project.projtype.name,
+                        "url": project.url,
+                        "baselang": None if blng is None else blng.name,
+                        "last_sweep": project.last_sweep,
+                        "skeleton": json.dumps(save_skeleton_json(project.skeleton)),
+                    }
+                    conn.executemany("INSERT OR REPLACE INTO project (key, value) VALUES (?, ?)", values.items())
+
+                    for (lname,) in conn.execute("SELECT name FROM languages").fetchall():
+                        if lname not in project.languages:
+                            conn.execute("DELETE FROM languages WHERE name = ?", (lname,))
+                            conn.execute("DELETE FROM changes WHERE language = ?", (lname,))
+
+                for lng in languages:
+                    self.save_language(conn, lng)
+
+                if project.modified:
+                    # Drop texts that are not used any more.
+                    conn.execute(
+                        "DELETE FROM texts WHERE id NOT IN (SELECT base_text FROM changes"
+                        " UNION SELECT new_text FROM changes WHERE new_text IS NOT NULL)"
+                    )
+
+        self.text_ids = {}
+        for lng in languages:
+            lng.modified_strings = set()
+
+    def save_language(self, conn, lng):
+        """
+        Save a language, and its modified strings.
+
+        @param conn: Connection to the data base.
+        @type  conn: L{sqlite3.Connection}
+
+        @param lng: Language to save.
+        @type  lng: L{Language}
+        """
+        conn.execute(
+            "INSERT OR REPLACE INTO languages (name, grflangid, plural, gender, cases, pragmas)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                lng.name,
+                lng.grflangid,
+                lng.plural,
+                json.dumps(lng.gender),
+                json.dumps(lng.case),
+                json.dumps(sorted(lng.custom_pragmas.items())),
+            ),
+        )
+
+        if lng.modified_strings is None:
+            conn.execute("DELETE FROM changes WHERE language = ?", (lng.name,))
+            snames = list(lng.changes)
+        else:
+            snames = lng.modified_strings
+            conn.executemany(
+                "DELETE FROM changes WHERE language = ? AND string = ?", [(lng.name, sname) for sname in snames]
+            )
+
+        rows = []
+        for sname in snames:
+            chgs = lng.get_changes(sname)
+            if chgs is None:
+                continue  # Deleted string.
+
+            for chg in chgs:
+                base_text = self.get_text_id(conn, chg.base_text)
+                new_text = None if chg.new_text is None else self.get_text_id(conn, chg.new_text)
+                rows.append((lng.name, sname, chg.case, chg.stamp, base_text, new_text, chg.user, int(chg.last_upload)))
+        conn.executemany("INSERT INTO changes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def get_text_id(self, conn, text):
+        """
+        Get the row id of a text in the data base, adding the text if needed.
+
+        @param conn: Connection to the data base.
+        @type  conn: L{sqlite3.Connection}
+
+        @param text: Text to find.
+        @type  text: L{Text}
+
+        @return: Row id of the text.
+        @rtype:  C{int}
+        """
+        text_id = self.text_ids.get(text)
+        if text_id is not None:
+            return text_id
+
+        values = (text.text, text.case, text.stamp)
+        row = conn.execute('SELECT id FROM texts WHERE text = ? AND "case" = ? AND stamp = ?', values).fetchone()
+        if row is None:
+            text_id = conn.execute('INSERT INTO texts (text, "case", stamp) VALUES (?, ?, ?)', values).lastrowid
+        else:
+            text_id = row[0]
+        self.text_ids[text] = text_id
+        return text_id
 
 
 class Project:
@@ -618,6 +930,17 @@ class Project:
                     - 'case'      Cases line
                     - 'gender'    Gender line
                     - 'pragma'    Custom pragma with specific name
+
+    @ivar change_tables: Tables of values referenced by languages with columnar stored changes.
+    @type change_tables: L{ChangeTables}
+
+    @ivar last_sweep: Time of the last sweep over all changes to discard old changes, in seconds since
+                      epoch, if known.
+    @type last_sweep: C{int} or C{None}
+
+    @ivar shared_languages: Names of the languages that are shared with another version of the project,
+                            see L{copy}.
+    @type shared_languages: C{set} of C{str}
     """
 
     def __init__(self, human_name, projtype, url=""):
@@ -632,6 +955,51 @@ class Project:
         self.word_scores = None
 
         self.skeleton = []
+        self.change_tables = ChangeTables()
+        self.last_sweep = None
+        self.shared_languages = set()
+
+    def copy(self):
+        """
+        Make a new version of the project, that can be changed while the current version is still in use.
+        The versions share the languages, a language is copied when it gets changed in the new version,
+        see L{edit_language}.
+
+        @return: The new version of the project.
+        @rtype:  L{Project}
+        """
+        project = copy.copy(self)
+        project.languages = dict(self.languages)
+        project.shared_languages = set(self.languages)
+        return project
+
+    def edit_language(self, name):
+        """
+        Get a language of the project for changing it.
+
+        @param name: Name of the language.
+        @type  name: C{str}
+
+        @return: The language, which is not shared with other versions of the project.
+        @rtype:  L{Language}
+        """
+        lng = self.languages[name]
+        if name in self.shared_languages:
+            lng = lng.copy()
+            self.languages[name] = lng
+            self.shared_languages.discard(name)
+        return lng
+
+    def rebuild_change_tables(self):
+        """
+        Move the columnar stored changes of all languages into new tables, which drops the values that are
+        no longer referenced by any change. Other versions of the project keep using the old tables.
+        """
+        tables = ChangeTables()
+        for lng_name, lng in list(self.languages.items()):
+            if isinstance(lng.changes, PackedChanges):
+                self.edit_language(lng_name).pack_changes(tables)
+        self.change_tables = tables
 
     def set_modified(self):
         """
@@ -667,35 +1035,39 @@ class Project:
         if blng is None:
             return
 
-        self.normalized = {}  # Mapping of string name to its words.
-        for sname, chgs in blng.changes.items():
-            chg = get_newest_change(chgs, "")
+        # Build the map before storing it, as requests reading the project may look at it at the same time.
+        normalized = {}  # Mapping of string name to its words.
+        for sname in blng.changes:
+            chg = blng.get_newest_change(sname, "")
             assert chg is not None
             line = re.sub("{([^}]*)}", " ", chg.base_text.text)
             words = [word.lower() for word in re.split("\\W+", line) if len(word) > 3]
             if len(words) > 0:
-                self.normalized[sname] = words
+                normalized[sname] = words
 
-        self.word_scores = {}
+        word_scores = {}
         # For all words in each string, add the string to the word scores.
-        for sname, words in self.normalized.items():
+        for sname, words in normalized.items():
             for w in words:
-                scores = self.word_scores.get(w)
+                scores = word_scores.get(w)
                 if scores is None:
                     scores = {}
-                    self.word_scores[w] = scores
+                    word_scores[w] = scores
                 scores[sname] = 1.0  # The string has this word.
 
         # To get rid of differences for singular vs plural forms, we also accept
         # substrings of a word too, but at a lower score (namely the fraction of matching).
-        for w, scores in self.word_scores.items():
-            for w2, scores2 in self.word_scores.items():
+        for w, scores in word_scores.items():
+            for w2, scores2 in word_scores.items():
                 if w != w2 and w in w2:
                     # Add the longer words to the short word with a fractional score.
                     for sname2 in scores2:
                         if sname2 not in scores:
                             scores[sname2] = len(w) / len(w2)
 
+        self.normalized = normalized
+        self.word_scores = word_scores
+
     def get_related_strings(self, sname):
         """
         Get the names of the related strings for string L{sname}.
@@ -763,6 +1135,7 @@ def load_project(xloader, node):
     projtype = project_type.project_types[loader.get_opt_DOMattr(node, "projtype", "newgrf")]
     url = node.getAttribute("url")
     project = Project(human_name, projtype, url)
+    project.last_sweep = convert_num(loader.get_opt_DOMattr(node, "last_sweep", None), None)
 
     project.languages = {}
     if not xloader.split_languages:
@@ -792,31 +1165,54 @@ def load_project(xloader, node):
     return project
 
 
-def load_project_json(jloader, node):
+def load_project_json(jloader, reader):
     """
     Load the project from the Json format.
 
     @param jloader: Loader class.
     @type  jloader: L{JsonLoader}
 
-    @param node: Node in Json format containing the project data.
-    @type  node: C{dict}
+    @param reader: Reader of the Json file, at the node containing the project data.
+    @type  reader: L{JsonStreamReader}
 
     @return: The loaded project.
     @rtype:  L{Project}
     """
-    assert node["project_version"] == 1
+    # The text table and the languages are converted while reading, the other fields are stored in the node.
+    # The languages need the project type, and the text table of version 2. These are written before the
+    # languages, else the languages are stored in the node as well, and converted at the end.
+    node = {}
+    languages = {}
+    texts_loaded = False
+    for key in reader.iter_object():
+        if key == "texts" and not jloader.split_languages:
+            jloader.load_texts(reader)
+            texts_loaded = True
+        elif (
+            key == "languages"
+            and not jloader.split_languages
+            and "projtype" in node
+            and (texts_loaded or node.get("project_version") == 1)
+        ):
+            projtype = project_type.project_types[node["projtype"]]
+            for _index in reader.iter_array():
+                lng = load_language_json(jloader, projtype, reader)
+                languages[lng.name] = lng
+        else:
+            node[key] = reader.read_value()
+
+    assert node["project_version"] in (1, 2)
     human_name = node["name"]
     projtype = project_type.project_types[node["projtype"]]
     url = node["url"]
-    project = Project(human_name, projtype, url)
+    if "languages" in node and not jloader.split_languages:
+        for lng_node in node["languages"]:
+            lng = load_language_node_json(jloader, projtype, lng_node)
+            languages[lng.name] = lng
 
-    project.languages = {}
-    if not jloader.split_languages:
-        langnodes = node["languages"]
-        for lnode in langnodes:
-            lng = load_language_json(projtype, lnode)
-            project.languages[lng.name] = lng
+    project = Project(human_name, projtype, url)
+    project.last_sweep = node.get("last_sweep")
+    project.languages = languages
 
     baselang = node["baselang"]
 
@@ -888,6 +1284,8 @@ def save_project(xsaver, proj):
     blng = proj.get_base_language()
     if blng is not None:
         node.setAttribute("baselang", blng.name)
+    if proj.last_sweep is not None:
+        node.setAttribute("last_sweep", str(proj.last_sweep))
 
     # Save languages in alphabetical order
     if not xsaver.split_languages:
@@ -913,7 +1311,7 @@ def save_project_json(jsaver, proj):
     @rtype:  C{dict}
     """
     result = {}
-    result["project_version"] = 1
+    result["project_version"] = 2
     result["name"] = proj.human_name
     result["projtype"] = proj.projtype.name
     result["url"] = proj.url
@@ -922,13 +1320,20 @@ def save_project_json(jsaver, proj):
     if blng is not None:
         blng = blng.name
     result["baselang"] = blng
+    if proj.last_sweep is not None:
+        result["last_sweep"] = proj.last_sweep
 
     if not jsaver.split_languages:
+        # The text table of all languages is filled while saving them, but is written before them.
+        jsaver.texts = {}
+        jsaver.text_nodes = []
+        result["texts"] = jsaver.text_nodes
+
         languages = []
         langs = list(proj.languages.items())
         langs.sort()
         for lang in langs:
-            languages.append(save_language_json(proj.projtype, lang[1]))
+            languages.append(save_language_json(jsaver, proj.projtype, lang[1]))
         result["languages"] = languages
 
     result["skeleton"] = save_skeleton_json(proj.skeleton)
@@ -1035,8 +1440,25 @@ class Language:
     @type modified: C{bool}
 
     @ivar changes: Changes to this language ordered by string name, for strings
-                   that exist in the language.
-    @type changes: C{map} of C{str} to (C{list} of L{Change} or C{None})
+                   that have at least one change in the language. Strings without
+                   changes are absent. The changes of a string are sorted from old to new.
+                   Modify them with L{add_change}, L{update_change}, L{set_changes},
+                   L{set_last_upload} and L{delete_changes} only, to keep L{newest} and
+                   L{modified_strings} up to date. The lists and the changes in them are
+                   replaced rather than changed, as they may be shared with another version of
+                   the language, see L{copy}.
+    @type changes: C{dict} of C{str} to C{list} of L{Change}, or L{PackedChanges}
+
+    @ivar newest: Index of the newest change of each case, ordered by string name. Filled on
+                  demand for strings with changes stored as objects.
+    @type newest: C{dict} of C{str} to C{dict} of C{str} to L{Change}
+
+    @ivar newest_stamp: Time stamp of the newest change in the language, if known.
+    @type newest_stamp: C{int} or C{None}
+
+    @ivar modified_strings: Names of the strings with modified changes since the language was
+                            loaded from or saved to a data base (see L{SqliteStore}), if known.
+    @type modified_strings: C{set} of C{str}, or C{None} if all strings should be considered modified.
 
     @note: L{case} is sorted to make 'download language' output the default case first,
            which makes NML more happy.
@@ -1052,6 +1474,9 @@ class Language:
         self.case = [""]
         self.modified = False
         self.changes = {}
+        self.newest = {}
+        self.newest_stamp = None
+        self.modified_strings = None
 
     def set_modified(self):
         """
@@ -1059,6 +1484,634 @@ class Language:
         """
         self.modified = True
 
+    def copy(self):
+        """
+        Make a new version of the language, that can be changed while the current version is still in use.
+
+        @return: The new version of the language.
+        @rtype:  L{Language}
+        """
+        lng = copy.copy(self)
+        lng.custom_pragmas = dict(self.custom_pragmas)
+        lng.gender = list(self.gender)
+        lng.case = list(self.case)
+        lng.changes = self.changes.copy()
+        lng.newest = {}
+        if self.modified_strings is not None:
+            lng.modified_strings = set(self.modified_strings)
+        return lng
+
+    def add_change(self, chg):
+        """
+        Add a change to the language.
+
+        @param chg: Change to add.
+        @type  chg: L{Change}
+        """
+        chgs = self.changes.get(chg.string_name)
+        if chgs is None:
+            self.changes[chg.string_name] = [chg]
+        else:
+            chgs = list(chgs)
+            bisect.insort(chgs, chg, key=get_change_stamp)
+            self.changes[chg.string_name] = chgs
+
+        newest = self.newest.get(chg.string_name)
+        if newest is not None:
+            best = newest.get(chg.case)
+            if best is None or not chg.stamp < best.stamp:
+                newest[chg.case] = chg
+
+        if self.newest_stamp is not None and self.newest_stamp < chg.stamp:
+            self.newest_stamp = chg.stamp
+
+        if self.modified_strings is not None:
+            self.modified_strings.add(chg.string_name)
+
+    def update_change(self, chg, stamp, user, base_text=None):
+        """
+        Replace an existing change of the language by a change with a new time stamp and user.
+
+        @param chg: Change to update, must be obtained from L{changes}.
+        @type  chg: L{Change}
+
+        @param stamp: New time stamp of the change.
+        @type  stamp: C{int}
+
+        @param user: User making the change.
+        @type  user: C{str}
+
+        @param base_text: New base text of the change, if it changes.
+        @type  base_text: L{Text} or C{None}
+
+        @return: The new change.
+        @rtype:  L{Change}
+        """
+        if base_text is None:
+            base_text = chg.base_text
+        new_chg = Change(chg.string_name, chg.case, base_text, chg.new_text, stamp, user, chg.last_upload)
+        self.changes[chg.string_name] = [c for c in self.changes[chg.string_name] if c is not chg]
+        self.add_change(new_chg)
+        self.newest.pop(chg.string_name, None)
+        return new_chg
+
+    def set_changes(self, sname, chgs):
+        """
+        Replace the changes of a string.
+
+        @param sname: Name of the string.
+        @type  sname: C{str}
+
+        @param chgs: New changes of the string, sorted from old to new.
+        @type  chgs: C{list} of L{Change}
+        """
+        self.changes[sname] = chgs
+        self.newest.pop(sname, None)
+        self.newest_stamp = None
+        if self.modified_strings is not None:
+            self.modified_strings.add(sname)
+
+    def set_last_upload(self, chg):
+        """
+        Make a change the last uploaded change of its string.
+
+        @param chg: Change to mark, must be obtained from L{changes}.
+        @type  chg: L{Change}
+        """
+        chgs = []
+        for c in self.changes[chg.string_name]:
+            if c.last_upload != (c is chg):
+                c = Change(c.string_name, c.case, c.base_text, c.new_text, c.stamp, c.user, c is chg)
+            chgs.append(c)
+        self.changes[chg.string_name] = chgs
+        self.newest.pop(chg.string_name, None)
+
+        if self.modified_strings is not None:
+            self.modified_strings.add(chg.string_name)
+
+    def delete_changes(self, sname):
+        """
+        Delete all changes of a string.
+
+        @param sname: Name of the string.
+        @type  sname: C{str}
+        """
+        del self.changes[sname]
+        self.newest.pop(sname, None)
+        self.newest_stamp = None
+        if self.modified_strings is not None:
+            self.modified_strings.add(sname)
+
+    def _get_newest_index(self, sname):
+        """
+        Get the newest change of each case of a string from the index.
+
+        @param sname: Name of the string.
+        @type  sname: C{str}
+
+        @return: Newest change of each case that has changes, if the string has changes.
+                 The result should not be modified.
+        @rtype:  C{dict} of C{str} to L{Change}, or C{None}
+        """
+        newest = self.newest.get(sname)
+        if newest is not None:
+            return newest
+
+        if isinstance(self.changes, PackedChanges) and sname not in self.changes.live:
+            # Don't keep objects of columnar stored changes.
+            return self.changes.read_newest(sname)
+
+        chgs = self.changes.get(sname)
+        if chgs is None:
+            return None
+
+        newest = {}
+        for chg in chgs:
+            newest[chg.case] = chg
+        self.newest[sname] = newest
+        return newest
+
+    def get_newest_change(self, sname, case):
+        """
+        Get the newest change of a string in a case.
+
+        @param sname: Name of the string.
+        @type  sname: C{str}
+
+        @param case: Case of the string.
+        @type  case: C{str}
+
+        @return: The newest change, if available.
+        @rtype:  L{Change} or C{None}
+        """
+        newest = self._get_newest_index(sname)
+        if newest is None:
+            return None
+        return newest.get(case)
+
+    def get_all_newest_changes(self, sname):
+        """
+        Get the newest changes for all cases of a string.
+
+        @param sname: Name of the string.
+        @type  sname: C{str}
+
+        @return: Newest change for each case of the language (C{None} if the case has no
+                 change), if the string has changes.
+        @rtype:  C{dict} of C{str} to (L{Change} or C{None}), or C{None}
+        """
+        newest = self._get_newest_index(sname)
+        if newest is None:
+            return None
+        cases = dict((c, newest.get(c)) for c in self.case)
+        cases[""] = newest.get("")
+        return cases
+
+    def get_newest_stamp(self):
+        """
+        Get the time stamp of the newest change in the language.
+
+        @return: Time stamp of the newest change, if there are changes.
+        @rtype:  C{int} or C{None}
+        """
+        if self.newest_stamp is None:
+            if isinstance(self.changes, PackedChanges):
+                self.newest_stamp = self.changes.get_newest_stamp()
+            else:
+                for chgs in self.changes.values():
+                    if self.newest_stamp is None or self.newest_stamp < chgs[-1].stamp:
+                        self.newest_stamp = chgs[-1].stamp
+        return self.newest_stamp
+
+    def get_string_version(self, sname):
+        """
+        Get the version of a string, which changes with every change of the string in the language.
+
+        @param sname: Name of the string.
+        @type  sname: C{str}
+
+        @return: Time stamp of the newest change of the string, or C{0} if it has no changes.
+        @rtype:  C{int}
+        """
+        chgs = self.get_changes(sname)
+        if chgs is None or len(chgs) == 0:
+            return 0
+        return chgs[-1].stamp
+
+    def get_changes(self, sname):
+        """
+        Get the changes of a string for inspection. Unlike C{changes.get(sname)}, this does not
+        convert columnar stored changes to objects that are kept, so the result should not be modified.
+
+        @param sname: Name of the string.
+        @type  sname: C{str}
+
+        @return: The changes of the string, if it has any.
+        @rtype:  C{list} of L{Change} or C{None}
+        """
+        if isinstance(self.changes, PackedChanges):
+            return self.changes.read(sname)
+        return self.changes.get(sname)
+
+    def pack_changes(self, tables):
+        """
+        Move the changes of the language into columnar storage.
+
+        @param tables: Tables of the project for the values referenced by the columns.
+        @type  tables: L{ChangeTables}
+        """
+        if isinstance(self.changes, PackedChanges):
+            self.changes.compact(tables)
+        else:
+            self.changes = PackedChanges(tables, self.changes)
+        self.newest = {}
+
+
+class IdTable:
+    """
+    Table assigning a number to each added value, so the value can be referenced by its number.
+
+    @ivar values: Added values, ordered by their number.
+    @type values: C{list}
+
+    @ivar ids: Numbers of the added values.
+    @type ids: C{dict} of value to C{int}
+    """
+
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def get_id(self, value):
+        """
+        Get the number of a value, adding the value to the table if needed.
+
+        @param value: Value to find.
+        @type  value: Any hashable value
+
+        @return: Number of the value.
+        @rtype:  C{int}
+        """
+        num = self.ids.get(value)
+        if num is None:
+            num = len(self.values)
+            self.values.append(value)
+            self.ids[value] = num
+        return num
+
+    def find_id(self, value):
+        """
+        Get the number of a value, if it exists in the table.
+
+        @param value: Value to find.
+        @type  value: Any hashable value
+
+        @return: Number of the value, if it exists.
+        @rtype:  C{int} or C{None}
+        """
+        return self.ids.get(value)
+
+
+class ChangeTables:
+    """
+    Project-wide tables of the values referenced from L{PackedChanges} columns.
+
+    @ivar string_names: Table of string names.
+    @type string_names: L{IdTable} of C{str}
+
+    @ivar cases: Table of cases.
+    @type cases: L{IdTable} of C{str}
+
+    @ivar texts: Table of texts (including C{None} for a missing new text).
+    @type texts: L{IdTable} of (L{Text} or C{None})
+
+    @ivar users: Table of user names.
+    @type users: L{IdTable} of (C{str} or C{None})
+    """
+
+    def __init__(self):
+        self.string_names = IdTable()
+        self.cases = IdTable()
+        self.texts = IdTable()
+        self.users = IdTable()
+
+
+class PackedChanges(collections.abc.MutableMapping):
+    """
+    Columnar storage of the changes of a language, with the same interface as a C{dict} of
+    string names to lists of L{Change}.
+
+    Each change is a row in a set of parallel arrays. Rows are grouped by string number, and
+    ordered by time stamp within a string. Strings accessed through the mapping interface are
+    converted to L{Change} objects and kept in L{live} until the next L{compact}, such that
+    modifying them works as with a normal C{dict}. Use L{read} to inspect the changes of a
+    string without keeping objects around.
+
+    @ivar tables: Tables of the project for the values referenced by the columns.
+    @type tables: L{ChangeTables}
+
+    @ivar sids: String name number of each row.
+    @type sids: C{array} of C{int}
+
+    @ivar case_ids: Case number of each row.
+    @type case_ids: C{array} of C{int}
+
+    @ivar base_ids: Base text number of each row.
+    @type base_ids: C{array} of C{int}
+
+    @ivar new_ids: New text number of each row.
+    @type new_ids: C{array} of C{int}
+
+    @ivar stamps: Time stamp of each row.
+    @type stamps: C{array} of C{int}
+
+    @ivar user_ids: User number of each row.
+    @type user_ids: C{array} of C{int}
+
+    @ivar last_uploads: Last upload flag of each row.
+    @type last_uploads: C{array} of C{int}
+
+    @ivar live: Strings with their changes as objects, taken from the rows or added after the
+                last compaction.
+    @type live: C{dict} of C{str} to C{list} of L{Change}
+
+    @ivar hidden: Numbers of strings in the rows that are deleted or moved to L{live}.
+    @type hidden: C{set} of C{int}
+
+    @ivar num_packed: Number of different strings in the rows.
+    @type num_packed: C{int}
+    """
+
+    def __init__(self, tables, changes):
+        self.tables = tables
+        self.live = dict(changes)
+        self.hidden = set()
+        self._set_rows([])
+        self.compact()
+
+    def _set_rows(self, rows):
+        """
+        Replace the columns with the provided rows.
+
+        @param rows: Rows sorted on string number and time stamp.
+        @type  rows: C{list} of C{tuple} (sid, stamp, case id, base id, new id, user id, last upload)
+        """
+        self.sids = array.array("l", (r[0] for r in rows))
+        self.stamps = array.array("q", (r[1] for r in rows))
+        self.case_ids = array.array("l", (r[2] for r in rows))
+        self.base_ids = array.array("l", (r[3] for r in rows))
+        self.new_ids = array.array("l", (r[4] for r in rows))
+        self.user_ids = array.array("l", (r[5] for r in rows))
+        self.last_uploads = array.array("b", (r[6] for r in rows))
+
+        self.num_packed = 0
+        prev = None
+        for sid in self.sids:
+            if sid != prev:
+                self.num_packed = self.num_packed + 1
+                prev = sid
+
+    def compact(self, tables=None):
+        """
+        Move all changes in L{live} into the columns.
+
+        @param tables: Tables for the values referenced by the columns from now on, if not the current tables.
+        @type  tables: L{ChangeTables} or C{None}
+        """
+        old_tables = self.tables
+        if tables is None:
+            tables = old_tables
+        if tables is old_tables and len(self.live) == 0 and len(self.hidden) == 0:
+            return
+
+        rows = []
+        for i, sid in enumerate(self.sids):
+            if sid in self.hidden:
+                continue
+            if tables is old_tables:
+                rows.append(
+                    (
+                        sid,
+                        self.stamps[i],
+                        self.case_ids[i],
+                        self.base_ids[i],
+                        self.new_ids[i],
+                        self.user_ids[i],
+                        self.last_uploads[i],
+                    )
+                )
+            else:
+                rows.append(
+                    (
+                        tables.string_names.get_id(old_tables.string_names.values[sid]),
+                        self.stamps[i],
+                        tables.cases.get_id(old_tables.cases.values[self.case_ids[i]]),
+                        tables.texts.get_id(old_tables.texts.values[self.base_ids[i]]),
+                        tables.texts.get_id(old_tables.texts.values[self.new_ids[i]]),
+                        tables.users.get_id(old_tables.users.values[self.user_ids[i]]),
+                        self.last_uploads[i],
+                    )
+                )
+
+        self.tables = tables
+        for sname, chgs in self.live.items():
+            sid = tables.string_names.get_id(sname)
+            for chg in chgs:
+                rows.append(
+                    (
+                        sid,
+                        chg.stamp,
+                        tables.cases.get_id(chg.case),
+                        tables.texts.get_id(chg.base_text),
+                        tables.texts.get_id(chg.new_text),
+                        tables.users.get_id(chg.user),
+                        1 if chg.last_upload else 0,
+                    )
+                )
+        rows.sort(key=lambda r: (r[0], r[1]))
+
+        self.live = {}
+        self.hidden = set()
+        self._set_rows(rows)
+
+    def copy(self):
+        """
+        Make a copy that can be changed independently. The columns are shared, they are replaced rather
+        than changed by L{compact}.
+
+        @return: The copy of the changes.
+        @rtype:  L{PackedChanges}
+        """
+        changes = copy.copy(self)
+        changes.live = dict(self.live)
+        changes.hidden = set(self.hidden)
+        return changes
+
+    def _find_rows(self, sname):
+        """
+        Find the rows of a string.
+
+        @param sname: Name of the string.
+        @type  sname: C{str}
+
+        @return: Start and end index of the rows of the string (both equal if there are none).
+        @rtype:  C{int}, C{int}
+        """
+        sid = self.tables.string_names.find_id(sname)
+        if sid is None or sid in self.hidden:
+            return 0, 0
+        start = bisect.bisect_left(self.sids, sid)
+        end = bisect.bisect_right(self.sids, sid, start)
+        return start, end
+
+    def _make_changes(self, sname, start, end):
+        """
+        Construct change objects of a range of rows.
+
+        @param sname: Name of the string.
+        @type  sname: C{str}
+
+        @param start: First row of the string.
+        @type  start: C{int}
+
+        @param end: One beyond the last row of the string.
+        @type  end: C{int}
+
+        @return: The changes of the rows.
+        @rtype:  C{list} of L{Change}
+        """
+        tables = self.tables
+        texts = tables.texts.values
+        return [
+            Change(
+                sname,
+                tables.cases.values[self.case_ids[i]],
+                texts[self.base_ids[i]],
+                texts[self.new_ids[i]],
+                self.stamps[i],
+                tables.users.values[self.user_ids[i]],
+                self.last_uploads[i] != 0,
+            )
+            for i in range(start, end)
+        ]
+
+    def read(self, sname):
+        """
+        Get the changes of a string without keeping the constructed objects.
+
+        @param sname: Name of the string.
+        @type  sname: C{str}
+
+        @return: Changes of the string, if it has any.
+        @rtype:  C{list} of L{Change} or C{None}
+        """
+        chgs = self.live.get(sname)
+        if chgs is not None:
+            return chgs
+        start, end = self._find_rows(sname)
+        if start == end:
+            return None
+        return self._make_changes(sname, start, end)
+
+    def read_newest(self, sname):
+        """
+        Get the newest change of each case of a string, without keeping the constructed objects.
+
+        @param sname: Name of the string.
+        @type  sname: C{str}
+
+        @return: Newest change of each case that has changes, if the string has changes.
+        @rtype:  C{dict} of C{str} to L{Change}, or C{None}
+        """
+        chgs = self.live.get(sname)
+        if chgs is not None:
+            return dict((chg.case, chg) for chg in chgs)
+
+        start, end = self._find_rows(sname)
+        if start == end:
+            return None
+
+        newest = {}
+        cases = set()
+        for i in range(end - 1, start - 1, -1):
+            case_id = self.case_ids[i]
+            if case_id not in cases:
+                cases.add(case_id)
+                chg = self._make_changes(sname, i, i + 1)[0]
+                newest[chg.case] = chg
+        return newest
+
+    def get_newest_stamp(self):
+        """
+        Get the time stamp of the newest change.
+
+        @return: Time stamp of the newest change, if there are changes.
+        @rtype:  C{int} or C{None}
+        """
+        best = None
+        if len(self.hidden) == 0:
+            if len(self.stamps) > 0:
+                best = max(self.stamps)
+        else:
+            for i, sid in enumerate(self.sids):
+                if sid not in self.hidden and (best is None or best < self.stamps[i]):
+                    best = self.stamps[i]
+
+        for chgs in self.live.values():
+            if best is None or best < chgs[-1].stamp:
+                best = chgs[-1].stamp
+        return best
+
+    def __getitem__(self, sname):
+        chgs = self.live.get(sname)
+        if chgs is not None:
+            return chgs
+        start, end = self._find_rows(sname)
+        if start == end:
+            raise KeyError(sname)
+        chgs = self._make_changes(sname, start, end)
+        self.live[sname] = chgs
+        self.hidden.add(self.sids[start])
+        return chgs
+
+    def __setitem__(self, sname, chgs):
+        start, end = self._find_rows(sname)
+        if start != end:
+            self.hidden.add(self.sids[start])
+        self.live[sname] = chgs
+
+    def __delitem__(self, sname):
+        start, end = self._find_rows(sname)
+        if start != end:
+            self.hidden.add(self.sids[start])
+        elif sname not in self.live:
+            raise KeyError(sname)
+        self.live.pop(sname, None)
+
+    def __contains__(self, sname):
+        if sname in self.live:
+            return True
+        start, end = self._find_rows(sname)
+        return start != end
+
+    def __iter__(self):
+        live = list(self.live)
+        hidden = set(self.hidden)
+        yield from live
+        names = self.tables.string_names.values
+        prev = None
+        for sid in self.sids:
+            if sid != prev:
+                prev = sid
+                if sid not in hidden:
+                    yield names[sid]
+
+    def __len__(self):
+        return self.num_packed - len(self.hidden) + len(self.live)
+
 
 def save_language(xsaver, projtype, lang):
     """
@@ -1103,21 +2156,22 @@ def save_language(xsaver, projtype, lang):
         node.appendChild(pragma_node)
 
     # Sort the strings of the language.
-    changes = list(lang.changes.items())
-    changes.sort()
-    for chgs in changes:
-        chgs[1].sort()  # Sort changes
-        for chg in chgs[1]:
+    for sname in sorted(lang.changes):
+        chgs = lang.get_changes(sname)
+        for chg in chgs:
             cnode = save_change(xsaver, projtype, chg)
             if cnode is not None:
                 node.appendChild(cnode)
     return node
 
 
-def save_language_json(projtype, lang):
+def save_language_json(jsaver, projtype, lang):
     """
     Save the language to Json.
 
+    @param jsaver: Saver class.
+    @type  jsaver: L{JsonSaver}
+
     @param projtype: Project type.
     @type  projtype: L{ProjectType}
 
@@ -1128,7 +2182,7 @@ def save_language_json(projtype, lang):
     @rtype:  C{dict}
     """
     result = {}
-    result["language_version"] = 1
+    result["language_version"] = 2
     result["name"] = lang.name
     result["grflangid"] = lang.grflangid
     result["plural"] = lang.plural
@@ -1144,13 +2198,15 @@ def save_language_json(projtype, lang):
     custom_pragmas.sort()
     result["pragma"] = custom_pragmas
 
+    if jsaver.split_languages:
+        # The text table is filled while saving the changes, but is written before them.
+        result["texts"] = jsaver.text_nodes
+
     res_changes = []
-    changes = list(lang.changes.items())
-    changes.sort()
-    for chgs in changes:
-        chgs[1].sort()  # Sort changes
-        for chg in chgs[1]:
-            cnode = save_change_json(projtype, chg)
+    for sname in sorted(lang.changes):
+        chgs = lang.get_changes(sname)
+        for chg in chgs:
+            cnode = save_change_json(jsaver, projtype, chg)
             if cnode is not None:
                 res_changes.append(cnode)
     result["change"] = res_changes
@@ -1212,30 +2268,94 @@ def load_language(xloader, projtype, node):
         change = load_change(xloader, ch_node)
         if not projtype.allow_case and change.case != "":
             continue
-        chgs = lng.changes.get(change.string_name)
-        if chgs is None:
-            lng.changes[change.string_name] = [change]
-        else:
-            chgs.append(change)
+        lng.add_change(change)
 
     return lng
 
 
-def load_language_json(projtype, node):
+def load_language_json(jloader, projtype, reader):
     """
     Load a language from the given Json node.
 
+    @param jloader: Loader helper.
+    @type  jloader: L{JsonLoader}
+
     @param projtype: Project type.
     @type  projtype: L{ProjectType}
 
-    @param node: Node containing the language.
+    @param reader: Reader of the Json file, at the node containing the language.
+    @type  reader: L{JsonStreamReader}
+
+    @return: The loaded language.
+    @rtype:  L{Language}
+    """
+    # The text table and the changes are converted while reading, the other fields are stored in the node.
+    # The changes need the language version, and the text table of version 2 in a language file. These are
+    # written before the changes, else the changes are stored in the node as well, and converted at the end.
+    node = {}
+    changes = None
+    texts_loaded = not jloader.split_languages  # The text table of the project is loaded already.
+    for key in reader.iter_object():
+        if key == "texts" and jloader.split_languages:
+            jloader.load_texts(reader)
+            texts_loaded = True
+        elif key == "change" and "language_version" in node and (texts_loaded or node["language_version"] == 1):
+            version = node["language_version"]
+            changes = [load_change_json(jloader, version, reader.read_value()) for _index in reader.iter_array()]
+        else:
+            node[key] = reader.read_value()
+
+    return load_language_node_json(jloader, projtype, node, changes)
+
+
+def load_language_node_json(jloader, projtype, node, changes=None):
+    """
+    Construct a language from the fields of its Json node.
+
+    @param jloader: Loader helper.
+    @type  jloader: L{JsonLoader}
+
+    @param projtype: Project type.
+    @type  projtype: L{ProjectType}
+
+    @param node: Fields of the node containing the language.
     @type  node: C{dict}
 
+    @param changes: Changes of the language converted while reading the node, if not stored in the node.
+    @type  changes: C{list} of L{Change} or C{None}
+
     @return: The loaded language.
     @rtype:  L{Language}
     """
+    if changes is None:
+        version = node["language_version"]
+        changes = [load_change_json(jloader, version, chg_node) for chg_node in node["change"]]
+
+    lng = make_language_json(projtype, node)
+    lng.changes = {}
+    for change in changes:
+        if not projtype.allow_case and change.case != "":
+            continue
+        lng.add_change(change)
+    return lng
+
+
+def make_language_json(projtype, node):
+    """
+    Construct a language from the fields of its Json node, except its changes.
+
+    @param projtype: Project type.
+    @type  projtype: L{ProjectType}
+
+    @param node: Fields of the node containing the language.
+    @type  node: C{dict}
+
+    @return: The language, without changes.
+    @rtype:  L{Language}
+    """
     assert "language_version" in node
-    assert node["language_version"] == 1
+    version = node["language_version"]
+    assert version in (1, 2)
 
     lng = Language(node["name"])
 
@@ -1264,18 +2384,6 @@ def load_language_json(projtype, node):
 
     assert isinstance(node["pragma"], list)
     lng.custom_pragmas = dict(node["pragma"])
-
-    lng.changes = {}
-    for ch_node in node["change"]:
-        change = load_change_json(ch_node)
-        if not projtype.allow_case and change.case != "":
-            continue
-        chgs = lng.changes.get(change.string_name)
-        if chgs is None:
-            lng.changes[change.string_name] = [change]
-        else:
-            chgs.append(change)
-
     return lng
 
 
@@ -1298,8 +2406,8 @@ class Change:
                     adding a new base language string).
     @type new_text: C{None} or L{Text}
 
-    @ivar stamp: Time stamp of the change.
-    @type stamp: L{Stamp}
+    @ivar stamp: Time stamp of the change (see L{make_stamp}).
+    @type stamp: C{int}
 
     @ivar user: User making the change, if known.
     @type user: C{str} or C{None}
@@ -1309,6 +2417,8 @@ class Change:
     @type last_upload: C{bool}
 
     @note: There is at most one L{last_upload} change for each string in each language.
+    @note: A change is not modified after it is added to a language, as it may be shared by several
+           versions of the language.
     """
 
     __slots__ = ("string_name", "case", "base_text", "new_text", "stamp", "user", "last_upload")
@@ -1337,6 +2447,9 @@ class Change:
         return self.stamp == other.stamp
 
 
+get_change_stamp = operator.attrgetter("stamp")  # Sort key of changes, from old to new.
+
+
 def save_change(xsaver, projtype, change):
     """
     Save a change.
@@ -1381,10 +2494,13 @@ def save_change(xsaver, projtype, change):
     return node
 
 
-def save_change_json(projtype, change):
+def save_change_json(jsaver, projtype, change):
     """
     Save a change in Json format.
 
+    @param jsaver: Saver class.
+    @type  jsaver: L{JsonSaver}
+
     @param projtype: Project type.
     @type  projtype: L{ProjectType}
 
@@ -1394,13 +2510,13 @@ def save_change_json(projtype, change):
     @return: Node containing the change, if it was allowed to create.
     @rtype:  C{list} or C{None}
     """
-    # Never generate shared strings.
-    base_text = make_text_node_json(change.base_text)
+    # Texts are stored in the text table of the file.
+    base_text = jsaver.get_textref(change.base_text)
 
     if change.new_text is None:
         new_text = None
     else:
-        new_text = make_text_node_json(change.new_text)
+        new_text = jsaver.get_textref(change.new_text)
 
     snode = save_stamp_json(change.stamp)
     node = [change.string_name, change.last_upload, change.case, change.user, base_text, new_text, snode]
@@ -1445,10 +2561,17 @@ def load_change(xloader, node):
     return Change(strname, case, base_text, new_text, stamp, user, last_upload == "true")
 
 
-def load_change_json(node):
+def load_change_json(jloader, version, node):
     """
     Load a change.
 
+    @param jloader: Loader helper.
+    @type  jloader: L{JsonLoader}
+
+    @param version: Version of the language format. Version 1 has the texts in the change,
+                    later versions refer to the text table of the file.
+    @type  version: C{int}
+
     @param node: Node containing the change.
     @type  node: C{list}
 
@@ -1460,50 +2583,200 @@ def load_change_json(node):
     last_upload = node[1]
     case = node[2]
     user = node[3]
-    base_text = get_text_node_json(node[4])
-
+    base_text = node[4]
     new_text = node[5]
-    if new_text is not None:
-        new_text = get_text_node_json(new_text)
+    if version == 1:
+        base_text = get_text_node_json(jloader, base_text)
+        if new_text is not None:
+            new_text = get_text_node_json(jloader, new_text)
+    else:
+        base_text = jloader.texts[base_text]
+        if new_text is not None:
+            new_text = jloader.texts[new_text]
 
     stamp = load_stamp_json(node[6])
     return Change(strname, case, base_text, new_text, stamp, user, last_upload)
 
 
-class Text:
+class TextContent:
     """
-    Text of a string in a language.
+    Actual text and case of a L{Text}, without its time stamp. Equal contents of all loaded projects share a
+    single object, see L{TextContentPool}.
 
     @ivar text: The actual text.
     @type text: C{str}
 
-    @ivar case: Case of this string.
+    @ivar case: Case of the text.
     @type case: C{str}
-
-    @ivar stamp: Time stamp of creation of this text.
-    @type stamp: L{Stamp}
     """
 
-    __slots__ = ("text", "case", "stamp")
+    __slots__ = ("text", "case", "__weakref__")
 
-    def __init__(self, text, case, stamp):
+    def __init__(self, text, case):
         self.text = sys.intern(text)
         self.case = sys.intern(case)
+
+    def __eq__(self, other):
+        if not isinstance(other, TextContent):
+            return False
+        return self.text == other.text and self.case == other.case
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.text) + hash(self.case)
+
+
+class TextContentPool:
+    """
+    Process-wide pool of the contents of the texts, shared by all loaded projects. The pool refers weakly to
+    its contents, a content disappears from the pool when no text uses it any more.
+
+    @ivar contents: Contents in the pool, as weak references to the contents. As a reference compares and
+                    hashes like its content, a new content finds the reference to an equal content.
+    @type contents: C{dict} of L{weakref.ref} to L{weakref.ref}
+
+    @ivar lookups: Number of requested contents, counted without locking, so it may miss a few.
+    @type lookups: C{int}
+
+    @ivar hits: Number of requested contents that were already available in the pool, counted without
+                locking, so it may miss a few.
+    @type hits: C{int}
+    """
+
+    def __init__(self):
+        self.contents = {}
+        self.lookups = 0
+        self.hits = 0
+        self._remove = self.remove  # Avoid creating a bound method for each reference.
+
+    def remove(self, ref):
+        """
+        Remove the reference to a deleted content. A reference to a deleted content only equals itself.
+
+        @param ref: Reference to remove.
+        @type  ref: L{weakref.ref}
+        """
+        self.contents.pop(ref, None)
+
+    def get_content(self, text, case):
+        """
+        Get the shared content object of a text.
+
+        @param text: The actual text.
+        @type  text: C{str}
+
+        @param case: Case of the text.
+        @type  case: C{str}
+
+        @return: The content, shared with equal contents of all loaded projects.
+        @rtype:  L{TextContent}
+        """
+        self.lookups = self.lookups + 1
+        content = TextContent(text, case)
+        ref = weakref.ref(content, self._remove)
+        while True:
+            known = self.contents.setdefault(ref, ref)
+            if known is ref:
+                return content
+
+            known_content = known()
+            if known_content is not None:
+                self.hits = self.hits + 1
+                return known_content
+            self.remove(known)  # Deleted meanwhile, its callback has not run yet.
+
+    def __len__(self):
+        return len(self.contents)
+
+
+text_contents = TextContentPool()
+
+
+class Text:
+    """
+    Text of a string in a language.
+
+    @ivar content: Actual text and case, shared with equal texts.
+    @type content: L{TextContent}
+
+    @ivar stamp: Time stamp of creation of this text (see L{make_stamp}).
+    @type stamp: C{int}
+    """
+
+    __slots__ = ("content", "stamp")
+
+    def __init__(self, text, case, stamp):
+        self.content = text_contents.get_content(text, case)
         self.stamp = stamp
 
+    @property
+    def text(self):
+        """
+        The actual text.
+
+        @rtype: C{str}
+        """
+        return self.content.text
+
+    @property
+    def case(self):
+        """
+        Case of this string.
+
+        @rtype: C{str}
+        """
+        return self.content.case
+
     def __str__(self):
         return "Text(text={!r}, case={!r})".format(self.text, self.case)
 
     def __eq__(self, other):
         if not isinstance(other, Text):
             return False
-        return self.text == other.text and self.case == other.case and self.stamp == other.stamp
+        return self.stamp == other.stamp and self.content == other.content
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __hash__(self):
-        return hash(self.text) + hash(self.case) + hash(self.stamp)
+        return hash(self.content) + self.stamp
+
+
+class TextPool:
+    """
+    Pool of loaded texts, so equal texts share a single object. The pool keeps its texts alive, until the pool
+    is deleted.
+
+    @ivar texts: Texts in the pool.
+    @type texts: C{dict} of L{Text} to L{Text}
+    """
+
+    def __init__(self):
+        self.texts = {}
+
+    def get_text(self, text, case, stamp):
+        """
+        Get the text object of a loaded text.
+
+        @param text: The actual text.
+        @type  text: C{str}
+
+        @param case: Case of the text.
+        @type  case: C{str}
+
+        @param stamp: Time stamp of creation of the text.
+        @type  stamp: C{int}
+
+        @return: The text object, shared with equal texts loaded before.
+        @rtype:  L{Text}
+        """
+        txt = Text(text, case, stamp)
+        return self.texts.setdefault(txt, txt)
+
+    def __len__(self):
+        return len(self.texts)
 
 
 def make_text_node(xmlsaver, text, name, number):
@@ -1554,7 +2827,6 @@ def make_text_node_json(text):
     @return: Node containing the text.
     @rtype:  C{list}
     """
-    # Never generate shared text.
     stamp = save_stamp_json(text.stamp)
     node = [text.case, text.text, stamp]
     return node
@@ -1594,13 +2866,16 @@ def get_text_node(xloader, node):
     txt = loader.get_single_child_node(node, "text")
     txt = loader.collect_text_DOM(txt)
     txt = language_file.sanitize_text(txt)
-    return Text(txt, case, stamp)
+    return xloader.text_pool.get_text(txt, case, stamp)
 
 
-def get_text_node_json(node):
+def get_text_node_json(jloader, node):
     """
     Load text node (written by L{make_text_node_json}).
 
+    @param jloader: Loader helper.
+    @type  jloader: L{JsonLoader}
+
     @param node: Text node to load.
     @type  node: C{list}
 
@@ -1612,7 +2887,7 @@ def get_text_node_json(node):
     txt = node[1]
     txt = language_file.sanitize_text(txt)
     stamp = load_stamp_json(node[2])
-    return Text(txt, case, stamp)
+    return jloader.text_pool.get_text(txt, case, stamp)
 
 
 def get_text(xloader, ref):
@@ -1631,10 +2906,41 @@ def get_text(xloader, ref):
     return xloader.get_textref(ref)
 
 
-@functools.total_ordering
+STAMP_NUMBER_BITS = 24  # Number of bits of the index number in a time stamp.
+
+
+def pack_stamp(seconds, number):
+    """
+    Construct a time stamp from its parts.
+
+    @param seconds: Time in seconds since epoch.
+    @type  seconds: C{int}
+
+    @param number: Index number, to allow more than one operation in a second.
+    @type  number: C{int}
+
+    @return: The time stamp. Time stamps are ordered in time by their value.
+    @rtype:  C{int}
+    """
+    return (seconds << STAMP_NUMBER_BITS) | number
+
+
+def get_stamp_seconds(stamp):
+    """
+    Get the time of a time stamp.
+
+    @param stamp: Time stamp to examine.
+    @type  stamp: C{int}
+
+    @return: Time in seconds since epoch.
+    @rtype:  C{int}
+    """
+    return stamp >> STAMP_NUMBER_BITS
+
+
 class Stamp:
     """
-    Time stamp.
+    View on the parts of a time stamp, for display.
 
     @ivar seconds: Time in seconds since epoch.
     @type seconds: C{int}
@@ -1645,29 +2951,38 @@ class Stamp:
 
     __slots__ = ("seconds", "number")
 
-    def __init__(self, seconds, number):
-        self.seconds = seconds
-        self.number = number
-
-    def __lt__(self, other):
-        if not isinstance(other, Stamp):
-            return False
-        return self.seconds < other.seconds or (self.seconds == other.seconds and self.number < other.number)
-
-    def __eq__(self, other):
-        if not isinstance(other, Stamp):
-            return False
-        return self.seconds == other.seconds and self.number == other.number
+    def __init__(self, stamp):
+        self.seconds = stamp >> STAMP_NUMBER_BITS
+        self.number = stamp & ((1 << STAMP_NUMBER_BITS) - 1)
 
     def __str__(self):
         return time.asctime(time.gmtime(self.seconds))
 
-    def __hash__(self):
-        return (self.seconds << 4) | self.number
-
 
 last_stamp = 0  # A loooooong time ago.
-last_index = -1
+stamp_lock = threading.Lock()  # Lock for changing L{last_stamp}.
+
+# Processes making stamps at the same time each use their own stamps, the stamps of a process modulo
+# 'stamp_step' equal 'stamp_offset'.
+stamp_offset = 0
+stamp_step = 1
+
+
+def set_stamp_sequence(offset, step):
+    """
+    Restrict the time stamps made by this process, to keep them unique among a number of processes.
+
+    @param offset: Index of the process, from C{0} up to L{step}.
+    @type  offset: C{int}
+
+    @param step: Number of processes making time stamps.
+    @type  step: C{int}
+    """
+    global stamp_offset, stamp_step
+
+    assert 0 <= offset < step
+    stamp_offset = offset
+    stamp_step = step
 
 
 def make_stamp():
@@ -1675,18 +2990,30 @@ def make_stamp():
     Construct a unique time stamp.
 
     @return: Unique time stamp.
-    @rtype:  L{Stamp}
+    @rtype:  C{int}
     """
-    global last_stamp, last_index
+    global last_stamp
 
-    now = int(time.time())
-    if now <= last_stamp:
-        last_index = last_index + 1
-        return Stamp(last_stamp, last_index)
+    now = pack_stamp(int(time.time()), 0)
+    with stamp_lock:
+        stamp = max(now, last_stamp + 1)
+        last_stamp = stamp + (stamp_offset - stamp) % stamp_step
+        return last_stamp
 
-    last_stamp = now
-    last_index = 0
-    return Stamp(last_stamp, last_index)
+
+def update_last_stamp(stamp):
+    """
+    Make sure that new time stamps are newer than a loaded time stamp.
+
+    @param stamp: Loaded time stamp.
+    @type  stamp: C{int}
+    """
+    global last_stamp
+
+    if last_stamp < stamp:  # Avoid the lock for the many older stamps.
+        with stamp_lock:
+            if last_stamp < stamp:
+                last_stamp = stamp
 
 
 def load_stamp(xloader, node):
@@ -1700,7 +3027,7 @@ def load_stamp(xloader, node):
     @type  node: L{xml.dom.minidom.Node}
 
     @return: Loaded time stamp.
-    @rtype:  L{Stamp}
+    @rtype:  C{int}
     """
     assert node.tagName == "stamp"
     seconds = int(node.getAttribute("second"), 10)
@@ -1710,38 +3037,33 @@ def load_stamp(xloader, node):
 
 def load_stamp_json(node):
     """
-    Convert a time stamp loaded from a Json file into a regular L{Stamp} object.
+    Convert a time stamp loaded from a Json file into a regular time stamp.
 
     @param node: Node containing the time stamp in Json format.
     @type  node: List with two integers (seconds and index).
 
     @return: The loaded time stamp.
-    @rtype:  L{Stamp}
+    @rtype:  C{int}
     """
-    global last_stamp, last_index
-
-    if last_stamp < node[0]:
-        last_stamp = node[0]
-        last_index = node[1]
-    elif last_stamp == node[0] and last_index < node[1]:
-        last_index = node[1]
-
-    return Stamp(node[0], node[1])
+    stamp = (node[0] << STAMP_NUMBER_BITS) | node[1]
+    update_last_stamp(stamp)
+    return stamp
 
 
 def save_stamp(xsaver, stamp):
     """
-    Construct an xml representation of the L{stamp} object.
+    Construct an xml representation of the L{stamp}.
 
     @param xsaver: Saver class.
     @type  xsaver: L{XmlSaver}
 
-    @param stamp: Time stamp object to save.
-    @type  stamp: L{Stamp}
+    @param stamp: Time stamp to save.
+    @type  stamp: C{int}
 
     @return: The created xml representation.
     @rtype:  L{xml.dom.minidom.Node}
     """
+    stamp = Stamp(stamp)
     node = xsaver.doc.createElement("stamp")
     node.setAttribute("second", str(stamp.seconds))
     if stamp.number > 0:
@@ -1753,13 +3075,13 @@ def save_stamp_json(stamp):
     """
     Convert time stamp to Json format.
 
-    @param stamp: Time stamp object to save.
-    @type  stamp: L{Stamp}
+    @param stamp: Time stamp to save.
+    @type  stamp: C{int}
 
     @return: The created Json representation.
     @rtype:  list with 2 integers (seconds and index number).
     """
-    return [stamp.seconds, stamp.number]
+    return [stamp >> STAMP_NUMBER_BITS, stamp & ((1 << STAMP_NUMBER_BITS) - 1)]
 
 
 def encode_stamp(stamp):
@@ -1767,11 +3089,12 @@ def encode_stamp(stamp):
     Encode a time stamp to the normalized format (RFC 8601).
 
     @param stamp: Time stamp to convert.
-    @type  stamp: L{Stamp}
+    @type  stamp: C{int}
 
     @return: Encoded time stamp.
     @rtype:  C{str}
     """
+    stamp = Stamp(stamp)
     elems = time.gmtime(stamp.seconds)
     text = "{:04d}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}"
     text = text.format(elems.tm_year, elems.tm_mon, elems.tm_mday, elems.tm_hour, elems.tm_min, elems.tm_sec)
@@ -1788,7 +3111,7 @@ def decode_stamp(text):
     @type  text: C{str}
 
     @return: Decode time stamp, if it could be decoded.
-    @rtype:  L{Stamp} or C{None}
+    @rtype:  C{int} or C{None}
     """
     m = re.search("\\.([0-9]+)Z$", text)
     if m:
@@ -1803,4 +3126,4 @@ def decode_stamp(text):
         return None
 
     secs = calendar.timegm(elems)
-    return Stamp(secs, val)
+    return pack_stamp(secs, val)
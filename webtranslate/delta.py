@@ -0,0 +1,100 @@
+"""
+Compressed differences between versions of a data file, for storing backup files.
+
+Both versions are split in tokens, ending at a new line (xml) or a closing bracket (json). A
+delta describes the old version as a sequence of token ranges copied from the new version, and
+literal text.
+"""
+
+import json
+import lzma
+import re
+
+TOKEN_END = re.compile(rb"(?<=[\n\]])")
+
+
+def split_tokens(content):
+    """
+    Split the data of a file in tokens.
+
+    @param content: Data of the file.
+    @type  content: C{bytes}
+
+    @return: Tokens of the data.
+    @rtype:  C{list} of C{bytes}
+    """
+    return TOKEN_END.split(content)
+
+
+def make_delta(old, new):
+    """
+    Construct a delta to reconstruct the old version of a file from its new version.
+
+    @param old: Data of the old version.
+    @type  old: C{bytes}
+
+    @param new: Data of the new version.
+    @type  new: C{bytes}
+
+    @return: Compressed delta.
+    @rtype:  C{bytes}
+    """
+    new_tokens = split_tokens(new)
+
+    # Only tokens that occur once in the new version are used for finding a matching position.
+    unique = {}
+    for index, token in enumerate(new_tokens):
+        if token in unique:
+            unique[token] = None
+        else:
+            unique[token] = index
+
+    ops = []  # Copied ranges as [start, count], and literal texts as string.
+    literal = []
+    pos = None  # Position in the new version that continues the current copied range.
+    for token in split_tokens(old):
+        if pos is not None and pos < len(new_tokens) and new_tokens[pos] == token:
+            ops[-1][1] = ops[-1][1] + 1
+            pos = pos + 1
+            continue
+
+        start = unique.get(token)
+        if start is None:
+            literal.append(token)
+            pos = None
+            continue
+
+        if len(literal) > 0:
+            ops.append(b"".join(literal).decode("latin-1"))
+            literal = []
+        ops.append([start, 1])
+        pos = start + 1
+
+    if len(literal) > 0:
+        ops.append(b"".join(literal).decode("latin-1"))
+
+    return lzma.compress(json.dumps(ops, separators=(",", ":")).encode("latin-1"))
+
+
+def apply_delta(delta, new):
+    """
+    Reconstruct the old version of a file from its new version.
+
+    @param delta: Compressed delta, made by L{make_delta}.
+    @type  delta: C{bytes}
+
+    @param new: Data of the new version.
+    @type  new: C{bytes}
+
+    @return: Data of the old version.
+    @rtype:  C{bytes}
+    """
+    new_tokens = split_tokens(new)
+    parts = []
+    for op in json.loads(lzma.decompress(delta).decode("latin-1")):
+        if isinstance(op, str):
+            parts.append(op.encode("latin-1"))
+        else:
+            start, count = op
+            parts.extend(new_tokens[start : start + count])
+    return b"".join(parts)
@@ -0,0 +1,388 @@
+"""
+Background jobs for heavy changes of projects, such as uploading a language file or creating a project. The request
+that starts a job returns at once, with the address of a page that shows the progress and the result of the job.
+Jobs of the same project run one at a time in order of arrival, jobs of different projects run in parallel.
+
+A full rebuild of the statistics of a project is not a job of its own. It happens when a base language is uploaded,
+as part of that job, and when a project is loaded, which every request of the project must wait for anyway.
+"""
+
+import collections
+import logging
+import os
+import secrets
+import threading
+import time
+
+from . import (
+    bottle,
+    config,
+    utils,
+)
+from .bottle import abort
+
+log = logging.getLogger(__name__)
+
+# States of a job.
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Number of seconds that a finished job can be inspected.
+KEEP_FINISHED = 3600
+
+
+class JobError(Exception):
+    """
+    Failure of a job, with a message for the user.
+    """
+
+
+class Job:
+    """
+    Change of a project that may take a while.
+
+    @ivar ident: Identification of the job.
+    @type ident: C{str}
+
+    @ivar prjname: Name of the project changed by the job.
+    @type prjname: C{str}
+
+    @ivar title: Description of the job for the user.
+    @type title: C{str}
+
+    @ivar user: Name of the user that started the job.
+    @type user: C{str}
+
+    @ivar func: Function performing the job, called with the job. Returns a message for the user, or raises
+                L{JobError}. C{None} once the job ran.
+    @type func: C{callable} or C{None}
+
+    @ivar url: Route pattern of the page to show after the job is done.
+    @type url: C{str}
+
+    @ivar url_args: Parameters of the route of the page to show after the job is done.
+    @type url_args: C{dict} of C{str} to C{str}
+
+    @ivar state: State of the job, L{QUEUED}, L{RUNNING}, L{DONE}, or L{FAILED}.
+    @type state: C{str}
+
+    @ivar progress: Description of the current step of the job.
+    @type progress: C{str}
+
+    @ivar message: Result of the job for the user, once it is finished.
+    @type message: C{str} or C{None}
+
+    @ivar created: Time of creating the job.
+    @type created: C{float}
+
+    @ivar finished: Time of finishing the job.
+    @type finished: C{float} or C{None}
+    """
+
+    def __init__(self, prjname, title, user, func, url, url_args):
+        self.ident = secrets.token_hex(8)
+        self.prjname = prjname
+        self.title = title
+        self.user = user
+        self.func = func
+        self.url = url
+        self.url_args = url_args
+        self.state = QUEUED
+        self.progress = "Waiting for earlier jobs of the project"
+        self.message = None
+        self.created = time.time()
+        self.finished = None
+
+    def set_progress(self, progress):
+        """
+        Describe the current step of the job.
+
+        @param progress: Description of the step.
+        @type  progress: C{str}
+        """
+        self.progress = progress
+
+    def is_finished(self):
+        """
+        Get whether the job is finished.
+
+        @return: Whether the job is done or failed.
+        @rtype:  C{bool}
+        """
+        return self.state in (DONE, FAILED)
+
+    def run(self, lock_project):
+        """
+        Perform the job.
+
+        @param lock_project: Whether to lock the project for changing, in a worker thread. Else the job runs in
+                             the request that started it, which has locked the project, and which handles the
+                             errors other than L{JobError}.
+        @type  lock_project: C{bool}
+        """
+        self.state = RUNNING
+        self.progress = "Started"
+        try:
+            if lock_project:
+                with config.cache.use_project(self.prjname, True):
+                    self.message = self.func(self)
+            else:
+                self.message = self.func(self)
+            self.state = DONE
+        except JobError as ex:
+            self.message = str(ex)
+            self.state = FAILED
+        except Exception as ex:
+            self.state = FAILED
+            if not lock_project:
+                raise
+            if isinstance(ex, config.ProjectChangedError):
+                self.message = str(ex)
+            else:
+                log.exception('Job "%s" of project "%s" failed', self.title, self.prjname)
+                self.message = "Internal error"
+        finally:
+            self.func = None  # Finished jobs are kept for a while, without the data of the change.
+            self.progress = "Finished"
+            self.finished = time.time()
+
+    def get_status(self):
+        """
+        Get the status of the job, for scripts.
+
+        @return: Status of the job.
+        @rtype:  C{dict}
+        """
+        return {
+            "id": self.ident,
+            "project": self.prjname,
+            "title": self.title,
+            "state": self.state,
+            "progress": self.progress,
+            "message": self.message,
+            "url": bottle.url(self.url, **self.url_args),
+        }
+
+
+class JobQueue:
+    """
+    Jobs waiting or running in the worker threads of this process.
+
+    @ivar num_threads: Number of worker threads, C{0} runs a job in the request that starts it.
+    @type num_threads: C{int}
+
+    @ivar condition: Condition for changing the jobs, and waiting for a job.
+    @type condition: L{threading.Condition}
+
+    @ivar jobs: Jobs by identification, including recently finished jobs.
+    @type jobs: C{dict} of C{str} to L{Job}
+
+    @ivar pending: Waiting jobs of each project, in order of arrival.
+    @type pending: C{dict} of C{str} to C{collections.deque} of L{Job}
+
+    @ivar ready: Projects with waiting jobs and no running job, in order of arrival.
+    @type ready: C{collections.deque} of C{str}
+
+    @ivar started: Process that started the worker threads.
+    @type started: C{int} or C{None}
+
+    @ivar done: Number of jobs done.
+    @type done: C{int}
+
+    @ivar failed: Number of failed jobs.
+    @type failed: C{int}
+    """
+
+    def __init__(self):
+        self.num_threads = 0
+        self.condition = threading.Condition()
+        self.jobs = {}
+        self.pending = {}
+        self.ready = collections.deque()
+        self.started = None
+        self.done = 0
+        self.failed = 0
+
+    def configure(self, num_threads):
+        """
+        Set the number of worker threads.
+
+        @param num_threads: Number of worker threads, C{0} runs a job in the request that starts it.
+        @type  num_threads: C{int}
+        """
+        self.num_threads = num_threads
+
+    def runs_in_background(self, userauth, prjname):
+        """
+        Get whether the jobs of a user run in worker threads, or in the request that starts them. Jobs of a
+        user that may not see the page of a job run in the request, as the user could not follow them.
+
+        @param userauth: User that starts the jobs.
+        @type  userauth: L{UserAuthentication}
+
+        @param prjname: Name of the project changed by the jobs.
+        @type  prjname: C{str}
+
+        @return: Whether the jobs run in worker threads.
+        @rtype:  C{bool}
+        """
+        return self.num_threads > 0 and userauth.may_read("jobs", prjname, "-")
+
+    def submit(self, prjname, title, userauth, func, url, url_args):
+        """
+        Start a new job. If the job does not run in the background (see L{runs_in_background}), it runs
+        immediately, and the caller must have locked the project for changing.
+
+        @param prjname: Name of the project changed by the job.
+        @type  prjname: C{str}
+
+        @param title: Description of the job for the user.
+        @type  title: C{str}
+
+        @param userauth: User that starts the job.
+        @type  userauth: L{UserAuthentication}
+
+        @param func: Function performing the job, called with the job. Returns a message for the user, or raises
+                     L{JobError}.
+        @type  func: C{callable}
+
+        @param url: Route pattern of the page to show after the job is done.
+        @type  url: C{str}
+
+        @param url_args: Parameters of the route of the page to show after the job is done.
+        @type  url_args: C{dict} of C{str} to C{str}
+
+        @return: The new job.
+        @rtype:  L{Job}
+        """
+        job = Job(prjname, title, userauth.name, func, url, url_args)
+        if not self.runs_in_background(userauth, prjname):
+            try:
+                job.run(False)
+            finally:
+                with self.condition:
+                    self.count_finished(job)
+            return job
+
+        with self.condition:
+            self.start_workers()
+            self.drop_finished()
+            self.jobs[job.ident] = job
+            jobs = self.pending.get(prjname)
+            if jobs is None:
+                # No other job of the project is waiting or running.
+                jobs = collections.deque()
+                self.pending[prjname] = jobs
+                self.ready.append(prjname)
+            jobs.append(job)
+            self.condition.notify()
+        return job
+
+    def get_job(self, ident):
+        """
+        Find a job.
+
+        @param ident: Identification of the job.
+        @type  ident: C{str}
+
+        @return: The job, if it exists.
+        @rtype:  L{Job} or C{None}
+        """
+        with self.condition:
+            return self.jobs.get(ident)
+
+    def start_workers(self):
+        """
+        Start the worker threads in this process if needed, the condition must be held.
+        """
+        pid = os.getpid()
+        if self.started == pid:
+            return
+
+        # Threads do not survive forking the process.
+        self.started = pid
+        for index in range(self.num_threads):
+            thread = threading.Thread(target=self.work, name="job-{}".format(index), daemon=True)
+            thread.start()
+
+    def drop_finished(self):
+        """
+        Forget jobs that finished a while ago, the condition must be held.
+        """
+        limit = time.time() - KEEP_FINISHED
+        for ident, job in list(self.jobs.items()):
+            if job.finished is not None and job.finished < limit:
+                del self.jobs[ident]
+
+    def count_finished(self, job):
+        """
+        Count a finished job in the metrics, the condition must be held.
+
+        @param job: The finished job.
+        @type  job: L{Job}
+        """
+        if job.state == DONE:
+            self.done = self.done + 1
+        else:
+            self.failed = self.failed + 1
+
+    def work(self):
+        """
+        Run jobs in a worker thread.
+        """
+        while True:
+            with self.condition:
+                while len(self.ready) == 0:
+                    self.condition.wait()
+                prjname = self.ready.popleft()
+                job = self.pending[prjname][0]
+
+            job.run(True)
+
+            with self.condition:
+                self.count_finished(job)
+                jobs = self.pending[prjname]
+                jobs.popleft()
+                if len(jobs) == 0:
+                    del self.pending[prjname]
+                else:
+                    self.ready.append(prjname)  # Behind the projects that waited meanwhile.
+                    self.condition.notify()
+
+    def get_metrics(self):
+        """
+        Get metrics of the jobs.
+
+        @return: Names and values of the metrics.
+        @rtype:  C{list} of (C{str}, C{int})
+        """
+        with self.condition:
+            waiting = sum(len(jobs) for jobs in self.pending.values())
+            running = len(self.pending) - len(self.ready)
+            return [
+                ("jobs_queued", waiting - running),
+                ("jobs_running", running),
+                ("jobs_done", self.done),
+                ("jobs_failed", self.failed),
+            ]
+
+
+queue = JobQueue()
+
+
+def respond(job):
+    """
+    Answer the request that started a job. Shows the page of the job if it runs in the background, else the
+    result of the job.
+
+    @param job: Job started by the request.
+    @type  job: L{Job}
+    """
+    if not job.is_finished():
+        utils.redirect("/jobs/<prjname>/<jobid>", prjname=job.prjname, jobid=job.ident)
+    elif job.state == FAILED:
+        abort(404, job.message)
+    else:
+        utils.redirect(job.url, message=job.message, **job.url_args)
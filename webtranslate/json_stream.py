@@ -0,0 +1,189 @@
+"""
+Incremental reading of a Json document.
+
+The structure of the document is walked by iterating over its objects and arrays, while the elements
+are decoded as regular Json values one at a time. Only the text of the element being decoded is kept
+in memory, rather than the text and the decoded values of the entire document.
+"""
+
+import json
+import re
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+NUMBER_CHARS = "0123456789+-.eE"
+
+CHUNK_SIZE = 1 << 16
+
+
+class JsonStreamReader:
+    """
+    Reader of a Json document from a stream.
+
+    @ivar handle: Stream being read.
+    @type handle: C{io.TextIOBase}
+
+    @ivar buffer: Text read from the stream, processed up to L{pos}.
+    @type buffer: C{str}
+
+    @ivar pos: Position of the first unprocessed character in L{buffer}.
+    @type pos: C{int}
+
+    @ivar eof: Whether the end of the stream has been reached.
+    @type eof: C{bool}
+
+    @ivar decoder: Decoder of the Json values.
+    @type decoder: L{json.JSONDecoder}
+    """
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self, size):
+        """
+        Drop the processed text from the buffer, and append more text of the stream.
+
+        @param size: Minimal number of characters to read (unless the stream ends before).
+        @type  size: C{int}
+
+        @return: Whether text was added to the buffer.
+        @rtype:  C{bool}
+        """
+        if self.eof:
+            return False
+
+        text = self.handle.read(max(size, CHUNK_SIZE))
+        if text == "":
+            self.eof = True
+            return False
+
+        self.buffer = self.buffer[self.pos :] + text
+        self.pos = 0
+        return True
+
+    def error(self, msg):
+        """
+        Construct an exception for an error at the current position.
+
+        @param msg: Description of the error.
+        @type  msg: C{str}
+
+        @return: The exception to raise.
+        @rtype:  L{json.JSONDecodeError}
+        """
+        return json.JSONDecodeError(msg, self.buffer, self.pos)
+
+    def peek(self):
+        """
+        Skip white space, and get the next character of the document.
+
+        @return: The next character, or the empty string at the end of the document.
+        @rtype:  C{str}
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill(0):
+                return ""
+
+    def expect(self, char):
+        """
+        Skip the given character of the document.
+
+        @param char: Expected next character.
+        @type  char: C{str}
+        """
+        if self.peek() != char:
+            raise self.error("Expecting {!r}".format(char))
+        self.pos = self.pos + 1
+
+    def read_value(self):
+        """
+        Decode the next value of the document.
+
+        @return: The decoded value.
+        @rtype:  C{dict}, C{list}, C{str}, C{int}, C{float}, C{bool}, or C{None}
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Value not complete yet, read as much text as is pending to keep decoding linear.
+                if not self.fill(len(self.buffer) - self.pos):
+                    raise
+                continue
+
+            # A number may continue in the stream, if the buffer ends within it.
+            if self.buffer[self.pos] in NUMBER_CHARS and self.buffer[end:].lstrip(NUMBER_CHARS) == "":
+                if self.fill(0):
+                    continue
+
+            self.pos = end
+            return value
+
+    def iter_array(self):
+        """
+        Walk over the elements of the next array in the document. Each element must be read by the caller
+        before continuing with the next element.
+
+        @return: Index of the element to read.
+        @rtype:  C{iterator} of C{int}
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos = self.pos + 1
+            return
+
+        index = 0
+        while True:
+            yield index
+            index = index + 1
+
+            char = self.peek()
+            self.pos = self.pos + 1
+            if char == "]":
+                return
+            if char != ",":
+                self.pos = self.pos - 1
+                raise self.error("Expecting ',' or ']'")
+
+    def iter_object(self):
+        """
+        Walk over the members of the next object in the document. Each value must be read by the caller
+        before continuing with the next member.
+
+        @return: Name of the member to read.
+        @rtype:  C{iterator} of C{str}
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos = self.pos + 1
+            return
+
+        while True:
+            if self.peek() != '"':
+                raise self.error("Expecting property name enclosed in double quotes")
+            key = self.read_value()
+            self.expect(":")
+            yield key
+
+            char = self.peek()
+            self.pos = self.pos + 1
+            if char == "}":
+                return
+            if char != ",":
+                self.pos = self.pos - 1
+                raise self.error("Expecting ',' or '}'")
+
+    def read_end(self):
+        """
+        Verify that the document has been read completely.
+        """
+        if self.peek() != "":
+            raise self.error("Extra data")
@@ -15,7 +15,7 @@ def load_dom(fname):
     Load the XML file as DOM into memory.
 
     @param fname: File to load.
-    @type  fname: C{str}
+    @type  fname: C{str} or C{file}
 
     @todo: XXX Implement some safe guards for loading too big files.
     """
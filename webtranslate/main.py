@@ -3,16 +3,26 @@ Main program.
 """
 
 import logging
+import os
+import tempfile
 
-from wsgiref.simple_server import WSGIRequestHandler
+from wsgiref.simple_server import WSGIServer
 
 from . import (
+    admission,
     bottle,
     config,
-    project_type,
+    data,
+    jobs,
+    protect,
     users,
 )
-from .newgrf import language_info
+from .server import (
+    KeepAliveRequestHandler,
+    NoLog200HandlerHandler,
+    PreforkWSGIRefServer,
+    ThreadingWSGIServer,
+)
 
 # Import all pages, so they register their endpoints.
 from . import static  # noqa
@@ -20,9 +30,11 @@ from .pages import (  # noqa
     delete,
     download_language,
     download_list,
+    job_status,
     language_list,
     language_overview,
     login,
+    metrics,
     newlanguage,
     newproject,
     project_settings,
@@ -41,47 +53,57 @@ log = logging.getLogger(__name__)
 bottle.TEMPLATE_PATH = ["./views/"]
 
 
-class NoLog200HandlerHandler(WSGIRequestHandler):
-    def log_message(self, format, *args):
-        # Only log if the status was not successful.
-        if not (200 <= int(args[1]) < 400):
-            # Use log.info() instead of parent call, as parent call uses stderr.write().
-            log.info("%s - - [%s] %s", self.address_string(), self.log_date_time_string(), format % args)
+def init_worker(index):
+    """
+    Initialize a new process of a server with several processes.
 
+    @param index: Index of the process.
+    @type  index: C{int}
+    """
+    data.set_stamp_sequence(index, config.cfg.server_processes)
+    config.project_watcher.start(config.cfg.reload_interval)
+    config.project_sweeper.start(config.SWEEP_CHECK_INTERVAL)
 
-def run():
+
+def init():
+    """
+    Load the configuration, the language meta-data, the user authentication, and the projects.
+    """
     # Load basic settings from the configuration (in particular, language meta-data directories).
     config.cfg = config.Config("config.xml")
     config.cfg.load_settings_from_xml()
+    admission.scheduler.configure(config.cfg.admission_limits)
+
+    # The page of a job must be handled by the process running the job.
+    job_threads = config.cfg.job_threads
+    if config.cfg.server_mode == "mod_wsgi":
+        job_threads = 0
+    elif config.cfg.server_processes > 1 and config.cfg.project_affinity != "hash":
+        job_threads = 0
+    jobs.queue.configure(job_threads)
+
+    # Worker processes are started with the executable of the process, which is not Python with 'mod_wsgi'.
+    if config.cfg.server_mode == "mod_wsgi":
+        config.cfg.save_processes = 1
+
+    if config.cfg.session_file is not None:
+        protect._sessions = protect.SharedSessions(config.cfg.session_file)
 
     # Load language meta-information.
-    languages = []
-    if config.cfg.stable_languages_path is not None:
-        for lang in language_info.load_dir(config.cfg.stable_languages_path):
-            lang.is_stable = True
-            languages.append(lang)
-
-    if config.cfg.unstable_languages_path is not None:
-        # Check if any allowed project type uses unstable languages before loading them.
-        unstable_used = False
-        for ptype_name in config.cfg.project_types:
-            ptype = project_type.project_types.get(ptype_name)
-            if ptype is not None and ptype.allow_unstable_lng:
-                unstable_used = True
-                break
-
-        if unstable_used:
-            for lang in language_info.load_dir(config.cfg.unstable_languages_path):
-                lang.is_stable = False
-                languages.append(lang)
-
-    language_info.set_all_languages(languages)
+    config.cfg.load_language_info()
 
     # Load user authentication, find existing projects, and initialize authentication.
     config.cfg.load_userauth_from_xml()
     config.cache.find_projects()
     users.init(config.cfg.authentication)
 
+
+def run():
+    init()
+    if config.cfg.server_mode == "mod_wsgi" or config.cfg.server_processes <= 1:
+        config.project_watcher.start(config.cfg.reload_interval)
+        config.project_sweeper.start(config.SWEEP_CHECK_INTERVAL)
+
     # Start the web service
     debug = False
     if config.cfg.server_mode == "development":
@@ -89,13 +111,48 @@ def run():
 
     # With 'mod_wsgi', application does not run from here.
     if config.cfg.server_mode != "mod_wsgi":
-        bottle.run(
-            reloader=False,
-            debug=debug,
-            host=config.cfg.server_host,
-            port=config.cfg.server_port,
-            handler_class=NoLog200HandlerHandler,
-        )
+        server_class = WSGIServer
+        handler_class = NoLog200HandlerHandler
+        if config.cfg.server_threads > 1:
+            server_class = ThreadingWSGIServer
+            if config.cfg.keep_alive_timeout > 0:
+                handler_class = KeepAliveRequestHandler
+
+        if config.cfg.server_processes <= 1:
+            bottle.run(
+                reloader=False,
+                debug=debug,
+                host=config.cfg.server_host,
+                port=config.cfg.server_port,
+                handler_class=handler_class,
+                server_class=server_class,
+            )
+            return
+
+        # Sessions are shared by the processes through a data base.
+        sessions_path = None
+        if config.cfg.session_file is None:
+            handle, sessions_path = tempfile.mkstemp(prefix="eints-sessions-", suffix=".sqlite")
+            os.close(handle)
+            protect._sessions = protect.SharedSessions(sessions_path)
+        try:
+            bottle.run(
+                reloader=False,
+                debug=debug,
+                host=config.cfg.server_host,
+                port=config.cfg.server_port,
+                server=PreforkWSGIRefServer,
+                handler_class=handler_class,
+                server_class=server_class,
+                processes=config.cfg.server_processes,
+                worker_init=init_worker,
+                project_affinity=config.cfg.project_affinity == "hash",
+            )
+        finally:
+            if sessions_path is not None:
+                for path in (sessions_path, sessions_path + "-wal", sessions_path + "-shm"):
+                    if os.path.exists(path):
+                        os.remove(path)
 
 
 if __name__ == "__main__":
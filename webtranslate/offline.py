@@ -0,0 +1,469 @@
+"""
+Maintenance of the stored projects while the translation service is not running.
+
+Run it as C{python -m webtranslate.offline}, from the directory containing C{config.xml}.
+"""
+
+import click
+import concurrent.futures
+import logging
+import os
+import shutil
+import time
+
+from . import config
+
+log = logging.getLogger(__name__)
+
+# Directory in the project root with the original files of converted projects, see L{migrate_project}. It is not
+# recognized as project, as it contains no project data file.
+MIGRATED_DIR = ".migrated"
+
+
+def init_worker(config_path):
+    """
+    Set up the configuration and the language meta-information in a (worker) process.
+
+    @param config_path: Path of the configuration file.
+    @type  config_path: C{str}
+    """
+    config.cfg = config.Config(config_path)
+    config.cfg.load_settings_from_xml()
+    config.cfg.load_language_info()
+
+
+def get_project_files(proj_store):
+    """
+    Get the current data files of a stored project, without its backup files.
+
+    @param proj_store: Stored project.
+    @type  proj_store: L{ProjectStorage}
+
+    @return: Paths of the data files.
+    @rtype:  C{list} of C{str}
+    """
+    if proj_store.storage_type in (config.STORAGE_ONE_FILE, config.STORAGE_SQLITE):
+        return [proj_store.path]
+
+    ext = config.get_file_extension(proj_store.data_format, proj_store.compression)
+    names = ["project_data"] + proj_store.languages
+    return [os.path.join(proj_store.path, name + ext) for name in names]
+
+
+def get_project_size(proj_store):
+    """
+    Get the size of the data files of a stored project.
+
+    @param proj_store: Stored project.
+    @type  proj_store: L{ProjectStorage}
+
+    @return: Number of bytes used by the data files.
+    @rtype:  C{int}
+    """
+    return sum(os.path.getsize(path) for path in get_project_files(proj_store))
+
+
+def count_changes(pdata):
+    """
+    Count the changes of all strings in all languages of a project.
+
+    @param pdata: Project data.
+    @type  pdata: L{Project}
+
+    @return: Number of changes in the project.
+    @rtype:  C{int}
+    """
+    count = 0
+    for lng in pdata.languages.values():
+        for sname in lng.changes:
+            count = count + len(lng.get_changes(sname))
+    return count
+
+
+def compact_project(proj_store):
+    """
+    Discard the changes of a stored project that are not needed any more, and save the result.
+
+    @param proj_store: Stored project.
+    @type  proj_store: L{ProjectStorage}
+
+    @return: Name of the project, bytes before and after, and number of changes before and after.
+    @rtype:  C{tuple} (C{str}, C{int}, C{int}, C{int}, C{int})
+    """
+    pmd = config.ProjectMetaData(proj_store)
+    size_before = get_project_size(proj_store)
+
+    # Sweep unconditionally, rather than only when the last sweep is old.
+    pmd.load(sweep=False)
+    changes_before = count_changes(pmd.pdata)
+    pmd.sweep_changes()
+    changes_after = count_changes(pmd.pdata)
+
+    # Saving is skipped if nothing was changed, the old files become backups otherwise.
+    pmd.save()
+    config.backup_cleaner.wait()
+    return proj_store.name, size_before, get_project_size(proj_store), changes_before, changes_after
+
+
+def get_change_values(chg):
+    """
+    Get the stored values of a change, for comparing changes.
+
+    @param chg: Change to examine.
+    @type  chg: L{Change}
+
+    @return: Values of the change.
+    @rtype:  C{tuple}
+    """
+    texts = []
+    for text in (chg.base_text, chg.new_text):
+        if text is not None:
+            text = (text.text, text.case, text.stamp)
+        texts.append(text)
+    return chg.string_name, chg.case, texts[0], texts[1], chg.stamp, chg.user, chg.last_upload
+
+
+def find_difference(pdata1, pdata2):
+    """
+    Compare the stored data of two projects.
+
+    @param pdata1: First project.
+    @type  pdata1: L{Project}
+
+    @param pdata2: Second project.
+    @type  pdata2: L{Project}
+
+    @return: Description of the first found difference, if any.
+    @rtype:  C{str} or C{None}
+    """
+    for field in ("human_name", "url", "base_language", "skeleton", "last_sweep"):
+        if getattr(pdata1, field) != getattr(pdata2, field):
+            return "project " + field
+    if pdata1.projtype.name != pdata2.projtype.name:
+        return "project type"
+    if set(pdata1.languages) != set(pdata2.languages):
+        return "set of languages"
+
+    for lname, lng1 in pdata1.languages.items():
+        lng2 = pdata2.languages[lname]
+        for field in ("custom_pragmas", "grflangid", "plural", "gender"):
+            if getattr(lng1, field) != getattr(lng2, field):
+                return "language {} {}".format(lname, field)
+        # Data files store the cases without the default case, its position is not kept.
+        if sorted(lng1.case) != sorted(lng2.case):
+            return "language {} case".format(lname)
+        if set(lng1.changes) != set(lng2.changes):
+            return "set of strings in language {}".format(lname)
+
+        for sname in lng1.changes:
+            chgs1 = [get_change_values(chg) for chg in lng1.get_changes(sname)]
+            chgs2 = [get_change_values(chg) for chg in lng2.get_changes(sname)]
+            if chgs1 != chgs2:
+                return "changes of string {} in language {}".format(sname, lname)
+
+    return None
+
+
+def migrate_project(proj_store, storage_type, data_format, compression):
+    """
+    Convert a stored project to another storage type, data format, and/or compression. The converted
+    project is written and checked next to the project first, and then swapped with it.
+
+    @param proj_store: Stored project.
+    @type  proj_store: L{ProjectStorage}
+
+    @param storage_type: New type of storage of the project.
+    @type  storage_type: One of L{STORAGE_ONE_FILE}, L{STORAGE_SEPARATE_LANGUAGES}, or L{STORAGE_SQLITE}
+
+    @param data_format: New data format of the project.
+    @type  data_format: C{str}, C{xml} or C{json} (C{sqlite} for L{STORAGE_SQLITE})
+
+    @param compression: New compression of the project files.
+    @type  compression: C{str}, one of the keys of L{data.COMPRESSION_EXTENSIONS}
+
+    @return: Name of the project, bytes before and after, and seconds needed for loading, saving, and checking.
+    @rtype:  C{tuple} (C{str}, C{int}, C{int}, C{float}, C{float}, C{float})
+    """
+    root = os.path.dirname(proj_store.path)
+    work_dir = os.path.join(root, ".migrate-" + proj_store.name)  # Not recognized as project.
+    if os.path.exists(work_dir):
+        shutil.rmtree(work_dir)
+    os.mkdir(work_dir)
+
+    start = time.perf_counter()
+    pmd = config.ProjectMetaData(proj_store)
+    pmd.load(sweep=False)
+    load_time = time.perf_counter() - start
+
+    # Write the project in the new format.
+    start = time.perf_counter()
+    if storage_type in (config.STORAGE_ONE_FILE, config.STORAGE_SQLITE):
+        new_name = proj_store.name + config.get_file_extension(data_format, compression)
+        languages = []
+    else:
+        new_name = proj_store.name
+        languages = list(pmd.pdata.languages)
+        os.mkdir(os.path.join(work_dir, new_name))
+
+    new_path = os.path.join(work_dir, new_name)
+    new_store = config.ProjectStorage(new_path, proj_store.name, languages, storage_type, data_format, compression)
+    new_pmd = config.ProjectMetaData(new_store)
+    new_pmd.pdata = pmd.pdata
+    new_pmd.pdata.set_modified()
+    for lng in new_pmd.pdata.languages.values():
+        lng.set_modified()
+    new_pmd.save()
+    config.backup_cleaner.wait()  # Before the files are moved.
+    save_time = time.perf_counter() - start
+
+    # Load the converted project, and compare it with the original data.
+    start = time.perf_counter()
+    check_pmd = config.ProjectMetaData(new_store)
+    check_pmd.load(sweep=False)
+    difference = find_difference(pmd.pdata, check_pmd.pdata)
+    if difference is not None:
+        shutil.rmtree(work_dir)
+        raise ValueError("Converted project differs in " + difference)
+    check_time = time.perf_counter() - start
+
+    size_before = get_project_size(proj_store)
+    size_after = get_project_size(new_store)
+    keep_dir = make_keep_dir(root, proj_store.name)
+    swap_project(proj_store, new_store, os.path.join(root, new_name), keep_dir)
+    shutil.rmtree(work_dir)
+    return proj_store.name, size_before, size_after, load_time, save_time, check_time
+
+
+def make_keep_dir(root, name):
+    """
+    Make a new directory for the original files of a converted project, named after the project and the
+    current time.
+
+    @param root: Root of the projects disk storage.
+    @type  root: C{str}
+
+    @param name: Name of the project.
+    @type  name: C{str}
+
+    @return: Path of the new directory.
+    @rtype:  C{str}
+    """
+    migrated_dir = os.path.join(root, MIGRATED_DIR)
+    os.makedirs(migrated_dir, exist_ok=True)
+
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    keep_dir = os.path.join(migrated_dir, "{}-{}".format(name, stamp))
+    number = 1
+    while True:
+        try:
+            os.mkdir(keep_dir)
+            return keep_dir
+        except FileExistsError:
+            # Already converted in the same second.
+            keep_dir = os.path.join(migrated_dir, "{}-{}-{}".format(name, stamp, number))
+            number = number + 1
+
+
+def swap_project(proj_store, new_store, new_path, keep_dir):
+    """
+    Replace a stored project by its converted version. The converted project is moved into place first, and
+    made durable, before the files of the original project are moved away, so the project never disappears
+    from the project root. The original data files are kept in L{keep_dir} with their backup files.
+
+    @param proj_store: Original stored project.
+    @type  proj_store: L{ProjectStorage}
+
+    @param new_store: Converted project, in the same file system.
+    @type  new_store: L{ProjectStorage}
+
+    @param new_path: Path of the converted project in the project root.
+    @type  new_path: C{str}
+
+    @param keep_dir: Empty directory to move the files of the original project to, with their names in the
+                     project root.
+    @type  keep_dir: C{str}
+    """
+    root = os.path.dirname(proj_store.path)
+    if new_path != proj_store.path:
+        if proj_store.storage_type == config.STORAGE_SEPARATE_LANGUAGES:
+            old_names = [os.path.basename(proj_store.path)]  # The directory holds the backup files as well.
+        else:
+            old_names = [os.path.basename(proj_store.path)] + config.find_backups(proj_store.path)
+
+        os.rename(new_store.path, new_path)
+        config.sync_directory(root)
+        for name in old_names:
+            os.rename(os.path.join(root, name), os.path.join(keep_dir, name))
+        config.sync_directory(keep_dir)
+        config.sync_directory(root)
+        return
+
+    # Both projects use a directory with the same name, move the converted files into the directory of the
+    # original project. The storage is recognized by its project data file, which is moved first, after
+    # the language files, and moved away first.
+    ext = config.get_file_extension(proj_store.data_format, proj_store.compression)
+    old_names = sorted(os.listdir(proj_store.path), key=lambda name: name != "project_data" + ext)
+    new_names = sorted(os.listdir(new_store.path), key=lambda name: name.startswith("project_data."))
+    for name in new_names:
+        if os.path.exists(os.path.join(proj_store.path, name)):
+            raise ValueError('File "{}" exists in the original project already'.format(name))
+
+    for name in new_names:
+        os.rename(os.path.join(new_store.path, name), os.path.join(proj_store.path, name))
+    config.sync_directory(proj_store.path)
+    keep_dir = os.path.join(keep_dir, os.path.basename(proj_store.path))
+    os.mkdir(keep_dir)
+    for name in old_names:
+        os.rename(os.path.join(proj_store.path, name), os.path.join(keep_dir, name))
+    config.sync_directory(keep_dir)
+    config.sync_directory(proj_store.path)
+
+
+@click.group()
+@click.option("--config", "config_path", help="Configuration file of the service.", default="config.xml")
+@click.pass_context
+def cli(ctx, config_path):
+    """
+    Maintenance of the stored projects. Stop the translation service before running a command.
+    """
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)-8s %(message)s", datefmt="%Y-%m-%d %H:%M:%S", level=logging.INFO
+    )
+    init_worker(config_path)
+    ctx.obj = config_path
+
+
+@cli.command()
+@click.option("--jobs", help="Number of projects to compact at the same time.", default=os.cpu_count() or 1)
+@click.argument("projects", nargs=-1)
+@click.pass_obj
+def compact(config_path, jobs, projects):
+    """
+    Discard old changes of all (or the given) projects, using the change settings of the configuration.
+    """
+    proj_stores = config.find_project_files(config.cfg.project_root)
+    if len(projects) > 0:
+        proj_stores = [proj_store for proj_store in proj_stores if proj_store.name in projects]
+    proj_stores.sort(key=lambda proj_store: proj_store.name)
+
+    total_bytes = 0
+    total_changes = 0
+    with concurrent.futures.ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(config_path,)) as pool:
+        futures = [pool.submit(compact_project, proj_store) for proj_store in proj_stores]
+        for proj_store, future in zip(proj_stores, futures):
+            try:
+                name, size_before, size_after, changes_before, changes_after = future.result()
+            except Exception:
+                log.exception('Project "%s" could not be compacted', proj_store.name)
+                continue
+
+            log.info(
+                'Project "%s": %d bytes removed (%d left), %d changes removed (%d left)',
+                name,
+                size_before - size_after,
+                size_after,
+                changes_before - changes_after,
+                changes_after,
+            )
+            total_bytes = total_bytes + size_before - size_after
+            total_changes = total_changes + changes_before - changes_after
+
+    log.info("Compacted %d projects: %d bytes and %d changes removed", len(proj_stores), total_bytes, total_changes)
+
+
+@cli.command()
+@click.option(
+    "--storage-format",
+    help="New storage format of the projects, by default the storage format of the configuration.",
+    type=click.Choice(["one-file", "split-languages", "sqlite"], case_sensitive=False),
+)
+@click.option(
+    "--data-format",
+    help="New data format of the projects, by default the data format of the configuration.",
+    type=click.Choice(["xml", "json"], case_sensitive=False),
+)
+@click.option(
+    "--compression",
+    help="New compression of the project files, by default the compression of the configuration.",
+    type=click.Choice(["none", "gzip", "lzma"], case_sensitive=False),
+)
+@click.option("--jobs", help="Number of projects to convert at the same time.", default=os.cpu_count() or 1)
+@click.argument("projects", nargs=-1)
+@click.pass_obj
+def migrate(config_path, storage_format, data_format, compression, jobs, projects):
+    """
+    Convert all (or the given) projects to another storage format, data format, and/or compression.
+    """
+    if storage_format is None:
+        storage_type = config.cfg.storage_format
+    elif storage_format == "one-file":
+        storage_type = config.STORAGE_ONE_FILE
+    elif storage_format == "split-languages":
+        storage_type = config.STORAGE_SEPARATE_LANGUAGES
+    else:
+        storage_type = config.STORAGE_SQLITE
+    if storage_type == config.STORAGE_SQLITE:
+        # A data base has its own format, and is not compressed.
+        data_format = "sqlite"
+        compression = "none"
+    if data_format is None:
+        data_format = config.cfg.data_format
+    if compression is None:
+        compression = config.cfg.compression
+
+    proj_stores = config.find_project_files(config.cfg.project_root)
+    if len(projects) > 0:
+        proj_stores = [proj_store for proj_store in proj_stores if proj_store.name in projects]
+    proj_stores = [
+        proj_store
+        for proj_store in proj_stores
+        if proj_store.storage_type != storage_type
+        or proj_store.data_format != data_format
+        or proj_store.compression != compression
+    ]
+    proj_stores.sort(key=lambda proj_store: proj_store.name)
+
+    count = 0
+    with concurrent.futures.ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(config_path,)) as pool:
+        futures = [
+            pool.submit(migrate_project, proj_store, storage_type, data_format, compression)
+            for proj_store in proj_stores
+        ]
+        for proj_store, future in zip(proj_stores, futures):
+            try:
+                name, size_before, size_after, load_time, save_time, check_time = future.result()
+            except Exception:
+                log.exception('Project "%s" could not be converted', proj_store.name)
+                continue
+
+            log.info(
+                'Project "%s": %d bytes before, %d bytes after, load %.2fs, save %.2fs, check %.2fs',
+                name,
+                size_before,
+                size_after,
+                load_time,
+                save_time,
+                check_time,
+            )
+            count = count + 1
+
+    log.info("Converted %d of %d projects", count, len(proj_stores))
+
+
+@cli.command("restore-backup")
+@click.argument("path")
+@click.argument("backup")
+@click.argument("output", type=click.File("wb"))
+@click.pass_obj
+def restore_backup(config_path, path, backup, output):
+    """
+    Write the (uncompressed) data of backup file BACKUP of data file PATH to OUTPUT.
+    """
+    content = config.read_backup(path, os.path.basename(backup))
+    if content is None:
+        raise click.ClickException('Backup file "{}" of "{}" not found'.format(backup, path))
+    output.write(content)
+
+
+if __name__ == "__main__":
+    cli()
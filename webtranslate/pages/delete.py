@@ -59,12 +59,11 @@ def delete_submit(userauth, prjname, lngname):
 
     del pdata.languages[lngname]
     pdata.set_modified()
-    if lngname in pdata.statistics:
-        del pdata.statistics[lngname]
-    if lngname in pmd.overview:
-        del pmd.overview[lngname]
+    # Statistics and overview are replaced rather than changed, they may be in use by other requests.
+    pdata.statistics = {name: stat for name, stat in pdata.statistics.items() if name != lngname}
+    pmd.overview = {name: counts for name, counts in pmd.overview.items() if name != lngname}
 
-    config.process_project_changes(pdata)  # Update changes of the project.
+    # Base language changes used only by the deleted language are discarded by the next sweep.
     config.cache.save_pmd(pmd)
 
     msg = "Language " + lngname + " is deleted"
@@ -86,12 +86,12 @@ def make_langfile(pdata, base_lng, lng, add_func):
             continue
         if skel_type == "string":
             column, sname = skel_value
-            chgs = lng.changes.get(sname)
+            chgs = lng.get_all_newest_changes(sname)
             if chgs is not None:
                 cstates = sdict[sname]
                 # Language has sorted cases, thus the default case comes first.
                 for case in lng_case:
-                    chg = data.get_newest_change(chgs, case)
+                    chg = chgs.get(case)
                     if chg is not None:
                         if case == "":
                             line = sname
@@ -27,15 +27,9 @@ def get_newest_change(lang):
     @type  lang: L{Language}
 
     @return: Time stamp of the last change, if it exists.
-    @rtype:  C{None} or L{Stamp}
+    @rtype:  C{None} or C{int}
     """
-    newest = None
-
-    for chgs in lang.changes.values():
-        for chg in chgs:
-            if newest is None or newest < chg.stamp:
-                newest = chg.stamp
-    return newest
+    return lang.get_newest_stamp()
 
 
 @route("/download-list/<prjname>", method="GET")
@@ -0,0 +1,63 @@
+"""
+Progress and result of a background job.
+"""
+
+from .. import jobs
+from ..bottle import (
+    abort,
+    route,
+    url,
+)
+from ..protect import protected
+from ..utils import (
+    redirect,
+    template,
+)
+
+
+def get_job(userauth, prjname, jobid):
+    """
+    Find a job started by the user.
+
+    @param userauth: User authentication.
+    @type  userauth: L{UserAuthentication}
+
+    @param prjname: Name of the project changed by the job.
+    @type  prjname: C{str}
+
+    @param jobid: Identification of the job.
+    @type  jobid: C{str}
+
+    @return: The job, if it exists.
+    @rtype:  L{jobs.Job} or C{None}
+    """
+    job = jobs.queue.get_job(jobid)
+    if job is None or job.prjname != prjname or job.user != userauth.name:
+        return None
+    return job
+
+
+@route("/jobs/<prjname>/<jobid>", method="GET")
+@protected(["jobs", "prjname", "-"])
+def job_page(userauth, prjname, jobid):
+    job = get_job(userauth, prjname, jobid)
+    if job is None:
+        abort(404, "Job does not exist")
+        return None
+
+    if job.state == jobs.DONE:
+        redirect(job.url, message=job.message, **job.url_args)
+        return None
+
+    return template("job", userauth=userauth, job=job, url=url(job.url, **job.url_args))
+
+
+@route("/jobs/<prjname>/<jobid>/json", method="GET")
+@protected(["jobs", "prjname", "-"])
+def job_status(userauth, prjname, jobid):
+    job = get_job(userauth, prjname, jobid)
+    if job is None:
+        abort(404, "Job does not exist")
+        return None
+
+    return job.get_status()
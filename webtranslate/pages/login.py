@@ -13,6 +13,7 @@ from ..bottle import (
 from ..protect import (
     abort,
     protected,
+    save_session,
     start_session,
     stop_session,
 )
@@ -80,6 +81,7 @@ def oauth(userauth):
         return
 
     req_redirect = users.oauth_callback(userauth, request.url)
+    save_session(userauth)
     if userauth.is_auth:
         login_success(req_redirect)
     else:
@@ -0,0 +1,28 @@
+"""
+Metrics of the server, as plain text. Each line has a name and a value.
+Example::
+    projects 12
+    projects_loaded 10
+"""
+
+from .. import (
+    admission,
+    config,
+    jobs,
+    server,
+)
+from ..bottle import (
+    response,
+    route,
+)
+from ..protect import protected
+
+
+@route("/metrics", method="GET")
+@protected(["metrics", "-", "-"])
+def metrics(userauth):
+    response.content_type = "text/plain; charset=UTF-8"
+    metrics = config.cache.get_metrics() + server.connection_statistics.get_metrics()
+    metrics = metrics + admission.scheduler.get_metrics() + jobs.queue.get_metrics()
+    lines = ["{} {}".format(name, value) for name, value in metrics]
+    return "\n".join(lines) + "\n"
@@ -4,6 +4,7 @@ Create a new project.
 
 from .. import (
     config,
+    jobs,
     project_type,
     utils,
 )
@@ -56,7 +57,7 @@ def page_post(userauth):
 
 
 @route("/makeproject/<prjtypename>/<prjname>", method="POST")
-@protected(["makeproject", "prjname", "-"])
+@protected(["makeproject", "prjname", "-"], in_job=True)
 def create_project(userauth, prjtypename, prjname):
     acceptance = utils.verify_name(prjname, "Project identifier", True)
     if acceptance is not None:
@@ -84,10 +85,12 @@ def create_project(userauth, prjtypename, prjname):
         abort(404, "Unknown project type.")
         return
 
-    error = config.cache.create_project(prjname, human_name, projtype, url)
-    if error is not None:
-        abort(404, error)
-        return
+    def create(job):
+        error = config.cache.create_project(prjname, human_name, projtype, url)
+        if error is not None:
+            raise jobs.JobError(error)
+        return "Successfully created project '" + prjname + "' " + utils.get_datetime_now_formatted()
 
-    message = "Successfully created project '" + prjname + "' " + utils.get_datetime_now_formatted()
-    redirect("/project/<prjname>", prjname=prjname.lower(), message=message)
+    title = "Creation of project '{}'".format(prjname)
+    job = jobs.queue.submit(prjname, title, userauth, create, "/project/<prjname>", {"prjname": prjname.lower()})
+    jobs.respond(job)
@@ -69,7 +69,7 @@ class Translation:
         @type  lchg: L{Change} or C{None}
 
         @param now: The current moment in time, if available.
-        @type  now: L{Stamp} or C{None}
+        @type  now: C{int} or C{None}
 
         @param saved: Translation comes from the project data (instead of a result of a user editing the string).
         @type  saved: C{bool}
@@ -89,7 +89,7 @@ class Translation:
             self.last_upload = lchg.last_upload
             if saved:
                 self.stamp_desc = utils.get_relative_time(lchg.stamp, now)
-                self.stamp = str(lchg.stamp)
+                self.stamp = str(data.Stamp(lchg.stamp))
             else:
                 self.stamp_desc = None
                 self.stamp = None
@@ -409,13 +409,13 @@ def check_page_parameters(prjname, lngname, sname):
         abort(404, "Language is not a translation")
         return None
 
-    bchgs = blng.changes.get(sname)
+    bchgs = blng.get_changes(sname)
     if bchgs is None or len(bchgs) == 0:
         abort(404, "String does not exist in the project")
         return None
 
     # Check newest base language string.
-    bchg = max(bchgs)
+    bchg = bchgs[-1]
     binfo = language_file.check_string(pdata.projtype, bchg.base_text.text, True, None, blng, True)
     if binfo.has_error:
         # XXX Add errors too
@@ -466,16 +466,15 @@ def output_string_edit_page(
     # Mapping of case to list of related strings.
     related_cases = dict((case, []) for case in lng.case)
     for rel_sname in pdata.get_related_strings(sname):
-        rel_chgs = lng.changes.get(rel_sname)
+        rel_chgs = lng.get_all_newest_changes(rel_sname)
         if rel_chgs is not None:
-            rel_chgs = data.get_all_newest_changes(rel_chgs, lng.case)
             for case, chg in rel_chgs.items():
                 if chg is not None and chg.new_text is not None:
                     rc = related_cases.get(case)
                     if rc is not None:
                         rc.append(RelatedString(rel_sname, chg.new_text))
 
-    case_chgs = data.get_all_changes(lng.changes.get(sname), lng.case, None)
+    case_chgs = data.get_all_changes(lng.get_changes(sname), lng.case, None)
     now = data.make_stamp()
 
     transl_cases = []
@@ -528,7 +527,7 @@ def output_string_edit_page(
             if n[:3] != lng.name[:3] or n == lng.name:
                 continue
 
-            related = data.get_newest_change(l.changes.get(sname), "")
+            related = l.get_newest_change(sname, "")
             if related is not None:
                 related_languages.append((l, related))
     related_languages.sort(key=lambda x: x[0].name)
@@ -544,6 +543,7 @@ def output_string_edit_page(
         cases=lng.case,
         related_languages=related_languages,
         tcs=transl_cases,
+        version=lng.get_string_version(sname),
         message=message,
         message_class=message_class,
     )
@@ -561,13 +561,14 @@ def str_form(userauth, prjname, lngname, sname):
 
 
 @route("/string/<prjname>/<lngname>/<sname>", method="POST")
-@protected(["string", "prjname", "lngname"])
+@protected(["string", "prjname", "lngname"], language_only=True)
 def str_post(userauth, prjname, lngname, sname):
     parms = check_page_parameters(prjname, lngname, sname)
     if parms is None:
         return None
 
     pmd, bchg, lng, binfo = parms
+    lng = pmd.pdata.edit_language(lng.name)  # Readers keep using the current version of the language.
 
     request.forms.recode_unicode = False  # Allow Unicode input
     request_forms = request.forms.decode()  # Convert dict to Unicode.
@@ -577,6 +578,21 @@ def str_post(userauth, prjname, lngname, sname):
         abort(404, "Base language has been changed, please translate the newer version instead")
         return None
 
+    # Version of the string in the form, missing in forms of older versions of the page.
+    version = data.convert_num(request_forms.get("version"), None)
+    if version is not None and version != lng.get_string_version(sname):
+        return output_string_edit_page(
+            userauth,
+            bchg,
+            binfo,
+            lng,
+            pmd,
+            lngname,
+            sname,
+            message="The string was changed by someone else meanwhile, please check the translation again",
+            message_class="error",
+        )
+
     # Get changes against bchg
     case_chgs = data.get_all_changes(lng.changes.get(sname), lng.case, bchg)
     projtype = pmd.pdata.projtype
@@ -644,9 +660,7 @@ def str_post(userauth, prjname, lngname, sname):
                     # Move to latest base language text.
                     if stamp is None:
                         stamp = data.make_stamp()
-                    trl_chg.base_text = bchg.base_text
-                    trl_chg.stamp = stamp
-                    trl_chg.user = userauth.name
+                    lng.update_change(trl_chg, stamp, userauth.name, bchg.base_text)
             continue
 
         # We got an older translation instead.
@@ -677,16 +691,13 @@ def str_post(userauth, prjname, lngname, sname):
 
     # No errors, store the changes.
     for tchg in new_changes:
-        if sname in lng.changes:
-            lng.changes[sname].append(tchg)
-        else:
-            lng.changes[sname] = [tchg]
+        lng.add_change(tchg)
         lng.set_modified()
 
-    modified = config.process_project_changes(pmd.pdata)  # Update changes of the project.
+    # Update changes of the string, the base language is shared with requests for other languages.
+    modified = config.process_string_changes(pmd.pdata, sname, {lng.name}, False)
     if modified or stamp is not None:
-        config.cache.save_pmd(pmd)
-        pmd.create_statistics(lng)
+        config.cache.save_language(pmd, lng)
 
     # Construct a message that the string is changed.
     if len(new_changes) > 0:
@@ -91,15 +91,14 @@ def project(userauth, prjname, lngname):
         abort(404, "Missing language statistics")
         return None
 
-    for sname, bchgs in blng.changes.items():
+    for sname in blng.changes:
         cstates = sdict[sname]
         state = max(s[1] for s in cstates)
         if state != data.MISSING_OK:
-            bchg = data.get_newest_change(bchgs, "")
+            bchg = blng.get_newest_change(sname, "")
             sdd = StringDisplayData(sname, bchg.base_text)
-            chgs = lng.changes.get(sname)
-            if chgs is not None:
-                cases = data.get_all_newest_changes(chgs, lng.case)
+            cases = lng.get_all_newest_changes(sname)
+            if cases is not None:
                 for case, cstate in cstates:
                     chg = cases[case]
                     if chg is not None:
@@ -5,6 +5,7 @@ Upload a language file.
 from .. import (
     config,
     data,
+    jobs,
     utils,
 )
 from ..bottle import (
@@ -17,10 +18,7 @@ from ..newgrf import (
     language_info,
 )
 from ..protect import protected
-from ..utils import (
-    redirect,
-    template,
-)
+from ..utils import template
 
 
 @route("/upload/<prjname>", method="GET")
@@ -59,7 +57,7 @@ def page_get_subdir(userauth, prjname, lngname):
 
 
 @route("/upload/<prjname>/<lngname>", method="POST")
-@protected(["upload", "prjname", "-"])
+@protected(["upload", "prjname", "-"], in_job=True)
 def page_post_subdir(userauth, prjname, lngname):
     pmd = config.cache.get_pmd(prjname)
     if pmd is None:
@@ -78,7 +76,7 @@ def page_post_subdir(userauth, prjname, lngname):
 
 
 @route("/upload/<prjname>", method="POST")
-@protected(["upload", "prjname", "-"])
+@protected(["upload", "prjname", "-"], in_job=True)
 def page_post(userauth, prjname):
     pmd = config.cache.get_pmd(prjname)
     if pmd is None:
@@ -98,7 +96,7 @@ def page_post(userauth, prjname):
 
 def handle_upload(userauth, pmd, projname, langfile, override, is_base, lng_data):
     """
-    Process the upload.
+    Process the upload. The uploaded file is checked immediately, a job adds its strings to the project.
 
     @param userauth: User authentication.
     @type  userauth: L{UserAuthentication}
@@ -125,13 +123,6 @@ def handle_upload(userauth, pmd, projname, langfile, override, is_base, lng_data
         abort(404, "Missing language file")
         return None
 
-    base_language = pdata.get_base_language()
-
-    # Cannot download a translation without base language.
-    if not is_base and base_language is None:
-        abort(404, "Project has no base language")
-        return None
-
     # Read upload data
     text = langfile.file.read(config.cfg.language_file_size)
     if len(text) == config.cfg.language_file_size:
@@ -154,43 +145,84 @@ def handle_upload(userauth, pmd, projname, langfile, override, is_base, lng_data
         abort(404, 'Language "{}" may not be uploaded'.format(ng_data.language_data.isocode))
         return None
 
+    def apply(job):
+        return apply_upload(job, userauth.name, projname, ng_data, override, is_base)
+
+    title = "Upload of language '{}'".format(ng_data.language_data.isocode)
+    job = jobs.queue.submit(projname, title, userauth, apply, "/project/<prjname>", {"prjname": projname})
+    jobs.respond(job)
+    return None
+
+
+def apply_upload(job, user, projname, ng_data, override, is_base):
+    """
+    Add the strings of an uploaded language file to the project.
+
+    @param job: Job adding the strings.
+    @type  job: L{jobs.Job}
+
+    @param user: Name of the user that uploaded the file.
+    @type  user: C{str}
+
+    @param projname: Project name.
+    @type  projname: C{str}
+
+    @param ng_data: Loaded language file.
+    @type  ng_data: L{NewGrfData}
+
+    @param override: Override existing text.
+    @type  override: C{bool}
+
+    @param is_base: Whether the file is the base language.
+    @type  is_base: C{bool}
+
+    @return: Message for the user.
+    @rtype:  C{str}
+    """
+    pmd = config.cache.get_pmd(projname)
+    if pmd is None:
+        raise jobs.JobError("Project does not exist")
+
+    pdata = pmd.pdata
+    base_language = pdata.get_base_language()
+
+    # Cannot download a translation without base language.
+    if not is_base and base_language is None:
+        raise jobs.JobError("Project has no base language")
+
+    job.set_progress("Adding the strings")
     stamp = data.make_stamp()
 
     lng = pdata.languages.get(ng_data.language_data.isocode)
     if lng is None:  # New language being added.
         result = add_new_language(ng_data, pdata, is_base)
         if not result[0]:
-            abort(404, result[0])
-            return None
+            raise jobs.JobError(result[1])
         lng = result[1]
         if is_base and base_language is None:
             base_language = lng
+    else:
+        lng = pdata.edit_language(lng.name)  # Readers keep using the current version of the language.
+        if base_language is not None and base_language.name == lng.name:
+            base_language = lng
 
     if is_base:
         if base_language is not None and base_language != lng:
-            abort(404, "Cannot change a translation to a base language")
-            return None
+            raise jobs.JobError("Cannot change a translation to a base language")
 
         # Add strings as changes.
         for sv in ng_data.strings:
             sv.text = language_file.sanitize_text(sv.text)
-            chgs = base_language.changes.get(sv.name)
             chg = get_blng_change(sv, base_language)
             if chg is None:  # New change.
                 base_text = data.Text(sv.text, sv.case, stamp)
-                chg = data.Change(sv.name, sv.case, base_text, None, stamp, userauth.name, True)
-                if chgs is None:
-                    chgs = [chg]
-                    base_language.changes[sv.name] = chgs
-                else:
-                    chgs.append(chg)
+                chg = data.Change(sv.name, sv.case, base_text, None, stamp, user, True)
+                base_language.add_change(chg)
             else:
                 # Only way to update a base language is by upload, no need for override check.
-                chg.stamp = stamp
-                chg.user = userauth.name
+                chg = base_language.update_change(chg, stamp, user)
 
-            for c in chgs:
-                c.last_upload = c == chg
+            base_language.set_last_upload(chg)
 
         # Update language properties as well.
         copy_lng_properties(pdata.projtype, ng_data, base_language)
@@ -200,74 +232,67 @@ def handle_upload(userauth, pmd, projname, langfile, override, is_base, lng_data
         pdata.set_modified()
 
         # Push the new set of string-names to all languages (this includes the base language).
+        # Strings without translation are absent from the language.
         str_names = set(sv.name for sv in ng_data.strings)
-        for lang in pdata.languages.values():
-            lng_modified = False
-            not_seen = str_names.copy()
-            for sn in list(lang.changes.keys()):
-                not_seen.discard(sn)
-                if sn in str_names:
-                    continue  # Name is kept.
-                del lang.changes[sn]  # Old string, delete
-                lng_modified = True
-            for sn in not_seen:
-                # Missing translation are not saved, so no set_modified here.
-                lang.changes[sn] = []
-
-            if lng_modified:
-                lang.set_modified()
+        for lang_name, lang in list(pdata.languages.items()):
+            old_names = [sn for sn in lang.changes.keys() if sn not in str_names]
+            if len(old_names) == 0:
+                continue  # All names are kept.
+
+            lang = pdata.edit_language(lang_name)
+            for sn in old_names:
+                lang.delete_changes(sn)  # Old string, delete
+            lang.set_modified()
+
+        # Discard base language changes of the uploaded strings that are not needed any more.
+        for sname in str_names:
+            config.process_string_changes(pdata, sname, set())
 
     else:
         # Not a base language -> it is a translation.
         if base_language is not None and base_language == lng:
-            abort(404, "Cannot change a base language to a translation")
-            return None
+            raise jobs.JobError("Cannot change a base language to a translation")
 
+        str_names = set()
         for sv in ng_data.strings:
             sv.text = language_file.sanitize_text(sv.text)
 
             # Find base language string for 'sv'.
-            bchgs = base_language.changes.get(sv.name)
-            if bchgs is None:
-                continue  # Translation has a string not in the base language
-            bchg = data.get_newest_change(bchgs, "")
+            bchg = base_language.get_newest_change(sv.name, "")
             if bchg is None:
-                continue  # Nothing to base against.
+                continue  # Translation has a string not in the base language, or nothing to base against.
             base_text = bchg.base_text
 
-            chgs = lng.changes.get(sv.name)
             chg = get_lng_change(sv, lng, base_text)
             if chg is None:  # It's a new text or new case.
                 lng_text = data.Text(sv.text, sv.case, stamp)
-                chg = data.Change(sv.name, sv.case, base_text, lng_text, stamp, userauth.name, True)
-                if chgs is None:
-                    lng.changes[sv.name] = [chg]
-                else:
-                    chgs.append(chg)
+                chg = data.Change(sv.name, sv.case, base_text, lng_text, stamp, user, True)
+                lng.add_change(chg)
             elif override:  # Override existing entry.
-                chg.stamp = stamp
-                chg.user = userauth.name
+                chg = lng.update_change(chg, stamp, user)
 
             # Set the change as the "last uploaded" one
-            for c in chgs:
-                c.last_upload = False
+            lng.set_last_upload(chg)
+            str_names.add(sv.name)
 
-            chg.last_upload = True
+        # Discard changes of the uploaded strings that are not needed any more.
+        for sname in str_names:
+            config.process_string_changes(pdata, sname, {lng.name})
 
         # Update language properties as well.
         copy_lng_properties(pdata.projtype, ng_data, lng)
         lng.set_modified()
 
+    job.set_progress("Saving the project")
     config.cache.save_pmd(pmd)
 
+    job.set_progress("Updating the statistics")
     if is_base:
         pmd.create_statistics(None)  # Update all languages.
     else:
         pmd.create_statistics(lng)
 
-    message = "Successfully uploaded language '" + lng.name + "' " + utils.get_datetime_now_formatted()
-    redirect("/project/<prjname>", prjname=projname, message=message)
-    return None
+    return "Successfully uploaded language '" + lng.name + "' " + utils.get_datetime_now_formatted()
 
 
 def get_blng_change(sv, lng):
@@ -385,11 +410,6 @@ def add_new_language(ng_data, pdata, base_lang):
         pdata.skeleton = ng_data.skeleton
         pdata.flush_related_cache()
 
-    # Add the current string names to the new language.
-    for stp, sparam in pdata.skeleton:
-        if stp == "string":
-            lng.changes[sparam[1]] = []
-
     lng.set_modified()
     return (True, lng)
 
@@ -3,10 +3,17 @@ Bottle authentication decorator.
 """
 
 import datetime
+import heapq
+import os
+import pickle
 import secrets
+import sqlite3
+import threading
 
 from . import (
+    admission,
     config,
+    jobs,
     userauth,
 )
 from .bottle import (
@@ -33,19 +40,170 @@ class ScriptAuth(userauth.UserAuthentication):
 _script_auth = ScriptAuth()
 translators_password = None
 
-_sessions = dict()
+
+def get_deadline(session):
+    """
+    Get the moment that a session expires, the end of the login for a session that did not log in yet.
+
+    @param session: Session of a user.
+    @type  session: L{userauth.UserAuthentication}
+
+    @return: Number of seconds since the epoch (UTC) until the session expires.
+    @rtype:  C{float}
+    """
+    if session.is_auth:
+        deadline = session.expires
+    else:
+        deadline = session.login_timeout
+    return (deadline - EPOCH).total_seconds()
+
+
+class Sessions:
+    """
+    Sessions of a single process, stored in memory. Behaves like a dictionary of sessions, a changed session must be
+    stored again for updating when it expires.
+
+    @ivar lock: Lock for changing the sessions.
+    @type lock: L{threading.Lock}
+
+    @ivar sessions: Sessions by identification.
+    @type sessions: C{dict} of C{str} to L{userauth.UserAuthentication}
+
+    @ivar deadlines: Heap of the moments that sessions expire, with their identification. A session may have
+                     several entries, only the last one counts.
+    @type deadlines: C{list} of (C{float}, C{str})
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.deadlines = []
+
+    def get(self, sid, default=None):
+        return self.sessions.get(sid, default)
+
+    def __contains__(self, sid):
+        return sid in self.sessions
+
+    def __setitem__(self, sid, session):
+        with self.lock:
+            self.sessions[sid] = session
+            heapq.heappush(self.deadlines, (get_deadline(session), sid))
+
+    def pop(self, sid, default=None):
+        with self.lock:
+            return self.sessions.pop(sid, default)
+
+    def cleanup(self, now):
+        """
+        Remove the expired sessions.
+
+        @param now: Current time, in seconds since the epoch (UTC).
+        @type  now: C{float}
+        """
+        with self.lock:
+            while len(self.deadlines) > 0 and self.deadlines[0][0] < now:
+                sid = heapq.heappop(self.deadlines)[1]
+                session = self.sessions.get(sid)
+                if session is None:
+                    continue  # Removed already.
+
+                deadline = get_deadline(session)
+                if deadline < now:
+                    del self.sessions[sid]
+                else:
+                    # The session was changed without storing it again.
+                    heapq.heappush(self.deadlines, (deadline, sid))
+
+
+class SharedSessions:
+    """
+    Sessions stored in a data base, shared by the processes of the server, and kept when the server restarts.
+    Behaves like L{Sessions}.
+
+    @ivar path: Path of the data base.
+    @type path: C{str}
+
+    @ivar lock: Lock for using the connection.
+    @type lock: L{threading.Lock}
+
+    @ivar connection: Connection to the data base, and the process that opened it.
+    @type connection: C{tuple} (C{int}, L{sqlite3.Connection}), or C{None}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def get_connection(self):
+        """
+        Get the connection to the data base of this process, the lock must be held.
+
+        @return: The connection.
+        @rtype:  L{sqlite3.Connection}
+        """
+        pid = os.getpid()
+        if self.connection is None or self.connection[0] != pid:
+            if not os.path.exists(self.path):
+                # Only the server may read the sessions.
+                os.close(os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o600))
+
+            # A connection may not be used by more than one process.
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")  # Losing the newest sessions at a crash is fine.
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, deadline REAL, session BLOB)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS sessions_deadline ON sessions (deadline)")
+            self.connection = (pid, connection)
+        return self.connection[1]
+
+    def get(self, sid, default=None):
+        with self.lock:
+            row = self.get_connection().execute("SELECT session FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None:
+            return default
+        try:
+            return pickle.loads(row[0])
+        except Exception:
+            return default  # Stored by another version of the program.
+
+    def __contains__(self, sid):
+        with self.lock:
+            row = self.get_connection().execute("SELECT 1 FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        return row is not None
+
+    def __setitem__(self, sid, session):
+        text = pickle.dumps(session)
+        deadline = get_deadline(session)
+        with self.lock:
+            self.get_connection().execute(
+                "REPLACE INTO sessions (sid, deadline, session) VALUES (?, ?, ?)", (sid, deadline, text)
+            )
+
+    def pop(self, sid, default=None):
+        session = self.get(sid, default)
+        with self.lock:
+            self.get_connection().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+        return session
+
+    def cleanup(self, now):
+        with self.lock:
+            self.get_connection().execute("DELETE FROM sessions WHERE deadline < ?", (now,))
+
+
+_sessions = Sessions()  # Replaced by L{SharedSessions} for sharing the sessions.
 SESSION_COOKIE = "eints_sid"
 MAX_SESSION_AGE = datetime.timedelta(hours=16)
 LOGIN_TIMEOUT = datetime.timedelta(minutes=10)
+EPOCH = datetime.datetime(1970, 1, 1)
 
 
 def cleanup_sessions():
     now = datetime.datetime.utcnow()
-    for sid, session in list(_sessions.items()):
-        if not session.is_auth and now > session.login_timeout:
-            del _sessions[sid]
-        elif now > session.expires:
-            del _sessions[sid]
+    _sessions.cleanup((now - EPOCH).total_seconds())
 
 
 def start_session(userauth):
@@ -58,6 +216,18 @@ def start_session(userauth):
     response.set_cookie(SESSION_COOKIE, userauth.sid, expires=userauth.expires, httponly=True)
 
 
+def save_session(userauth):
+    """
+    Store the changes of the session of a user, for the other processes of the server.
+
+    @param userauth: Session of the user.
+    @type  userauth: L{userauth.UserAuthentication}
+    """
+    sid = getattr(userauth, "sid", None)
+    if sid is not None and sid in _sessions:
+        _sessions[sid] = userauth
+
+
 def get_session():
     sid = request.get_cookie(SESSION_COOKIE)
     if sid is not None:
@@ -72,15 +242,15 @@ def get_session():
 
 def stop_session():
     sid = request.get_cookie(SESSION_COOKIE)
-    if sid is not None and sid in _sessions:
-        del _sessions[sid]
+    if sid is not None:
+        _sessions.pop(sid, None)
     response.delete_cookie(SESSION_COOKIE, httponly=True)
 
 
 METHODS = {"GET": "read", "POST": "add", "PUT": "set", "DELETE": "del"}
 
 
-def protected(page_name):
+def protected(page_name, language_only=False, in_job=False):
     """
     Decorator for adding basic authentication protection to a route.
 
@@ -88,6 +258,15 @@ def protected(page_name):
                       a pattern that has to be replaced with a real part when the
                       query is performed.
     @type  page_name: C{list} of C{str}
+
+    @param language_only: Whether a request that may change the project only changes the
+                          language of the page, so requests for other languages of the
+                          project can change the project at the same time.
+    @type  language_only: C{bool}
+
+    @param in_job: Whether a request that may change the project leaves the changes to a
+                   background job, see L{jobs}, so the request itself only reads the project.
+    @type  in_job: C{bool}
     """
 
     def decorator(func):
@@ -115,8 +294,20 @@ def protected(page_name):
                 # No authentication backend.
                 abort(403, "Access denied")
             elif userauth.may_access(pname, prjname, lngname):
-                # Access granted.
-                return func(userauth, *a, **ka)
+                # Access granted, wait for the turn of the request.
+                with admission.scheduler.admitted(admission.get_request_class(page_name[0], request.method)):
+                    if prjname is None:
+                        config.cache.refresh_projects()  # Pages without a project may list all projects.
+                        return func(userauth, *a, **ka)
+
+                    write = request.method not in ("GET", "HEAD")
+                    if in_job and jobs.queue.runs_in_background(userauth, prjname):
+                        write = False
+                    try:
+                        with config.cache.use_project(prjname, write, lngname if language_only else None):
+                            return func(userauth, *a, **ka)
+                    except config.ProjectChangedError as ex:
+                        redirect("/project/<prjname>", prjname=prjname.lower(), message=str(ex))
             elif not userauth.is_auth:
                 # Not logged in.
                 if request.path == "/login":
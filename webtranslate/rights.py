@@ -76,17 +76,71 @@ class UserRightRule:
         return True
 
 
+class PageRules:
+    """
+    Rules that apply to a page name, in the order of the rights file.
+
+    @ivar rules: Rules of the page name, and of all page names.
+    @type rules: C{list} of L{UserRightRule}
+
+    @ivar positions: Positions in the path after the page name, where a rule does not match everything.
+                     Elements at other positions do not influence the decision.
+    @type positions: C{list} of C{int}
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.positions = [i for i in range(1, 4) if any(urr.path[i] != "*" for urr in rules)]
+
+    def decide(self, page, roles):
+        """
+        Decide access to a page for a user with a set of roles.
+
+        @param page: Page name being accessed.
+        @type  page: C{list} of C{str}
+
+        @param roles: Set of roles.
+        @type  roles: C{set} of C{str}
+
+        @return: Whether access is granted.
+        @rtype:  C{bool}
+        """
+        for urr in self.rules:
+            if not urr.match_path(page):
+                continue
+            access = urr.eval(roles)
+            if access is not None:
+                return access
+
+        # No match, just deny.
+        return False
+
+
 # Table with rights.
 _table = []
 
+# Rules by page name, the rules for page names without their own rules, and the roles used in the rules.
+_pages = {}
+_other_pages = PageRules([])
+_used_roles = frozenset()
+
+# Decisions by page path and roles of the user, and the maximum number of decisions to remember.
+_decisions = {}
+MAX_DECISIONS = 100000
+
 FILENAME = "rights.dat"
 
+UNAUTHENTICATED_ROLES = frozenset(["SOMEONE"])
+
+# Roles with a special meaning, a user with such a name is not matched by name.
+SPECIAL_ROLES = frozenset(["SOMEONE", "USER", "OWNER", "TRANSLATOR"])
+
 
 def init_page_access():
     """
     Initialize the user rights table.
     """
-    global _table
+    global _table, _pages, _other_pages, _used_roles, _decisions
 
     _table = []
     rights_pat = re.compile("\\s*(\\S+)\\s+([-+])\\s+/([^/]+)/([^/]+)/([^/]+)/([^/]+)\\s*$")
@@ -104,10 +158,18 @@ def init_page_access():
             path = [m.group(3), m.group(4), m.group(5), m.group(6)]
             _table.append(UserRightRule(user, path, grant_access))
 
+    # Compile the table, each page name gets its own rules and the rules of all page names, in table order.
+    names = set(urr.path[0] for urr in _table if urr.path[0] != "*")
+    _pages = dict((name, PageRules([urr for urr in _table if urr.path[0] in (name, "*")])) for name in names)
+    _other_pages = PageRules([urr for urr in _table if urr.path[0] == "*"])
+    _used_roles = frozenset(urr.user for urr in _table if urr.user != "*")
+    _decisions = {}
+
 
 def has_access(page, roles):
     """
-    Test access to a page for a user with a set of roles.
+    Test access to a page for a user with a set of roles. Decisions are remembered, the rights table is only
+    inspected for new combinations of the page and the roles.
 
     @param page: Page name being accessed.
     @type  page: C{list} of C{str}
@@ -119,14 +181,19 @@ def has_access(page, roles):
     @rtype:  C{bool}
     """
     if "USER" not in roles:
-        roles = set(["SOMEONE"])
-
-    for urr in _table:
-        if not urr.match_path(page):
-            continue
-        access = urr.eval(roles)
-        if access is not None:
-            return access
-
-    # No match, just deny.
-    return False
+        roles = UNAUTHENTICATED_ROLES
+
+    if len(page) != 4:
+        return False  # All rules have four elements.
+
+    page_rules = _pages.get(page[0], _other_pages)
+
+    # Only the elements of the path and the roles that rules look at decide access.
+    key = (page[0], tuple([page[i] for i in page_rules.positions]), _used_roles.intersection(roles))
+    access = _decisions.get(key)
+    if access is None:
+        access = page_rules.decide(page, roles)
+        if len(_decisions) >= MAX_DECISIONS:
+            _decisions.clear()
+        _decisions[key] = access
+    return access
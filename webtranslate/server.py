@@ -0,0 +1,665 @@
+"""
+Classes of the built-in web server, used if the server does not run in mod_wsgi.
+"""
+
+import bisect
+import gc
+import hashlib
+import http.client
+import logging
+import os
+import signal
+import socketserver
+import threading
+import time
+import urllib.parse
+
+from wsgiref.simple_server import (
+    ServerHandler,
+    WSGIRequestHandler,
+    WSGIServer,
+    make_server,
+)
+
+from . import (
+    bottle,
+    config,
+)
+
+log = logging.getLogger(__name__)
+
+
+class NoLog200HandlerHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        # Only log if the status was not successful.
+        if not (200 <= int(args[1]) < 400):
+            # Use log.info() instead of parent call, as parent call uses stderr.write().
+            log.info("%s - - [%s] %s", self.address_string(), self.log_date_time_string(), format % args)
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    """
+    WSGI server handling each request in its own thread, with a limit on the number of simultaneous requests.
+    A persistent connection that waits for its next request gives up its slot, the number of such idle
+    connections has a limit of its own, see L{reserve_idle}.
+
+    @ivar slots: Number of requests that may still start.
+    @type slots: L{threading.BoundedSemaphore}
+
+    @ivar idle_slots: Number of connections that may still wait idle for their next request.
+    @type idle_slots: L{threading.BoundedSemaphore}
+
+    @ivar local: Data of the thread of a connection, C{has_slot} tells whether the thread holds a slot.
+    @type local: L{threading.local}
+    """
+
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        self.slots = threading.BoundedSemaphore(config.cfg.server_threads)
+        self.idle_slots = threading.BoundedSemaphore(config.cfg.server_threads)
+        self.local = threading.local()
+        super().__init__(*args, **kwargs)
+
+    def process_request(self, request, client_address):
+        self.slots.acquire()  # Wait until a running request finishes.
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        self.local.has_slot = True
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            if self.local.has_slot:
+                self.slots.release()
+
+    def reserve_idle(self):
+        """
+        Reserve a place for the connection of the current thread to wait for its next request, before its
+        response tells the client whether the connection stays open. The place is used by L{start_idle},
+        or given back by L{cancel_idle}.
+
+        @return: Whether the connection may wait, else too many connections are idle, and it should be closed.
+        @rtype:  C{bool}
+        """
+        return self.idle_slots.acquire(blocking=False)
+
+    def cancel_idle(self):
+        """
+        Give back the place reserved by L{reserve_idle}, as the connection is closed after all.
+        """
+        self.idle_slots.release()
+
+    def start_idle(self):
+        """
+        Give up the slot of the current thread while its connection waits for the next request, at the
+        place reserved by L{reserve_idle}.
+        """
+        self.local.has_slot = False
+        self.slots.release()
+
+    def end_idle(self, busy):
+        """
+        Stop waiting for the next request at the connection of the current thread.
+
+        @param busy: Whether a request arrived, the thread then waits for a slot to handle it.
+        @type  busy: C{bool}
+        """
+        self.idle_slots.release()
+        if busy:
+            self.slots.acquire()
+            self.local.has_slot = True
+
+
+class ForwardedWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    """
+    WSGI server of a process for the requests forwarded by the other processes, see L{ProjectRouter}. The
+    requests already waited for a free thread in the process that forwarded them.
+    """
+
+    daemon_threads = True
+
+
+class ConnectionStatistics:
+    """
+    Counts of the connections and the requests handled by the server with persistent connections.
+
+    @ivar lock: Lock for changing the counts.
+    @type lock: L{threading.Lock}
+
+    @ivar connections: Number of accepted connections.
+    @type connections: C{int}
+
+    @ivar requests: Number of handled requests.
+    @type requests: C{int}
+
+    @ivar reused: Number of requests that arrived at a connection that already handled a request.
+    @type reused: C{int}
+
+    @ivar idle_closed: Number of connections closed by the server after being idle for too long.
+    @type idle_closed: C{int}
+
+    @ivar forwarded: Number of requests forwarded to the process of their project.
+    @type forwarded: C{int}
+
+    @ivar process: Index of the process of the server.
+    @type process: C{int}
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.reused = 0
+        self.idle_closed = 0
+        self.forwarded = 0
+        self.process = 0
+
+    def add_connection(self):
+        with self.lock:
+            self.connections = self.connections + 1
+
+    def add_request(self, reused):
+        with self.lock:
+            self.requests = self.requests + 1
+            if reused:
+                self.reused = self.reused + 1
+
+    def add_idle_closed(self):
+        with self.lock:
+            self.idle_closed = self.idle_closed + 1
+
+    def add_forwarded(self):
+        with self.lock:
+            self.forwarded = self.forwarded + 1
+
+    def get_metrics(self):
+        """
+        Get metrics of the connections.
+
+        @return: Names and values of the metrics.
+        @rtype:  C{list} of (C{str}, C{int})
+        """
+        return [
+            ("server_connections", self.connections),
+            ("server_requests", self.requests),
+            ("server_requests_reused", self.reused),
+            ("server_connections_idle_closed", self.idle_closed),
+            ("server_requests_forwarded", self.forwarded),
+            ("server_process", self.process),
+        ]
+
+
+class RequestBody:
+    """
+    Body of a request with a known length, that keeps the application from reading past its end into the
+    next request of the connection.
+
+    @ivar rfile: Stream of the connection.
+    @type rfile: C{io.BufferedIOBase}
+
+    @ivar remaining: Number of bytes of the body that have not been read yet.
+    @type remaining: C{int}
+    """
+
+    def __init__(self, rfile, length):
+        self.rfile = rfile
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.rfile.read(size)
+        self.remaining = self.remaining - len(data)
+        return data
+
+    def readline(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.rfile.readline(size)
+        self.remaining = self.remaining - len(data)
+        return data
+
+    def readlines(self, hint=-1):
+        return list(self)
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+
+class KeepAliveServerHandler(ServerHandler):
+    """
+    Handler of a single request at a persistent connection. A response without a known length is sent
+    in chunks, unless the connection ends after the response.
+
+    @ivar chunked: Whether the body of the response is sent in chunks.
+    @type chunked: C{bool}
+    """
+
+    http_version = "1.1"
+    chunked = False
+
+    def cleanup_headers(self):
+        super().cleanup_headers()
+
+        request_handler = self.request_handler
+        if self.stdin is not request_handler.rfile and self.stdin.remaining > 0:
+            request_handler.close_connection = True  # The next request is behind the unread part of the body.
+        if not request_handler.close_connection and not request_handler.reserve_idle():
+            request_handler.close_connection = True  # Too many idle connections, the client connects again.
+
+        if "Content-Length" not in self.headers and not request_handler.close_connection:
+            status = int(self.status[:3])
+            if self.environ["REQUEST_METHOD"] != "HEAD" and status >= 200 and status not in (204, 304):
+                self.headers["Transfer-Encoding"] = "chunked"
+                self.chunked = True
+
+        if request_handler.close_connection:
+            self.headers["Connection"] = "close"
+
+    def write(self, data):
+        assert type(data) is bytes, "write() argument must be a bytes instance"
+
+        if not self.headers_sent:
+            self.bytes_sent = len(data)  # Content length of a single block response.
+            self.send_headers()
+        else:
+            self.bytes_sent = self.bytes_sent + len(data)
+
+        if not self.chunked:
+            self._write(data)
+        elif len(data) > 0:  # An empty chunk would end the body.
+            self._write(b"%x\r\n%s\r\n" % (len(data), data))
+        self._flush()
+
+    def finish_content(self):
+        super().finish_content()
+        if self.chunked:
+            self._write(b"0\r\n\r\n")
+            self._flush()
+
+    def handle_error(self):
+        if self.headers_sent:
+            # The response cannot be completed, the client only notices that the connection ends.
+            self.request_handler.close_connection = True
+        super().handle_error()
+
+
+class KeepAliveRequestHandler(NoLog200HandlerHandler):
+    """
+    Handler of the requests at a connection, which speaks HTTP/1.1 and keeps the connection open for
+    further requests until the client is idle for L{timeout} seconds.
+
+    @ivar request_count: Number of requests handled at the connection.
+    @type request_count: C{int}
+
+    @ivar idle_reserved: Whether the connection has a place to wait for its next request, see
+                         L{ThreadingWSGIServer.reserve_idle}.
+    @type idle_reserved: C{bool}
+    """
+
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1  # Send the headers and the body of a response together.
+    disable_nagle_algorithm = True  # Do not wait for the client to acknowledge the previous response.
+
+    def setup(self):
+        self.timeout = config.cfg.keep_alive_timeout
+        self.request_count = 0
+        self.idle_reserved = False
+        super().setup()
+        connection_statistics.add_connection()
+
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            self.handle_one_request()
+
+    def handle_one_request(self):
+        # Other connections may use the slot of the thread while it waits for the next request.
+        idle = self.idle_reserved
+        self.idle_reserved = False
+        if idle:
+            self.server.start_idle()
+
+        busy = False
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+            busy = len(self.raw_requestline) > 0
+        except TimeoutError:
+            if self.request_count > 0:
+                connection_statistics.add_idle_closed()
+            self.close_connection = True
+            return
+        finally:
+            if idle:
+                self.server.end_idle(busy)
+
+        if len(self.raw_requestline) == 0:  # Client closed the connection.
+            self.close_connection = True
+            return
+
+        if len(self.raw_requestline) > 65536:
+            self.requestline = ""
+            self.request_version = ""
+            self.command = ""
+            self.send_error(414)
+            return
+
+        if not self.parse_request():  # An error code has been sent, and the connection is closed.
+            return
+        if self.request_version != "HTTP/1.1":
+            self.close_connection = True  # Older clients only get one response.
+
+        connection_statistics.add_request(self.request_count > 0)
+        self.request_count = self.request_count + 1
+
+        # Limit the body to its length, to find the next request afterwards. Bodies sent in chunks are
+        # read by the application, and end the connection.
+        environ = self.get_environ()
+        body = None
+        if self.headers.get("Transfer-Encoding") is None:
+            try:
+                length = int(environ.get("CONTENT_LENGTH") or "0")
+            except ValueError:
+                length = -1
+            if length >= 0:
+                body = RequestBody(self.rfile, length)
+        if body is None:
+            self.close_connection = True
+
+        handler = KeepAliveServerHandler(
+            self.rfile if body is None else body,
+            self.wfile,
+            self.get_stderr(),
+            environ,
+            multithread=True,
+        )
+        handler.request_handler = self  # backpointer for logging
+        handler.run(self.server.get_app())
+        self.wfile.flush()  # Responses without a body are not flushed by the handler.
+
+        if body is not None and body.remaining > 0:
+            self.close_connection = True  # The application did not read the entire body.
+        if self.idle_reserved and self.close_connection:
+            self.idle_reserved = False
+            self.server.cancel_idle()
+
+    def reserve_idle(self):
+        """
+        Reserve a place for the connection to wait for the next request, if the server limits them.
+
+        @return: Whether the connection may stay open.
+        @rtype:  C{bool}
+        """
+        if isinstance(self.server, ThreadingWSGIServer):
+            self.idle_reserved = self.server.reserve_idle()
+            return self.idle_reserved
+        return True
+
+
+def hash_name(name):
+    """
+    Compute a hash of a name that is equal in all processes.
+
+    @param name: Name to hash.
+    @type  name: C{str}
+
+    @return: Hash of the name.
+    @rtype:  C{int}
+    """
+    return int.from_bytes(hashlib.md5(name.encode("utf-8")).digest()[:8], "big")
+
+
+class ProjectRing:
+    """
+    Assignment of projects to the processes of the server by consistent hashing of the project name. Each
+    process owns a number of points at a ring of hash values, a project belongs to the process of the first
+    point after the hash of its name. Changing the number of processes only moves the projects of the
+    added or removed points.
+
+    @ivar points: Hash values of the points at the ring, in increasing order.
+    @type points: C{list} of C{int}
+
+    @ivar indices: Index of the process of each point.
+    @type indices: C{list} of C{int}
+    """
+
+    def __init__(self, processes, replicas=64):
+        ring = sorted(
+            (hash_name("{}-{}".format(index, replica)), index)
+            for index in range(processes)
+            for replica in range(replicas)
+        )
+        self.points = [point for point, index in ring]
+        self.indices = [index for point, index in ring]
+
+    def get_index(self, proj_name):
+        """
+        Get the process of a project.
+
+        @param proj_name: Name of the project.
+        @type  proj_name: C{str}
+
+        @return: Index of the process of the project.
+        @rtype:  C{int}
+        """
+        pos = bisect.bisect(self.points, hash_name(proj_name))
+        return self.indices[pos % len(self.points)]
+
+
+# Headers of a single connection, which are not forwarded.
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
+
+class ProjectRouter:
+    """
+    WSGI application of a process of the server, that forwards requests of a project owned by another
+    process to that process, so each project is only loaded by its own process.
+
+    @ivar app: Application handling the requests of this process.
+    @type app: L{bottle.Bottle}
+
+    @ivar ring: Assignment of the projects to the processes.
+    @type ring: L{ProjectRing}
+
+    @ivar index: Index of this process.
+    @type index: C{int}
+
+    @ivar addresses: Addresses of the servers of the processes for forwarded requests.
+    @type addresses: C{list} of (C{str}, C{int})
+    """
+
+    def __init__(self, app, ring, index, addresses):
+        self.app = app
+        self.ring = ring
+        self.index = index
+        self.addresses = addresses
+
+    def __call__(self, environ, start_response):
+        try:
+            route, args = self.app.match(environ)
+        except bottle.HTTPError:
+            return self.app(environ, start_response)  # Let the application report the error.
+
+        prjname = args.get("prjname")
+        if prjname is None:
+            return self.app(environ, start_response)
+        index = self.ring.get_index(prjname)
+        if index == self.index:
+            return self.app(environ, start_response)
+
+        connection_statistics.add_forwarded()
+        return self.forward(index, environ, start_response)
+
+    def forward(self, index, environ, start_response):
+        """
+        Forward a request to another process, and return its response.
+
+        @param index: Index of the process.
+        @type  index: C{int}
+
+        @param environ: Environment of the request.
+        @type  environ: C{dict}
+
+        @param start_response: Function to start the response.
+        @type  start_response: C{callable}
+
+        @return: Body of the response.
+        @rtype:  C{list} of C{bytes}
+        """
+        headers = {}
+        for key, value in environ.items():
+            if key.startswith("HTTP_"):
+                name = key[5:].replace("_", "-").title()
+                if name.lower() not in HOP_BY_HOP_HEADERS:
+                    headers[name] = value
+        if environ.get("CONTENT_TYPE"):
+            headers["Content-Type"] = environ["CONTENT_TYPE"]
+        headers["X-Forwarded-For"] = environ.get("REMOTE_ADDR", "")
+
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or "0")
+        except ValueError:
+            length = 0
+        body = environ["wsgi.input"].read(length) if length > 0 else None
+
+        # The server decoded the path as latin-1.
+        url = urllib.parse.quote(environ.get("PATH_INFO", "/"), safe="/;=,:@!$&'()*+~", encoding="latin-1")
+        if environ.get("QUERY_STRING"):
+            url = url + "?" + environ["QUERY_STRING"]
+
+        host, port = self.addresses[index]
+        connection = http.client.HTTPConnection(host, port)
+        try:
+            connection.request(environ["REQUEST_METHOD"], url, body, headers)
+            response = connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            log.exception("Could not forward a request to server process %d", index)
+            start_response("502 Bad Gateway", [("Content-Type", "text/plain")])
+            return [b"Bad Gateway"]
+        finally:
+            connection.close()
+
+        response_headers = []
+        for name, value in response.getheaders():
+            if name.lower() not in HOP_BY_HOP_HEADERS:
+                response_headers.append((name, value))
+        start_response("{} {}".format(response.status, response.reason), response_headers)
+        return [content]
+
+
+class PreforkWSGIRefServer(bottle.ServerAdapter):
+    """
+    Bottle server adapter for the built-in server with several processes. The processes are forked after
+    finding the projects, and accept the connections of a shared listening socket. A process that ends is
+    started again.
+
+    Options of the adapter:
+     - C{handler_class}: Class of the request handler.
+     - C{server_class}: Class of the server.
+     - C{processes}: Number of processes.
+     - C{worker_init}: Function called in each new process with the index of the process.
+     - C{project_affinity}: Whether each project is handled by a single process, see L{ProjectRouter}.
+    """
+
+    def run(self, app):
+        handler_class = self.options.get("handler_class", NoLog200HandlerHandler)
+        server_class = self.options.get("server_class", WSGIServer)
+        processes = self.options["processes"]
+        worker_init = self.options.get("worker_init")
+
+        srv = make_server(self.host, self.port, app, server_class, handler_class)
+        forward_servers = []
+        if self.options.get("project_affinity"):
+            for index in range(processes):
+                forward_servers.append(make_server("127.0.0.1", 0, app, ForwardedWSGIServer, handler_class))
+
+        # Keep the data loaded so far out of the garbage collector, else it touches all objects and the
+        # processes quickly end up with their own copy of the memory pages. Only the projects that fit in the
+        # project cache are still loaded, the processes load other projects themselves.
+        gc.freeze()
+
+        workers = {}  # Index of the process ordered by process id.
+
+        def terminate(signum, frame):
+            raise SystemExit(0)
+
+        old_handler = signal.signal(signal.SIGTERM, terminate)
+        try:
+            while True:
+                for index in range(processes):
+                    if index not in workers.values():
+                        pid = os.fork()
+                        if pid == 0:
+                            self.run_worker(srv, index, worker_init, forward_servers)
+                        workers[pid] = index
+
+                pid, status = os.wait()
+                if workers.pop(pid, None) is not None:
+                    log.error("Server process %d ended unexpectedly (status %d), starting it again", pid, status)
+                    time.sleep(1)
+        finally:
+            signal.signal(signal.SIGTERM, old_handler)
+            for pid in workers:
+                os.kill(pid, signal.SIGTERM)
+            for pid in workers:
+                os.waitpid(pid, 0)
+            srv.server_close()
+            for forward_srv in forward_servers:
+                forward_srv.server_close()
+
+    def run_worker(self, srv, index, worker_init, forward_servers):
+        """
+        Serve requests in a forked process, until the process is stopped. Does not return.
+
+        @param srv: Server with the listening socket.
+        @type  srv: L{WSGIServer}
+
+        @param index: Index of the process.
+        @type  index: C{int}
+
+        @param worker_init: Function to call before serving, if any.
+        @type  worker_init: C{callable} or C{None}
+
+        @param forward_servers: Servers of the processes for forwarded requests, empty if any process handles
+                                any project.
+        @type  forward_servers: C{list} of L{ForwardedWSGIServer}
+        """
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        connection_statistics.process = index
+        status = 0
+        try:
+            if worker_init is not None:
+                worker_init(index)
+            if len(forward_servers) > 0:
+                forward_srv = forward_servers[index]
+                thread = threading.Thread(target=forward_srv.serve_forever, name="forwarded-requests", daemon=True)
+                thread.start()
+
+                addresses = [server.server_address for server in forward_servers]
+                srv.set_app(ProjectRouter(srv.get_app(), ProjectRing(len(forward_servers)), index, addresses))
+            srv.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        except BaseException:
+            log.exception("Server process %d failed", os.getpid())
+            status = 1
+        os._exit(status)
+
+
+connection_statistics = ConnectionStatistics()
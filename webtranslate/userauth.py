@@ -51,7 +51,10 @@ class UserAuthentication:
         @return: Whether the user may access the page.
         @rtype:  C{bool}
         """
-        return rights.has_access(pname, self.get_roles(prjname, lngname))
+        roles = self.get_roles(prjname, lngname)
+        if self.is_auth and self.name not in rights.SPECIAL_ROLES:
+            roles.add(self.name)  # Rules may name the user literally.
+        return rights.has_access(pname, roles)
 
     def may_read(self, prefix, prjname, lngname):
         """
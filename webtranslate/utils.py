@@ -16,7 +16,7 @@ def get_datetime_now_formatted():
     @rtype:  C{str}
     """
     stamp = data.make_stamp()
-    return str(stamp)
+    return str(data.Stamp(stamp))
 
 
 class TimeDescription:
@@ -76,15 +76,15 @@ def get_relative_time(old_stamp, now):
     Get a description of the relative time between stamps L{old_stamp} and L{now}.
 
     @param old_stamp: Time stamp to describe.
-    @type  old_stamp: L{Stamp}
+    @type  old_stamp: C{int}
 
     @param now: Current time.
-    @type  now: L{Stamp}
+    @type  now: C{int}
 
     @return: Short textual description how much time has passed between both stamps.
     @rtype:  C{str}
     """
-    difference = now.seconds - old_stamp.seconds
+    difference = data.get_stamp_seconds(now) - data.get_stamp_seconds(old_stamp)
 
     i = 0
     td = time_descriptions[i]